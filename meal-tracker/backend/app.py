@@ -1,74 +1,42 @@
-import json
 import os
+import time
 
 import jwt
-from flask import Flask, g, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from jwt import InvalidTokenError
 
 from data_store import record_meal
 from routes.auth import auth_bp
+from routes.dashboard import dashboard_bp
+from routes.leaderboard import leaderboard_bp
+from routes.meal_plan import meal_plan_bp
 from routes.meals import meals_bp
 from routes.users import users_bp
-from supabase_client import supabase
+from supabase_client import CHANGES_LAG, SupabaseInsertError, insert_meal_rows, normalize_meal_row, supabase, timed_execute
 from utils.bmi_calc import calc_bmi
 from utils.calories_detect import detect_calories
+from utils.events import broker as events_broker
 from utils.gamification import calculate_points
+from utils.idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER, idempotent
+from utils.identity import current_user_id
+from utils.insights import scheduler as insights_scheduler
+from utils.jobs import defer_requested, submit_response
+from utils.metrics import (
+    AUTH_FAILURES,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    render_latest,
+    stage,
+)
+from utils.single_flight import coalesce
+from utils import access_log, profiling
 
-_SUPABASE_SUPPORTS_PAYLOAD = True
 API_SECRET = os.getenv("API_SECRET")
 JWT_SECRET = os.getenv("JWT_SECRET")
 
 
-def _resolve_user_id(value):
-    if value is None:
-        return "demo"
-    candidate = str(value).strip()
-    return candidate or "demo"
-
-
-def _normalize_supabase_row(row):
-    payload = row.get("payload")
-    if isinstance(payload, str):
-        try:
-            payload = json.loads(payload)
-        except json.JSONDecodeError:
-            payload = None
-    if isinstance(payload, dict):
-        return payload
-    meal_name = row.get("meal_name")
-    calories = row.get("calories")
-    created_at = (
-        row.get("created_at") or row.get("createdAt") or row.get("inserted_at")
-    )
-    foods = []
-    if meal_name:
-        foods.append({"name": meal_name, "calories": calories})
-    return {
-        "id": row.get("id"),
-        "foods": foods,
-        "calories": calories,
-        "points": row.get("points") or 0,
-        "mood": row.get("mood"),
-        "notes": row.get("notes"),
-        "photo": row.get("photo_url"),
-        "calorie_method": row.get("calorie_method", "manual"),
-        "calorie_confidence": row.get("calorie_confidence", 0.0),
-        "created_at": created_at,
-    }
-
-
-def _maybe_disable_payload(message, insert_payload):
-    global _SUPABASE_SUPPORTS_PAYLOAD
-    if not _SUPABASE_SUPPORTS_PAYLOAD:
-        return False
-    if not message or "payload" not in message.lower():
-        return False
-    insert_payload.pop("payload", None)
-    _SUPABASE_SUPPORTS_PAYLOAD = False
-    return True
-
-
 def _allowed_origins():
     defaults = [
         "http://localhost:3000",
@@ -109,16 +77,70 @@ def _validate_jwt_token(token):
         return None, jsonify({"error": "Unauthorized"}), 401
 
 
+def _metrics_endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
 app = Flask(__name__)
+access_log.start()
 allowed_origins = _allowed_origins()
-CORS(app, resources={r"/*": {"origins": allowed_origins}}, allow_headers=["Content-Type", "X-API-Key"])
+CORS(
+    app,
+    resources={r"/*": {"origins": allowed_origins}},
+    allow_headers=["Content-Type", "X-API-Key", "Prefer", "Last-Event-ID", IDEMPOTENCY_HEADER, profiling.PROFILE_HEADER],
+    expose_headers=["Location", REPLAYED_HEADER, profiling.PROFILE_ID_HEADER],
+)
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = _metrics_endpoint_label()
+    REQUESTS_IN_FLIGHT.inc(method=request.method, endpoint=g.metrics_endpoint)
+
+
+@app.before_request
+def start_access_log():
+    access_log.begin()
+
+
+@app.after_request
+def write_access_log(response):
+    access_log.finish(
+        request.method,
+        g.get("metrics_endpoint") or _metrics_endpoint_label(),
+        response.status_code,
+        current_user_id(request.args.get("user_id")),
+        response.content_length,
+    )
+    return response
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            endpoint=g.metrics_endpoint,
+            status=response.status_code,
+        )
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(_exc):
+    endpoint = g.pop("metrics_endpoint", None)
+    if endpoint is not None:
+        REQUESTS_IN_FLIGHT.dec(method=request.method, endpoint=endpoint)
 
 
 @app.before_request
 def check_api_key():
     if request.method == "OPTIONS":
         return
-    public_endpoints = {"healthz", "api_health"}
+    public_endpoints = {"healthz", "api_health", "metrics"}
     guarded_auth_endpoints = {"auth.signup", "auth.login"}
     if request.endpoint in public_endpoints:
         return
@@ -126,8 +148,10 @@ def check_api_key():
 
     if request.endpoint in guarded_auth_endpoints:
         if not API_SECRET:
+            AUTH_FAILURES.inc(reason="misconfigured")
             return jsonify({"error": "Server misconfigured: missing API_SECRET"}), 500
         if not _api_secret_provided():
+            AUTH_FAILURES.inc(reason="invalid_api_key")
             return jsonify({"error": "Unauthorized"}), 401
         return
 
@@ -137,6 +161,7 @@ def check_api_key():
     if bearer:
         user_email, error_response, status = _validate_jwt_token(bearer)
         if error_response:
+            AUTH_FAILURES.inc(reason="invalid_jwt" if status == 401 else "misconfigured")
             # status can be None when error_response already contains status, but Flask accepts (response, status)
             return error_response, status
         g.current_user = user_email
@@ -145,12 +170,40 @@ def check_api_key():
     if _api_secret_provided():
         return
 
+    AUTH_FAILURES.inc(reason="missing_credentials")
     return jsonify({"error": "Unauthorized"}), 401
 
 
+@app.before_request
+def start_profiling():
+    if request.method == "OPTIONS" or not profiling.should_profile(request.headers):
+        return
+    g.profile_session = profiling.start(f"{request.method} {request.path}")
+
+
+@app.after_request
+def finish_profiling(response):
+    session = g.pop("profile_session", None)
+    if session is not None:
+        profiling.finish(session)
+        response.headers[profiling.PROFILE_ID_HEADER] = session.id
+    return response
+
+
+@app.teardown_request
+def abandon_profiling(_exc):
+    # Unhandled errors skip after_request; finishing here frees the single profiling slot.
+    session = g.pop("profile_session", None)
+    if session is not None:
+        profiling.finish(session)
+
+
 app.register_blueprint(meals_bp)
 app.register_blueprint(users_bp)
 app.register_blueprint(auth_bp)
+app.register_blueprint(leaderboard_bp)
+app.register_blueprint(dashboard_bp)
+app.register_blueprint(meal_plan_bp)
 
 
 @app.route('/bmi', methods=['POST'])
@@ -187,10 +240,16 @@ def api_health():
     return jsonify({"status": "UP"})
 
 
+@app.route('/metrics')
+def metrics():
+    return Response(render_latest(), mimetype=METRICS_CONTENT_TYPE)
+
+
 @app.route('/meals', methods=['GET'])
+@coalesce
 def supabase_meal_list():
     try:
-        response = supabase.table("meals").select("*").execute()
+        response = timed_execute(supabase.table("meals").select("*"), "meals", "select")
     except Exception as exc:
         return jsonify({"error": "Failed to query Supabase.", "details": str(exc)}), 500
 
@@ -199,84 +258,84 @@ def supabase_meal_list():
         return jsonify({"error": "Supabase returned an error.", "details": error_message}), 502
 
     data = response.data or []
-    normalized = [_normalize_supabase_row(item) for item in data]
-    return jsonify({"count": len(normalized), "meals": normalized})
+    normalized = [normalize_meal_row(item) for item in data]
+    # Same lagged cursor as `meal_rows_changed_since`: a row committed late below the newest seq
+    # would otherwise be skipped by the first `/api/meals/changes?since=` poll.
+    newest = max((int(item.get("seq") or 0) for item in data), default=0)
+    return jsonify({"count": len(normalized), "meals": normalized, "seq": max(0, newest - CHANGES_LAG)})
 
 
-@app.route('/meals', methods=['POST'])
-def supabase_create_meal():
-    payload = request.get_json(force=True, silent=True) or {}
+def _create_supabase_meal(payload, user_id):
     foods_payload = payload.get("foods")
     photo_hint = payload.get("photoUrl") or payload.get("photoData") or ""
-    detection = detect_calories(
-        foods=foods_payload,
-        photo_reference=photo_hint,
-        nutrition_hints=payload.get("nutritionHints"),
-    )
+    with stage("detect_calories"):
+        detection = detect_calories(
+            foods=foods_payload,
+            photo_reference=photo_hint,
+            nutrition_hints=payload.get("nutritionHints"),
+        )
 
     if not detection["foods"]:
-        return jsonify({"error": "Provide at least one food item or a photo reference."}), 400
+        return 400, {"error": "Provide at least one food item or a photo reference."}
 
     try:
         calories_value = float(payload.get("calories", detection["calories"]))
     except (TypeError, ValueError):
         calories_value = detection["calories"]
 
-    points = calculate_points(calories_value, detection["foods"])
-
-    meal = record_meal(
-        foods=detection["foods"],
-        calories=calories_value,
-        points=points,
-        notes=payload.get("notes"),
-        mood=payload.get("mood"),
-        photo=payload.get("photoUrl") or payload.get("photoData"),
-        calorie_method=detection["method"],
-        calorie_confidence=detection["confidence"],
-    )
+    with stage("calculate_points"):
+        points = calculate_points(calories_value, detection["foods"])
+
+    with stage("record_meal"):
+        meal = record_meal(
+            foods=detection["foods"],
+            calories=calories_value,
+            points=points,
+            notes=payload.get("notes"),
+            mood=payload.get("mood"),
+            photo=payload.get("photoUrl") or payload.get("photoData"),
+            calorie_method=detection["method"],
+            calorie_confidence=detection["confidence"],
+            user_id=user_id,
+        )
 
     meal_name_raw = payload.get("meal_name")
     meal_name = meal_name_raw.strip() if isinstance(meal_name_raw, str) else meal_name_raw
     calorie_for_storage = int(round(meal["calories"]))
     insert_payload = {
-        "user_id": _resolve_user_id(payload.get("user_id")),
+        "user_id": user_id,
         "meal_name": meal_name or detection["foods"][0]["name"] or "Meal",
         "calories": calorie_for_storage,
     }
-    if _SUPABASE_SUPPORTS_PAYLOAD:
-        insert_payload["payload"] = meal
-
-    try:
-        response = supabase.table("meals").insert(insert_payload).execute()
-    except Exception as exc:
-        error_message = str(exc)
-        if _maybe_disable_payload(error_message, insert_payload):
-            try:
-                response = supabase.table("meals").insert(insert_payload).execute()
-            except Exception as final_exc:
-                return jsonify({"error": "Failed to insert meal into Supabase.", "details": str(final_exc)}), 500
-        else:
-            return jsonify({"error": "Failed to insert meal into Supabase.", "details": error_message}), 500
+    insert_payload["payload"] = meal
 
-    if getattr(response, "error", None):
-        error_message = getattr(response.error, "message", str(response.error))
-        if not _maybe_disable_payload(error_message, insert_payload):
-            return jsonify({"error": "Supabase returned an error.", "details": error_message}), 502
+    with stage("supabase_insert"):
         try:
-            response = supabase.table("meals").insert(insert_payload).execute()
-        except Exception as final_exc:
-            return jsonify({"error": "Failed to insert meal into Supabase.", "details": str(final_exc)}), 500
-        if getattr(response, "error", None):
-            final_message = getattr(response.error, "message", str(response.error))
-            return jsonify({"error": "Supabase returned an error.", "details": final_message}), 502
+            insert_meal_rows([insert_payload])
+        except SupabaseInsertError as exc:
+            return exc.status, {"error": exc.error, "details": exc.details}
+    insights_scheduler().mark_dirty(user_id)
+    events_broker().publish_meal(user_id, meal, "supabase")
+
+    return 201, {**meal, "calorieExplanation": detection["explanation"]}
+
 
-    return jsonify({**meal, "calorieExplanation": detection["explanation"]}), 201
+@app.route('/meals', methods=['POST'])
+@idempotent
+def supabase_create_meal():
+    payload = request.get_json(force=True, silent=True) or {}
+    user_id = current_user_id(payload.get("user_id"))
+    if defer_requested(payload):
+        return submit_response(user_id, lambda: _create_supabase_meal(payload, user_id))
+    status, body = _create_supabase_meal(payload, user_id)
+    return jsonify(body), status
 
 
 @app.route('/summary', methods=['GET'])
+@coalesce
 def supabase_summary():
     try:
-        response = supabase.table("meals").select("*").execute()
+        response = timed_execute(supabase.table("meals").select("*"), "meals", "select")
     except Exception as exc:
         return jsonify({"error": "Failed to query Supabase.", "details": str(exc)}), 500
 
@@ -284,7 +343,7 @@ def supabase_summary():
         error_message = getattr(response.error, "message", str(response.error))
         return jsonify({"error": "Supabase returned an error.", "details": error_message}), 502
 
-    normalized = [_normalize_supabase_row(item) for item in (response.data or [])]
+    normalized = [normalize_meal_row(item) for item in (response.data or [])]
     if not normalized:
         return jsonify(
             {
@@ -0,0 +1,159 @@
+"""
+Deterministic synthetic meal histories for benchmarks and load tests.
+
+The same seed always yields the same users, foods, quantities and timestamps (relative to the
+`end` date), so results stay comparable across commits.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from utils.calorie_estimator import FOOD_LIBRARY, MacroProfile, normalize_foods
+from utils.gamification import calculate_points
+
+MEAL_SLOTS = (
+    ("breakfast", 7, 2),
+    ("lunch", 12, 2),
+    ("dinner", 19, 2),
+    ("snack", 16, 5),
+)
+UNLISTED_FOODS = ["greens", "toast", "burrito", "pizza slice", "sushi roll", "granola bar", "hummus", "soup"]
+MOODS = ["energized", "satisfied", "tired", "stressed", "happy", None]
+QUANTITY_PREFIXES = ["", "", "", "half ", "double ", "2 ", "1.5 "]
+
+
+@dataclass(frozen=True)
+class HistoryProfile:
+    """Per-user habits: how regularly they log and how adventurous their plates are."""
+
+    user_id: str
+    log_probability: float
+    skip_day_probability: float
+    foods_per_meal: int
+    favourite_foods: List[str]
+
+
+def _user_profiles(rng: random.Random, users: int) -> List[HistoryProfile]:
+    library = sorted(FOOD_LIBRARY)
+    profiles: List[HistoryProfile] = []
+    for index in range(users):
+        favourites = rng.sample(library, k=min(len(library), rng.randint(4, 10)))
+        profiles.append(
+            HistoryProfile(
+                user_id=f"user-{index:05d}",
+                log_probability=rng.uniform(0.55, 0.95),
+                skip_day_probability=rng.uniform(0.02, 0.25),
+                foods_per_meal=rng.randint(1, 4),
+                favourite_foods=favourites,
+            )
+        )
+    return profiles
+
+
+def _pick_foods(rng: random.Random, profile: HistoryProfile, library: List[str]) -> List[str]:
+    count = max(1, profile.foods_per_meal + rng.randint(-1, 1))
+    foods: List[str] = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.65:
+            name = rng.choice(profile.favourite_foods)
+        elif roll < 0.92:
+            name = rng.choice(library)
+        else:
+            name = rng.choice(UNLISTED_FOODS)
+        foods.append(f"{rng.choice(QUANTITY_PREFIXES)}{name}")
+    return foods
+
+
+def iter_raw_meals(
+    users: int = 10,
+    years: float = 1.0,
+    seed: int = 1729,
+    end: Optional[datetime] = None,
+) -> Iterator[Dict]:
+    """
+    Yields un-normalized meal submissions (what a client would POST), user by user and day by day.
+    `end` defaults to today's UTC midnight so weekly windows and current streaks are populated.
+    """
+    rng = random.Random(seed)
+    end_day = (end or datetime.utcnow()).date()
+    days = max(1, int(round(365 * years)))
+    start_day = end_day - timedelta(days=days - 1)
+    library = sorted(FOOD_LIBRARY)
+    for profile in _user_profiles(rng, users):
+        user_rng = random.Random(f"{seed}:{profile.user_id}")
+        for offset in range(days):
+            day = start_day + timedelta(days=offset)
+            if user_rng.random() < profile.skip_day_probability:
+                continue
+            for slot, hour, jitter in MEAL_SLOTS:
+                threshold = profile.log_probability * (0.4 if slot == "snack" else 1.0)
+                if user_rng.random() >= threshold:
+                    continue
+                minute = user_rng.randint(0, 59)
+                created = datetime.combine(day, time(hour=hour)) + timedelta(
+                    hours=user_rng.randint(-jitter, jitter), minutes=minute
+                )
+                yield {
+                    "user_id": profile.user_id,
+                    "foods": _pick_foods(user_rng, profile, library),
+                    "mood": user_rng.choice(MOODS),
+                    "notes": slot,
+                    "created_at": created.isoformat(),
+                }
+
+
+def _as_stored(raw: Dict) -> Dict:
+    foods = normalize_foods(raw["foods"])
+    calories = round(sum(float(food["calories"]) for food in foods), 1)
+    return {
+        **raw,
+        "foods": foods,
+        "calories": calories,
+        "points": calculate_points(calories, foods),
+        "calorie_method": "manual",
+        "calorie_confidence": 0.92,
+    }
+
+
+def iter_meals(
+    users: int = 10,
+    years: float = 1.0,
+    seed: int = 1729,
+    end: Optional[datetime] = None,
+) -> Iterator[Dict]:
+    """Like `iter_raw_meals`, but with foods normalized and calories/points filled in as the API stores them."""
+    for raw in iter_raw_meals(users=users, years=years, seed=seed, end=end):
+        yield _as_stored(raw)
+
+
+def user_history(user_index: int = 0, years: float = 1.0, seed: int = 1729, end: Optional[datetime] = None) -> List[Dict]:
+    """One user's full history, newest first, shaped like `data_store.meals()` output."""
+    user_id = f"user-{user_index:05d}"
+    history = [
+        _as_stored(raw)
+        for raw in iter_raw_meals(users=user_index + 1, years=years, seed=seed, end=end)
+        if raw["user_id"] == user_id
+    ]
+    history.reverse()
+    for position, meal in enumerate(history):
+        meal["id"] = len(history) - position
+    return history
+
+
+def food_library(size: int = 5000, seed: int = 1729) -> Dict[str, MacroProfile]:
+    """`FOOD_LIBRARY` padded with `size` synthetic foods, e.g. for planning over a large catalogue."""
+    rng = random.Random(seed)
+    stems = list(FOOD_LIBRARY) + UNLISTED_FOODS
+    library = dict(FOOD_LIBRARY)
+    for index in range(size):
+        calories = rng.uniform(20, 700)
+        protein = rng.uniform(0, calories / 8)
+        carbs = rng.uniform(0, (calories - protein * 4) / 4)
+        fat = max(0.0, (calories - protein * 4 - carbs * 4) / 9)
+        library[f"{rng.choice(stems)} #{index}"] = MacroProfile(round(calories), round(protein, 1), round(carbs, 1), round(fat, 1))
+    return library
@@ -0,0 +1,381 @@
+"""
+Microbenchmarks for the backend hot paths.
+
+    cd backend
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --compare bench.json --fail-on-regression
+
+Every case runs against histories from `benchmarks.generator`, so two runs with the same
+`--seed`/`--years` on different commits measure the same work.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+from dataclasses import dataclass
+from datetime import datetime
+from fnmatch import fnmatch
+from typing import Callable, Dict, Iterable, List, Optional
+
+import data_store
+from benchmarks.generator import food_library, iter_raw_meals, user_history
+from utils import achievements, calorie_estimator, calories_detect, food_text, gamification, meal_plan
+
+BATCH_SIZE = 256
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    batch: int = 1
+    teardown: Optional[Callable[[], None]] = None
+
+
+def _reset_store() -> None:
+    data_store._meals.clear()
+    data_store._profile_history.clear()
+    data_store._all_time_leaderboard.clear()
+    data_store._weekly_leaderboard.clear()
+    data_store._achievements.clear()
+    data_store._archive.clear()
+    data_store._similarity.clear()
+    del data_store._change_log[:]
+
+
+def _load_store(history: List[Dict]) -> None:
+    _reset_store()
+    for meal in reversed(history):
+        data_store.record_meal(
+            foods=meal["foods"],
+            calories=meal["calories"],
+            points=meal["points"],
+            mood=meal["mood"],
+            notes=meal["notes"],
+            calorie_method=meal["calorie_method"],
+            calorie_confidence=meal["calorie_confidence"],
+            created_at=meal["created_at"],
+            user_id=meal["user_id"],
+        )
+
+
+def _raw_batch(seed: int) -> List[Dict]:
+    batch: List[Dict] = []
+    for raw in iter_raw_meals(users=8, years=0.25, seed=seed):
+        batch.append(raw)
+        if len(batch) == BATCH_SIZE:
+            break
+    return batch
+
+
+def _estimator_cases(seed: int) -> List[Case]:
+    raw = _raw_batch(seed)
+    structured = [
+        [{"name": label, "quantity": 1, "calories": 0} for label in meal["foods"]]
+        for meal in raw
+    ]
+
+    def normalize_strings():
+        return lambda: [calorie_estimator.normalize_foods(meal["foods"]) for meal in raw]
+
+    def normalize_dicts():
+        return lambda: [calorie_estimator.normalize_foods(foods) for foods in structured]
+
+    def estimate():
+        return lambda: [calorie_estimator.estimate_calories(meal["foods"]) for meal in raw]
+
+    return [
+        Case("calorie_estimator.normalize_foods[strings]", normalize_strings, BATCH_SIZE),
+        Case("calorie_estimator.normalize_foods[dicts]", normalize_dicts, BATCH_SIZE),
+        Case("calorie_estimator.estimate_calories", estimate, BATCH_SIZE),
+    ]
+
+
+def _detect_cases(seed: int) -> List[Case]:
+    raw = _raw_batch(seed)
+    photos = [f"https://img.example/{index}.jpg" for index in range(BATCH_SIZE)]
+
+    def manual():
+        return lambda: [calories_detect.detect_calories(foods=meal["foods"]) for meal in raw]
+
+    def hints():
+        return lambda: [calories_detect.detect_calories(nutrition_hints=meal["foods"]) for meal in raw]
+
+    def photo():
+        return lambda: [calories_detect.detect_calories(photo_reference=ref) for ref in photos]
+
+    return [
+        Case("calories_detect.detect_calories[manual]", manual, BATCH_SIZE),
+        Case("calories_detect.detect_calories[hint]", hints, BATCH_SIZE),
+        Case("calories_detect.detect_calories[photo]", photo, BATCH_SIZE),
+    ]
+
+
+def _free_text_batch(seed: int) -> List[str]:
+    """Each generated meal written as one sentence: "2 eggs with spinach and half banana"."""
+    rng = random.Random(seed)
+    connectors = [" and ", " with ", ", ", " & ", " plus a side of "]
+    texts = []
+    for meal in _raw_batch(seed):
+        foods = meal["foods"]
+        text = foods[0]
+        for food in foods[1:]:
+            text += rng.choice(connectors) + food
+        texts.append(text)
+    return texts
+
+
+def _food_text_cases(seed: int) -> List[Case]:
+    texts = _free_text_batch(seed)
+    patterns = {name: name for name in food_library(5000, seed)}
+    patterns.update(calorie_estimator.FOOD_ALIASES)
+    large = food_text.FoodMatcher(patterns)
+
+    def default():
+        food_text.default_matcher()
+        return lambda: [food_text.parse_food_text(text) for text in texts]
+
+    def large_library():
+        return lambda: [food_text.parse_food_text(text, large) for text in texts]
+
+    def detect():
+        return lambda: [calories_detect.detect_calories(foods=[text]) for text in texts]
+
+    return [
+        Case("food_text.parse_food_text[library]", default, len(texts)),
+        Case("food_text.parse_food_text[foods=5000]", large_library, len(texts)),
+        Case("calories_detect.detect_calories[text]", detect, len(texts)),
+    ]
+
+
+def _meal_plan_cases(seed: int) -> List[Case]:
+    libraries = {"default": None, "foods=5000": food_library(5000, seed)}
+    targets = ((2000, 120, 1), (2800, 180, 7))
+
+    def planner(library, calories: int, protein_min: int, days: int) -> Callable[[], Callable[[], object]]:
+        return lambda: lambda: meal_plan.plan_meals(calories, protein_min, days, library=library)
+
+    return [
+        Case(f"meal_plan.plan_meals[{label},kcal={calories},protein={protein_min},days={days}]", planner(library, calories, protein_min, days))
+        for label, library in libraries.items()
+        for calories, protein_min, days in targets
+    ]
+
+
+def _gamification_cases(seed: int, years: float) -> List[Case]:
+    history = user_history(years=years, seed=seed)
+    weekly = gamification.weekly_summary(history)
+    sample = history[:BATCH_SIZE]
+    suffix = f"[years={years:g},meals={len(history)}]"
+    per_history = {
+        "summarize_achievements": lambda: gamification.summarize_achievements(history, weekly),
+        "weekly_summary": lambda: gamification.weekly_summary(history),
+        "streak_report": lambda: gamification.streak_report(history),
+        "coaching_tips": lambda: gamification.coaching_tips(history, weekly),
+        "_longest_streak": lambda: gamification._longest_streak(history),
+        "_current_streak": lambda: gamification._current_streak(history),
+        "_unique_foods": lambda: gamification._unique_foods(history),
+        "_weekly_window": lambda: gamification._weekly_window(history),
+        "_weekly_variety": lambda: gamification._weekly_variety(history),
+        "_daily_totals": lambda: gamification._daily_totals(history),
+    }
+    cases = [Case(f"gamification.{name}{suffix}", (lambda fn=fn: fn)) for name, fn in per_history.items()]
+    cases.append(Case(f"achievements.aggregate_meals{suffix}", lambda: lambda: achievements.aggregate_meals(history)))
+
+    def engine_report():
+        engine = achievements.AchievementEngine()
+        for meal in reversed(history):
+            engine.record("bench", meal)
+        return lambda: engine.report("bench")
+
+    def engine_record():
+        engine = achievements.AchievementEngine()
+        for meal in reversed(history):
+            engine.record("bench", meal)
+        latest = dict(history[0], created_at=datetime.utcnow().isoformat())
+        return lambda: engine.record("bench", latest)
+
+    cases.append(Case(f"achievements.AchievementEngine.report{suffix}", engine_report))
+    cases.append(Case(f"achievements.AchievementEngine.record{suffix}", engine_record))
+    cases.append(
+        Case(
+            "gamification.calculate_points",
+            lambda: lambda: [gamification.calculate_points(meal["calories"], meal["foods"]) for meal in sample],
+            len(sample),
+        )
+    )
+    cases.append(
+        Case(
+            "gamification._parse_date",
+            lambda: lambda: [gamification._parse_date(meal["created_at"]) for meal in sample],
+            len(sample),
+        )
+    )
+    return cases
+
+
+def _store_cases(seed: int, years: float) -> List[Case]:
+    history = user_history(years=years, seed=seed)
+    suffix = f"[years={years:g},meals={len(history)}]"
+    template = history[0]
+    weights = itertools.cycle((72.5, 72.6))
+
+    def loaded(fn: Callable[[], object]) -> Callable[[], Callable[[], object]]:
+        def setup():
+            _load_store(history)
+            return fn
+
+        return setup
+
+    def record():
+        return data_store.record_meal(
+            foods=template["foods"],
+            calories=template["calories"],
+            points=template["points"],
+            mood=template["mood"],
+            notes=template["notes"],
+        )
+
+    cases = [
+        Case(f"data_store.record_meal{suffix}", loaded(record)),
+        Case(f"data_store.meals{suffix}", loaded(data_store.meals)),
+        Case(f"data_store.meals_since[7d]{suffix}", loaded(lambda: data_store.meals_since(7))),
+        Case(f"data_store.meals_since[30d]{suffix}", loaded(lambda: data_store.meals_since(30))),
+        Case(f"data_store.meal_count{suffix}", loaded(data_store.meal_count)),
+        Case(f"data_store.total_points{suffix}", loaded(data_store.total_points)),
+        Case(f"data_store.user_profile{suffix}", loaded(data_store.user_profile)),
+        # Alternating weights, so every call records a point instead of hitting the unchanged case.
+        Case(f"data_store.update_profile{suffix}", loaded(lambda: data_store.update_profile(175.0, next(weights)))),
+        Case(f"data_store.changes_since[last 10]{suffix}", loaded(lambda: data_store.changes_since(len(history) - 10))),
+        Case(f"data_store.meal_by_id{suffix}", loaded(lambda: data_store.meal_by_id(len(history) // 2))),
+        Case(f"data_store.similar_meals[10]{suffix}", loaded(lambda: data_store.similar_meals(template, 10))),
+        Case(
+            f"data_store.similar_meals[10,max_calories=400]{suffix}",
+            loaded(lambda: data_store.similar_meals(template, 10, max_calories=400)),
+        ),
+        Case(f"data_store.leaderboard.top[10]{suffix}", loaded(lambda: data_store.leaderboard("all").top(10))),
+        Case(f"data_store.leaderboard.rank{suffix}", loaded(lambda: data_store.leaderboard("all").rank(template["user_id"]))),
+    ]
+    for case in cases:
+        case.teardown = _reset_store
+    return cases
+
+
+def build_cases(seed: int, years: Iterable[float]) -> List[Case]:
+    cases = _estimator_cases(seed) + _detect_cases(seed) + _food_text_cases(seed) + _meal_plan_cases(seed)
+    for span in years:
+        cases.extend(_gamification_cases(seed, span))
+        cases.extend(_store_cases(seed, span))
+    unique: Dict[str, Case] = {}
+    for case in cases:
+        unique.setdefault(case.name, case)
+    return list(unique.values())
+
+
+def measure(case: Case, repeat: int, min_time: float) -> Dict[str, float]:
+    fn = case.setup()
+    try:
+        timer = timeit.Timer(fn)
+        number, elapsed = timer.autorange()
+        if elapsed < min_time:
+            number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+        runs = timer.repeat(repeat=repeat, number=number)
+    finally:
+        if case.teardown:
+            case.teardown()
+    per_op = [run / (number * case.batch) for run in runs]
+    median = statistics.median(per_op)
+    return {
+        "min_us": round(min(per_op) * 1e6, 3),
+        "median_us": round(median * 1e6, 3),
+        "ops_per_sec": round(1 / median, 1) if median else 0.0,
+        "number": number,
+        "batch": case.batch,
+        "repeat": repeat,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Prints a ratio table and returns the names of cases slower than baseline by more than `threshold`."""
+    regressions: List[str] = []
+    print(f"\n{'case':<72} {'base µs':>10} {'now µs':>10} {'ratio':>7}")
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before or not before.get("median_us"):
+            print(f"{name:<72} {'—':>10} {result['median_us']:>10.3f} {'new':>7}")
+            continue
+        ratio = result["median_us"] / before["median_us"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<72} {before['median_us']:>10.3f} {result['median_us']:>10.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=1729)
+    parser.add_argument("--years", default="1,5", help="comma-separated history lengths in years")
+    parser.add_argument("--filter", default="*", help="glob over case names, e.g. 'gamification.*'")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from a previous run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    years = [float(value) for value in args.years.split(",") if value.strip()]
+    results: Dict[str, Dict] = {}
+    for case in build_cases(args.seed, years):
+        if not fnmatch(case.name, args.filter):
+            continue
+        results[case.name] = measure(case, args.repeat, args.min_time)
+        stats = results[case.name]
+        print(f"{case.name:<72} {stats['median_us']:>12.3f} µs/op  {stats['ops_per_sec']:>12.1f} op/s")
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "years": years,
+            "timestamp": datetime.utcnow().isoformat(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,19 @@
 from __future__ import annotations
 
+import logging
+import os
+import threading
+from array import array
 from dataclasses import dataclass, asdict, field
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.achievements import Aggregates, AchievementEngine, UnlockStore
+from utils.identity import DEFAULT_USER_ID
+from utils.leaderboard import Leaderboard, WeeklyLeaderboard
+from utils.meal_archive import Segment, SegmentArchive
+from utils.similarity import SimilarityIndex
+from utils.timeseries import ProfileSeries
 
 
 @dataclass
@@ -16,15 +27,113 @@ class Meal:
     photo: Optional[str]
     calorie_method: str
     calorie_confidence: float
+    user_id: str = DEFAULT_USER_ID
     created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    seq: int = 0
 
 
 _meals: List[Meal] = []
-_user_profile: Dict[str, Optional[float]] = {"height": None, "weight": None}
+_profile_history: Dict[str, ProfileSeries] = {}
+_all_time_leaderboard = Leaderboard()
+_weekly_leaderboard = WeeklyLeaderboard()
+_achievements = AchievementEngine(UnlockStore(os.getenv("ACHIEVEMENTS_PATH")))
+_similarity = SimilarityIndex()
+# Change log: the id of the meal written at each sequence number (seq n is entry n - 1), 8 bytes a write.
+_change_log = array("q")
+
+# Retention: `_meals` is the hot window of live objects; meals older than HOT_WINDOW_DAYS or beyond
+# the newest HOT_WINDOW_ENTRIES are compacted into memory-mapped segments. 0 disables a limit.
+_HOT_WINDOW_DAYS = float(os.getenv("HOT_WINDOW_DAYS") or 0)
+_HOT_WINDOW_ENTRIES = int(os.getenv("HOT_WINDOW_ENTRIES") or 0)
+_COMPACT_EVERY = 256
+_archive = SegmentArchive(os.getenv("MEAL_SEGMENT_DIR"))
+_tier_lock = threading.Lock()
+_compaction_lock = threading.Lock()
+_writes_since_compaction = 0
+# Compaction writes a whole segment, so it runs on one background thread rather than in the
+# `record_meal` call that crossed the threshold.
+_compaction_wanted = threading.Event()
+_compactor: Optional[threading.Thread] = None
+_compactor_lock = threading.Lock()
+_logger = logging.getLogger(__name__)
 
 
 def _next_meal_id() -> int:
-    return len(_meals) + 1
+    return len(_meals) + len(_archive) + 1
+
+
+def _logged_at(created_at: Optional[str]) -> datetime:
+    try:
+        return datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        return datetime.utcnow()
+
+
+def _record_logged_at(meal: Dict) -> datetime:
+    return _logged_at(meal.get("created_at"))
+
+
+def _tiers() -> Tuple[List[Meal], List[Segment]]:
+    """A consistent view of the hot window and the published segments."""
+    with _tier_lock:
+        return list(_meals), _archive.segments()
+
+
+def compact() -> int:
+    """Move meals outside the hot window into a new segment; returns how many were moved."""
+    global _writes_since_compaction
+    if not _compaction_lock.acquire(blocking=False):
+        return 0
+    try:
+        _writes_since_compaction = 0
+        hot = list(_meals)
+        cutoff = datetime.utcnow() - timedelta(days=_HOT_WINDOW_DAYS) if _HOT_WINDOW_DAYS else None
+        keep = [meal for meal in hot if cutoff is None or _logged_at(meal.created_at) >= cutoff]
+        if _HOT_WINDOW_ENTRIES:
+            keep = keep[:_HOT_WINDOW_ENTRIES]
+        if len(keep) == len(hot):
+            return 0
+        kept = {id(meal) for meal in keep}
+        # Segments only serialize the records, so the field dicts can be passed without asdict's deep copy.
+        moved = [vars(meal) for meal in hot if id(meal) not in kept]
+        segment = _archive.write(moved, _record_logged_at)
+        with _tier_lock:
+            # Meals recorded while the segment was being written are at the front of `_meals`.
+            _meals[:] = _meals[: len(_meals) - len(hot)] + keep
+            _archive.publish(segment)
+        return len(moved)
+    finally:
+        _compaction_lock.release()
+
+
+def _maybe_compact() -> None:
+    global _writes_since_compaction
+    if not (_HOT_WINDOW_DAYS or _HOT_WINDOW_ENTRIES):
+        return
+    _writes_since_compaction += 1
+    # Let the window overshoot a little so each segment holds a batch rather than one meal.
+    overflow = _HOT_WINDOW_ENTRIES and len(_meals) >= _HOT_WINDOW_ENTRIES + max(1, _HOT_WINDOW_ENTRIES // 8)
+    if overflow or _writes_since_compaction >= _COMPACT_EVERY:
+        _start_compactor()
+        _compaction_wanted.set()
+
+
+def _start_compactor() -> None:
+    global _compactor
+    with _compactor_lock:
+        if _compactor is None or not _compactor.is_alive():
+            _compactor = threading.Thread(target=_compact_forever, name="meal-compactor", daemon=True)
+            _compactor.start()
+
+
+def _compact_forever() -> None:
+    while True:
+        _compaction_wanted.wait()
+        _compaction_wanted.clear()
+        try:
+            compact()
+        except Exception:
+            _logger.exception("Compacting the hot window failed; retrying on a later write.")
 
 
 def record_meal(
@@ -36,54 +145,159 @@ def record_meal(
     photo: Optional[str] = None,
     calorie_method: str = "manual",
     calorie_confidence: float = 0.0,
+    created_at: Optional[str] = None,
+    user_id: str = DEFAULT_USER_ID,
 ) -> Dict:
-    meal = Meal(
-        id=_next_meal_id(),
-        foods=foods,
-        calories=round(calories, 1),
-        points=points,
-        mood=mood,
-        notes=notes,
-        photo=photo,
-        calorie_method=calorie_method,
-        calorie_confidence=round(calorie_confidence, 2),
-    )
-    _meals.insert(0, meal)
-    return asdict(meal)
+    with _tier_lock:
+        meal = Meal(
+            id=_next_meal_id(),
+            foods=foods,
+            calories=round(calories, 1),
+            points=points,
+            mood=mood,
+            notes=notes,
+            photo=photo,
+            calorie_method=calorie_method,
+            calorie_confidence=round(calorie_confidence, 2),
+            user_id=user_id,
+        )
+        if created_at:
+            meal.created_at = created_at
+        _meals.insert(0, meal)
+        _change_log.append(meal.id)
+        meal.seq = len(_change_log)
+    _all_time_leaderboard.add(user_id, points)
+    _weekly_leaderboard.add(user_id, points, _logged_at(meal.created_at))
+    stored = asdict(meal)
+    _achievements.record(user_id, stored)
+    _similarity.add(user_id, meal.id, stored)
+    _maybe_compact()
+    return stored
+
+
+def meals(user_id: Optional[str] = None) -> List[Dict]:
+    return list(iter_meals(user_id))
 
 
-def meals() -> List[Dict]:
-    return [asdict(meal) for meal in _meals]
+def iter_meals(user_id: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Newest first: the hot window, then archived segments. Converts one meal at a time so exports
+    never hold the whole history as dicts.
+    """
+    hot, segments = _tiers()
+    for meal in hot:
+        if user_id is None or meal.user_id == user_id:
+            yield asdict(meal)
+    yield from _archive.iter_meals(segments, user_id)
+
+
+def meal_by_id(meal_id: int) -> Optional[Dict]:
+    with _tier_lock:
+        # Ids only grow and new meals go to the front, so the hot window is sorted by descending id.
+        low, high = 0, len(_meals)
+        while low < high:
+            middle = (low + high) // 2
+            if _meals[middle].id > meal_id:
+                low = middle + 1
+            else:
+                high = middle
+        hot = _meals[low] if low < len(_meals) and _meals[low].id == meal_id else None
+        segments = _archive.segments()
+    if hot is not None:
+        return asdict(hot)
+    return _archive.get(meal_id, segments)
+
+
+def similar_meals(meal: Dict, limit: int = 10, max_calories: Optional[float] = None) -> List[Dict]:
+    """The owner's meals closest to `meal` by macro split and calories, nearest first, with `distance`."""
+    similar = []
+    for distance, meal_id in _similarity.nearest(meal.get("user_id") or DEFAULT_USER_ID, meal, limit, max_calories):
+        match = meal_by_id(meal_id)
+        if match is not None:
+            similar.append({**match, "distance": distance})
+    return similar
+
+
+def change_seq() -> int:
+    """The sequence number of the latest meal write (0 before the first one)."""
+    return len(_change_log)
+
+
+def changes_since(since: int, limit: int = 500) -> Tuple[List[Dict], int]:
+    """
+    Meals written after sequence `since`, in write order and in their current state, plus the
+    sequence number to resume from. Reads at most `limit` log entries.
+    """
+    with _tier_lock:
+        written = _change_log[since : since + limit]
+    latest: Dict[int, int] = {}
+    for offset, meal_id in enumerate(written):
+        latest[meal_id] = since + offset + 1
+    changed = []
+    for meal_id in sorted(latest, key=latest.__getitem__):
+        meal = meal_by_id(meal_id)
+        if meal is not None:
+            changed.append(meal)
+    return changed, since + len(written)
 
 
 def meals_since(days: int) -> List[Dict]:
     cutoff = datetime.utcnow() - timedelta(days=days)
-    recent: List[Dict] = []
-    for meal in _meals:
-        try:
-            created_at = datetime.fromisoformat(meal.created_at)
-        except ValueError:
-            created_at = datetime.utcnow()
-        if created_at >= cutoff:
-            recent.append(asdict(meal))
+    hot, segments = _tiers()
+    recent = [asdict(meal) for meal in hot if _logged_at(meal.created_at) >= cutoff]
+    recent.extend(_archive.iter_since(cutoff, _record_logged_at, segments))
     return recent
 
 
 def meal_count() -> int:
-    return len(_meals)
+    with _tier_lock:
+        return len(_meals) + len(_archive)
 
 
 def total_points() -> int:
-    return sum(meal.points for meal in _meals)
+    with _tier_lock:
+        hot, archived = list(_meals), _archive.points
+    return sum(meal.points for meal in hot) + archived
+
+
+def achievement_report(user_id: str = DEFAULT_USER_ID) -> List[Dict]:
+    return _achievements.report(user_id)
+
+
+def user_aggregates(user_id: str = DEFAULT_USER_ID) -> Aggregates:
+    return _achievements.aggregates(user_id)
+
+
+def leaderboard(period: str = "all") -> Leaderboard:
+    if period == "weekly":
+        return _weekly_leaderboard.current()
+    return _all_time_leaderboard
+
+
+def leaderboard_week() -> str:
+    year, week = _weekly_leaderboard.week
+    return f"{year}-W{week:02d}"
+
+
+def user_profile(user_id: str = DEFAULT_USER_ID) -> Dict[str, Optional[float]]:
+    height, weight = profile_history(user_id).latest()
+    return {"height": height, "weight": weight}
 
 
-def user_profile() -> Dict[str, Optional[float]]:
-    return _user_profile
+def update_profile(
+    height: Optional[float],
+    weight: Optional[float],
+    user_id: str = DEFAULT_USER_ID,
+    recorded_at: Optional[datetime] = None,
+) -> Dict[str, Optional[float]]:
+    series = _profile_history.get(user_id)
+    if series is None:
+        series = _profile_history.setdefault(user_id, ProfileSeries())
+    # Each point carries the user's full profile after the update, so a weight-only update keeps
+    # their height; an update that changes nothing adds no point.
+    height, weight = series.record(recorded_at or datetime.utcnow(), height, weight)
+    return {"height": height, "weight": weight}
 
 
-def update_profile(height: Optional[float], weight: Optional[float]) -> Dict[str, Optional[float]]:
-    if height is not None:
-        _user_profile["height"] = height
-    if weight is not None:
-        _user_profile["weight"] = weight
-    return _user_profile
+def profile_history(user_id: str = DEFAULT_USER_ID) -> ProfileSeries:
+    return _profile_history.get(user_id) or ProfileSeries()
@@ -0,0 +1,364 @@
+"""
+Local stand-in for the Supabase REST (PostgREST) API, for load tests that must not touch the real project.
+
+    cd backend
+    python -m loadtest.fake_postgrest --port 54321 --latency-ms 15 --seed-users 50
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=local python app.py
+
+Implements the subset of PostgREST the backend uses on `/rest/v1/<table>`: GET with `select`,
+`eq/neq/gt/gte/lt/lte/in` filters, `order`, `limit`/`offset` or a `Range` header; POST of one row or a
+list; PATCH and DELETE with filters. Inserts and updates stamp `seq` from one counter, like the sequence
+default and update trigger on the real `meals` table. Tables have fixed column sets, so dropping `payload`
+from `meals` (`--no-payload-column`) reproduces the PGRST204 error that drives the backend's payload fallback.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+MEAL_COLUMNS = {"id", "user_id", "meal_name", "calories", "payload", "created_at", "seq"}
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+
+class Table:
+    def __init__(self, name: str, columns: Set[str]) -> None:
+        self.name = name
+        self.columns = set(columns)
+        self.rows: List[Dict] = []
+        self._next_id = 1
+        self._seq = 0
+        self.lock = threading.Lock()
+
+    def bump(self, row: Dict) -> None:
+        """Stamp `row` with the next change sequence, like the `seq` default + update trigger. Hold `lock`."""
+        if "seq" in self.columns:
+            self._seq += 1
+            row["seq"] = self._seq
+
+    def insert(self, rows: List[Dict]) -> Tuple[Optional[List[Dict]], Optional[Dict]]:
+        for row in rows:
+            unknown = set(row) - self.columns
+            if unknown:
+                column = sorted(unknown)[0]
+                return None, {
+                    "code": "PGRST204",
+                    "details": None,
+                    "hint": None,
+                    "message": f"Could not find the '{column}' column of '{self.name}' in the schema cache",
+                }
+        created: List[Dict] = []
+        with self.lock:
+            for row in rows:
+                stored = {column: None for column in self.columns}
+                stored.update(row)
+                if stored.get("id") is None:
+                    stored["id"] = self._next_id
+                self._next_id = max(self._next_id, int(stored["id"])) + 1
+                if "created_at" in self.columns and not stored.get("created_at"):
+                    stored["created_at"] = datetime.utcnow().isoformat()
+                self.bump(stored)
+                self.rows.append(stored)
+                created.append(dict(stored))
+        return created, None
+
+
+def _coerce(raw: str):
+    if raw == "null":
+        return None
+    if raw in {"true", "false"}:
+        return raw == "true"
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        return float(raw)
+    except ValueError:
+        return raw
+
+
+def _comparable(left, right) -> bool:
+    return left is not None and right is not None
+
+
+_OPERATORS: Dict[str, Callable[[object, object], bool]] = {
+    "eq": lambda value, target: value == target or str(value) == str(target),
+    "neq": lambda value, target: not (value == target or str(value) == str(target)),
+    "gt": lambda value, target: _comparable(value, target) and value > target,
+    "gte": lambda value, target: _comparable(value, target) and value >= target,
+    "lt": lambda value, target: _comparable(value, target) and value < target,
+    "lte": lambda value, target: _comparable(value, target) and value <= target,
+    "is": lambda value, target: value is target,
+}
+
+
+def _parse_filters(params: List[Tuple[str, str]]) -> List[Callable[[Dict], bool]]:
+    filters: List[Callable[[Dict], bool]] = []
+    for column, expression in params:
+        if column in _RESERVED_PARAMS or "." not in expression:
+            continue
+        operator, _, raw = expression.partition(".")
+        negate = operator == "not"
+        if negate:
+            operator, _, raw = raw.partition(".")
+        if operator == "in":
+            options = {str(_coerce(item.strip().strip('"'))) for item in raw.strip("()").split(",") if item}
+            predicate = lambda row, column=column, options=options: str(row.get(column)) in options
+        elif operator in _OPERATORS:
+            compare, target = _OPERATORS[operator], _coerce(raw)
+
+            def predicate(row, column=column, compare=compare, target=target):
+                value = row.get(column)
+                if isinstance(value, (int, float)) and isinstance(target, str):
+                    return False
+                if isinstance(target, (int, float)) and isinstance(value, str):
+                    try:
+                        value = type(target)(value)
+                    except ValueError:
+                        return False
+                try:
+                    return compare(value, target)
+                except TypeError:
+                    return False
+
+        else:
+            continue
+        filters.append((lambda row, p=predicate: not p(row)) if negate else predicate)
+    return filters
+
+
+def _sort_key(column: str):
+    def key(row: Dict):
+        value = row.get(column)
+        return (value is None, value if value is not None else 0)
+
+    return key
+
+
+class FakePostgrest:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        payload_column: bool = True,
+        seed: int = 7,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        columns = set(MEAL_COLUMNS)
+        if not payload_column:
+            columns.discard("payload")
+        self.tables: Dict[str, Table] = {"meals": Table("meals", columns)}
+        self.requests = 0
+
+    def table(self, name: str) -> Optional[Table]:
+        return self.tables.get(name)
+
+    def delay(self) -> None:
+        if self.latency_ms or self.jitter_ms:
+            pause = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(0.0, pause) / 1000)
+
+    def inject_error(self) -> bool:
+        return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def seed_meals(self, users: int, years: float, seed: int) -> int:
+        from benchmarks.generator import iter_meals
+
+        rows = []
+        for meal in iter_meals(users=users, years=years, seed=seed):
+            payload = {key: value for key, value in meal.items() if key != "user_id"}
+            row = {
+                "user_id": meal["user_id"],
+                "meal_name": meal["foods"][0]["name"] if meal["foods"] else "Meal",
+                "calories": int(round(meal["calories"])),
+                "created_at": meal["created_at"],
+            }
+            if "payload" in self.tables["meals"].columns:
+                row["payload"] = payload
+            rows.append(row)
+        table = self.tables["meals"]
+        created, _ = table.insert(rows)
+        for row in table.rows:
+            if isinstance(row.get("payload"), dict):
+                row["payload"]["id"] = row["id"]
+        return len(created or [])
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # noqa: A002 - signature fixed by BaseHTTPRequestHandler
+                return
+
+            def _send(self, status: int, body, headers: Optional[Dict[str, str]] = None) -> None:
+                data = b"" if body is None else json.dumps(body, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _route(self):
+                server.requests += 1
+                # Always drain the body: postgrest-py sends `{}` even on GET, which would otherwise
+                # corrupt the next request on this keep-alive connection.
+                length = int(self.headers.get("Content-Length") or 0)
+                self._raw_body = self.rfile.read(length) if length else b""
+                parts = urlsplit(self.path)
+                segments = [segment for segment in parts.path.split("/") if segment]
+                if len(segments) != 3 or segments[:2] != ["rest", "v1"]:
+                    self._send(404, {"message": f"Unknown path {parts.path}"})
+                    return None, None
+                table = server.table(segments[2])
+                if table is None:
+                    self._send(404, {"code": "42P01", "message": f'relation "public.{segments[2]}" does not exist'})
+                    return None, None
+                server.delay()
+                if server.inject_error():
+                    self._send(503, {"code": "PGRST000", "message": "Injected upstream failure"})
+                    return None, None
+                return table, parse_qsl(parts.query, keep_blank_values=True)
+
+            def _body(self):
+                return json.loads(self._raw_body.decode("utf-8")) if self._raw_body else None
+
+            def _matching(self, table: Table, params: List[Tuple[str, str]]) -> List[Dict]:
+                filters = _parse_filters(params)
+                with table.lock:
+                    return [row for row in table.rows if all(check(row) for check in filters)]
+
+            def do_GET(self):
+                table, params = self._route()
+                if table is None:
+                    return
+                rows = self._matching(table, params)
+                options = dict(params)
+                for clause in reversed([item for item in options.get("order", "").split(",") if item]):
+                    column, *modifiers = clause.split(".")
+                    rows.sort(key=_sort_key(column), reverse="desc" in modifiers)
+                total = len(rows)
+                start, end = 0, None
+                if "offset" in options or "limit" in options:
+                    start = int(options.get("offset") or 0)
+                    if options.get("limit"):
+                        end = start + int(options["limit"]) - 1
+                elif self.headers.get("Range"):
+                    first, _, last = self.headers["Range"].partition("-")
+                    start, end = int(first or 0), int(last) if last else None
+                window = rows[start : (end + 1) if end is not None else None]
+                select = options.get("select", "*")
+                if select and select != "*":
+                    wanted = [column.strip() for column in select.split(",")]
+                    window = [{column: row.get(column) for column in wanted} for row in window]
+                last_index = start + len(window) - 1
+                content_range = f"{start}-{last_index}/{total}" if window else f"*/{total}"
+                self._send(200, window, {"Content-Range": content_range})
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_POST(self):
+                table, _params = self._route()
+                if table is None:
+                    return
+                body = self._body()
+                rows = body if isinstance(body, list) else [body or {}]
+                created, error = table.insert(rows)
+                if error:
+                    self._send(400, error)
+                    return
+                prefer = self.headers.get("Prefer") or ""
+                self._send(201, created if "return=minimal" not in prefer else None)
+
+            def do_PATCH(self):
+                table, params = self._route()
+                if table is None:
+                    return
+                changes = self._body() or {}
+                unknown = set(changes) - table.columns
+                if unknown:
+                    self._send(400, {"code": "PGRST204", "message": f"Could not find the '{sorted(unknown)[0]}' column"})
+                    return
+                updated = []
+                for row in self._matching(table, params):
+                    with table.lock:
+                        row.update(changes)
+                        table.bump(row)
+                    updated.append(dict(row))
+                self._send(200, updated)
+
+            def do_DELETE(self):
+                table, params = self._route()
+                if table is None:
+                    return
+                doomed = self._matching(table, params)
+                doomed_ids = {id(row) for row in doomed}
+                with table.lock:
+                    table.rows = [row for row in table.rows if id(row) not in doomed_ids]
+                self._send(200, doomed)
+
+        return Handler
+
+    def serve(self, host: str = "127.0.0.1", port: int = 54321) -> ThreadingHTTPServer:
+        httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        httpd.daemon_threads = True
+        return httpd
+
+
+def start_in_thread(fake: FakePostgrest, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    httpd = fake.serve(host, port)
+    threading.Thread(target=httpd.serve_forever, name="fake-postgrest", daemon=True).start()
+    return httpd
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- jitter around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--no-payload-column", action="store_true", help="reject inserts that include `payload`")
+    parser.add_argument("--seed-users", type=int, default=0, help="preload synthetic meals for N users")
+    parser.add_argument("--seed-years", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1729)
+    args = parser.parse_args(argv)
+
+    fake = FakePostgrest(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        payload_column=not args.no_payload_column,
+    )
+    if args.seed_users:
+        print(f"seeded {fake.seed_meals(args.seed_users, args.seed_years, args.seed)} meals")
+    httpd = fake.serve(args.host, args.port)
+    print(f"fake PostgREST listening on http://{args.host}:{httpd.server_address[1]}/rest/v1/")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Closed-loop load generator for the meal endpoints.
+
+Against an already running backend:
+
+    python -m loadtest.run --target http://127.0.0.1:5000 --api-key "$API_SECRET" --concurrency 16 --duration 30
+
+Self-contained (starts the fake PostgREST and a threaded backend in subprocesses):
+
+    python -m loadtest.run --spawn --latency-ms 20 --seed-users 20 --concurrency 16 --duration 30
+
+Each worker keeps one HTTP/1.1 connection and issues requests back to back, picking endpoints
+by `--mix` weight. Reports throughput and p50/p95/p99 latency per endpoint.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.generator import iter_raw_meals
+
+DEFAULT_MIX = "GET /meals=3,POST /meals=2,GET /summary=2,GET /api/meals/insights=3"
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_mix(raw: str) -> List[Tuple[str, str, float]]:
+    mix: List[Tuple[str, str, float]] = []
+    for item in raw.split(","):
+        if not item.strip():
+            continue
+        route, _, weight = item.partition("=")
+        method, _, path = route.strip().partition(" ")
+        mix.append((method.upper(), path.strip(), float(weight or 1)))
+    if not mix:
+        raise ValueError("--mix must name at least one endpoint")
+    return mix
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name: str, status: int, elapsed: float) -> None:
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            self.statuses[name][status] += 1
+
+    def report(self, wall_seconds: float) -> Dict[str, Dict]:
+        summary: Dict[str, Dict] = {}
+        everything: List[float] = []
+        for name, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            everything.extend(ordered)
+            summary[name] = _stats(ordered, wall_seconds, dict(self.statuses[name]))
+        summary["TOTAL"] = _stats(sorted(everything), wall_seconds, {})
+        return summary
+
+
+def _stats(ordered: List[float], wall_seconds: float, statuses: Dict[int, int]) -> Dict:
+    return {
+        "requests": len(ordered),
+        "rps": round(len(ordered) / wall_seconds, 1) if wall_seconds else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def _worker(
+    target: str,
+    headers: Dict[str, str],
+    mix: List[Tuple[str, str, float]],
+    bodies: List[bytes],
+    deadline: float,
+    budget: Optional[threading.Semaphore],
+    recorder: Recorder,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    parts = urlsplit(target)
+    routes = [(method, path) for method, path, _ in mix]
+    weights = [weight for _, _, weight in mix]
+    connection: Optional[http.client.HTTPConnection] = None
+    while time.perf_counter() < deadline:
+        if budget is not None and not budget.acquire(blocking=False):
+            break
+        method, path = rng.choices(routes, weights)[0]
+        body = rng.choice(bodies) if method in {"POST", "PUT"} else None
+        name = f"{method} {path}"
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException):
+            status = 599
+            if connection is not None:
+                connection.close()
+            connection = None
+        recorder.record(name, status, time.perf_counter() - started)
+    if connection is not None:
+        connection.close()
+
+
+def run_load(
+    target: str,
+    api_key: str,
+    concurrency: int,
+    duration: float,
+    requests: int,
+    mix: List[Tuple[str, str, float]],
+    seed: int,
+) -> Tuple[Dict[str, Dict], float]:
+    bodies = [
+        json.dumps({"foods": raw["foods"], "mood": raw["mood"], "notes": raw["notes"], "user_id": raw["user_id"]}).encode("utf-8")
+        for _, raw in zip(range(512), iter_raw_meals(users=16, years=0.1, seed=seed))
+    ]
+    headers = {"Content-Type": "application/json", "X-API-Key": api_key}
+    recorder = Recorder()
+    budget = threading.Semaphore(requests) if requests else None
+    deadline = time.perf_counter() + (duration if duration else 10**9)
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(target, headers, mix, bodies, deadline, budget, recorder, seed + index),
+            daemon=True,
+        )
+        for index in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return recorder.report(wall), wall
+
+
+def _service_role_key() -> str:
+    """supabase-py only accepts JWT-shaped keys; the fake server never checks the signature."""
+    def segment(value: Dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii").rstrip("=")
+
+    return f"{segment({'alg': 'HS256', 'typ': 'JWT'})}.{segment({'role': 'service_role'})}.loadtest"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url: str, timeout: float = 20.0) -> None:
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+            connection.request("GET", parts.path or "/")
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+@contextmanager
+def spawned_stack(args: argparse.Namespace) -> Iterator[Tuple[str, str]]:
+    """Start the fake PostgREST and a threaded backend as subprocesses; yields (backend url, api key)."""
+    api_key = args.api_key or "loadtest-secret"
+    rest_port, app_port = _free_port(), _free_port()
+    fake_cmd = [
+        sys.executable,
+        "-m",
+        "loadtest.fake_postgrest",
+        "--port",
+        str(rest_port),
+        "--latency-ms",
+        str(args.latency_ms),
+        "--jitter-ms",
+        str(args.jitter_ms),
+        "--error-rate",
+        str(args.error_rate),
+        "--seed-users",
+        str(args.seed_users),
+        "--seed-years",
+        str(args.seed_years),
+    ]
+    if args.no_payload_column:
+        fake_cmd.append("--no-payload-column")
+    env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{rest_port}",
+        "SUPABASE_SERVICE_ROLE_KEY": _service_role_key(),
+        "API_SECRET": api_key,
+        "JWT_SECRET": os.getenv("JWT_SECRET", "loadtest-jwt"),
+    }
+    app_cmd = [
+        sys.executable,
+        "-c",
+        "import logging, sys; from werkzeug.serving import run_simple; from app import app; "
+        "logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+        "run_simple('127.0.0.1', int(sys.argv[1]), app, threaded=True)",
+        str(app_port),
+    ]
+    processes = []
+    try:
+        processes.append(subprocess.Popen(fake_cmd, cwd=_BACKEND_DIR, env=env, stdout=subprocess.DEVNULL))
+        _wait_for(f"http://127.0.0.1:{rest_port}/rest/v1/meals?limit=1")
+        processes.append(
+            subprocess.Popen(app_cmd, cwd=_BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+        )
+        _wait_for(f"http://127.0.0.1:{app_port}/healthz")
+        yield f"http://127.0.0.1:{app_port}", api_key
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def _print_report(report: Dict[str, Dict], wall: float, concurrency: int) -> None:
+    print(f"\nconcurrency={concurrency} wall={wall:.1f}s")
+    print(f"{'endpoint':<28} {'reqs':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for name, stats in report.items():
+        print(
+            f"{name:<28} {stats['requests']:>7} {stats['rps']:>8.1f} {stats['p50_ms']:>9.2f} "
+            f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}  {stats['statuses']}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="http://127.0.0.1:5000")
+    parser.add_argument("--api-key", default=os.getenv("API_SECRET"))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds; 0 to rely on --requests")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests in total")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="'METHOD /path=weight,...'")
+    parser.add_argument("--seed", type=int, default=1729)
+    parser.add_argument("--output", help="write the report as JSON")
+    spawn = parser.add_argument_group("self-contained mode")
+    spawn.add_argument("--spawn", action="store_true", help="start fake PostgREST + backend locally")
+    spawn.add_argument("--latency-ms", type=float, default=10.0)
+    spawn.add_argument("--jitter-ms", type=float, default=3.0)
+    spawn.add_argument("--error-rate", type=float, default=0.0)
+    spawn.add_argument("--no-payload-column", action="store_true")
+    spawn.add_argument("--seed-users", type=int, default=10)
+    spawn.add_argument("--seed-years", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    if not args.duration and not args.requests:
+        parser.error("set --duration or --requests")
+    mix = parse_mix(args.mix)
+
+    if args.spawn:
+        with spawned_stack(args) as (target, api_key):
+            report, wall = run_load(target, api_key, args.concurrency, args.duration, args.requests, mix, args.seed)
+    else:
+        if not args.api_key:
+            parser.error("--api-key (or API_SECRET) is required against an external target")
+        report, wall = run_load(args.target, args.api_key, args.concurrency, args.duration, args.requests, mix, args.seed)
+
+    _print_report(report, wall, args.concurrency)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({"concurrency": args.concurrency, "wall_seconds": round(wall, 3), "endpoints": report}, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
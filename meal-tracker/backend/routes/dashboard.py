@@ -0,0 +1,93 @@
+import heapq
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import Blueprint, jsonify, request
+
+from data_store import achievement_report, iter_meals, leaderboard, user_aggregates
+from routes.users import profile_payload
+from supabase_client import iter_meal_rows, normalize_meal_row
+from utils.achievements import Aggregates, evaluate_all
+from utils.identity import current_user_id
+from utils.insights import build_payload
+from utils.single_flight import coalesce
+
+dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/api/dashboard")
+
+_DEFAULT_LIMIT = 50
+_MAX_LIMIT = 200
+
+
+def _scan(
+    meals: Iterable[Dict], limit: int, aggregates: Optional[Aggregates]
+) -> Tuple[List[Dict], Dict]:
+    """
+    One pass over a user's meals: the newest `limit` meals, summary totals and, when `aggregates`
+    is given, the insights aggregates.
+    """
+    newest: List[Tuple[str, int, Dict]] = []
+    count = 0
+    total_calories = 0.0
+    total_points = 0
+    for meal in meals:
+        count += 1
+        total_calories += meal.get("calories") or 0
+        total_points += meal.get("points") or 0
+        if aggregates is not None:
+            aggregates.add(meal)
+        entry = (str(meal.get("created_at") or ""), -count, meal)
+        if len(newest) < limit:
+            heapq.heappush(newest, entry)
+        elif entry[:2] > newest[0][:2]:
+            heapq.heapreplace(newest, entry)
+    page = [meal for _created_at, _order, meal in sorted(newest, key=lambda item: item[:2], reverse=True)]
+    summary = {
+        "count": count,
+        "total_calories": total_calories,
+        "avg_calories": total_calories / count if count else 0,
+        "total_points": total_points,
+    }
+    return page, summary
+
+
+@dashboard_bp.route("", methods=["GET"])
+@coalesce
+def get_dashboard():
+    source = (request.args.get("source") or "store").strip().lower()
+    if source not in {"store", "supabase"}:
+        return jsonify({"error": "source must be 'store' or 'supabase'."}), 400
+    try:
+        limit = int(request.args.get("limit", _DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit must be an integer."}), 400
+    limit = max(1, min(limit, _MAX_LIMIT))
+    user_id = current_user_id(request.args.get("user_id"))
+
+    if source == "supabase":
+        aggregates = Aggregates()
+        try:
+            page, summary = _scan(
+                (normalize_meal_row(row) for row in iter_meal_rows(user_id=user_id)), limit, aggregates
+            )
+        except Exception as exc:
+            return jsonify({"error": "Failed to query Supabase.", "details": str(exc)}), 500
+        aggregates.expire()
+        insights = build_payload(aggregates, evaluate_all(aggregates), summary["total_points"])
+    else:
+        # The store keeps insights aggregates current on every write, so only the meal page and
+        # totals need the scan.
+        page, summary = _scan(iter_meals(user_id=user_id), limit, None)
+        insights = build_payload(
+            user_aggregates(user_id), achievement_report(user_id), leaderboard("all").score(user_id) or 0
+        )
+
+    profile, bmi = profile_payload(user_id)
+    return jsonify(
+        {
+            "source": source,
+            "meals": page,
+            "summary": summary,
+            "insights": insights,
+            "profile": profile,
+            "bmi": bmi,
+        }
+    )
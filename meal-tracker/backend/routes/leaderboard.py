@@ -0,0 +1,34 @@
+from flask import Blueprint, jsonify, request
+
+from data_store import leaderboard, leaderboard_week
+from utils.identity import current_user_id
+from utils.single_flight import coalesce
+
+leaderboard_bp = Blueprint("leaderboard", __name__, url_prefix="/api/leaderboard")
+
+_MAX_LIMIT = 100
+
+
+@leaderboard_bp.route("", methods=["GET"])
+@coalesce
+def get_leaderboard():
+    period = (request.args.get("period") or "weekly").strip().lower()
+    if period not in {"weekly", "all"}:
+        return jsonify({"error": "period must be 'weekly' or 'all'."}), 400
+    try:
+        limit = int(request.args.get("limit", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit must be an integer."}), 400
+    limit = max(1, min(limit, _MAX_LIMIT))
+
+    board = leaderboard(period)
+    user_id = current_user_id(request.args.get("user_id"))
+    return jsonify(
+        {
+            "period": period,
+            "week": leaderboard_week() if period == "weekly" else None,
+            "totalUsers": len(board),
+            "entries": board.top(limit),
+            "me": board.rank(user_id) or {"userId": user_id, "rank": None, "points": 0},
+        }
+    )
@@ -0,0 +1,38 @@
+from flask import Blueprint, jsonify, request
+
+from utils.meal_plan import NoPlan, cached_plan
+
+meal_plan_bp = Blueprint("meal_plan", __name__, url_prefix="/api/meal-plan")
+
+# name: (default, minimum, maximum); a default of None makes the parameter required.
+_PARAMS = {
+    "calories": (None, 800, 6000),
+    "protein_min": (0, 0, 400),
+    "days": (1, 1, 14),
+    "meals": (3, 1, 6),
+}
+
+
+@meal_plan_bp.route("", methods=["GET"])
+def get_meal_plan():
+    values = {}
+    for name, (default, minimum, maximum) in _PARAMS.items():
+        raw = request.args.get(name)
+        if raw in (None, ""):
+            if default is None:
+                return jsonify({"error": f"{name} is required."}), 400
+            values[name] = default
+            continue
+        try:
+            value = int(float(raw))
+        except (TypeError, ValueError):
+            return jsonify({"error": f"{name} must be a number."}), 400
+        if not minimum <= value <= maximum:
+            return jsonify({"error": f"{name} must be between {minimum} and {maximum}."}), 400
+        values[name] = value
+
+    try:
+        plan = cached_plan(values["calories"], values["protein_min"], values["days"], values["meals"])
+    except NoPlan as exc:
+        return jsonify({"error": str(exc)}), 422
+    return jsonify(plan)
@@ -1,70 +1,300 @@
-from flask import Blueprint, jsonify, request
+import io
+from itertools import chain
 
-from data_store import meal_count, meals, record_meal, total_points
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
+
+from data_store import (
+    achievement_report,
+    change_seq,
+    changes_since,
+    iter_meals,
+    leaderboard,
+    meal_by_id,
+    meals,
+    record_meal,
+    similar_meals,
+    user_aggregates,
+)
+from supabase_client import SupabaseInsertError, iter_meal_rows, meal_rows_changed_since, normalize_meal_row
 from utils.calories_detect import detect_calories
-from utils.gamification import (
-    calculate_points,
-    coaching_tips,
-    streak_report,
-    summarize_achievements,
-    weekly_summary,
+from utils.events import HEARTBEAT_SECONDS, TooManySubscribers, broker as events_broker
+from utils.export import csv_chunks, encoded_chunks, gzip_chunks, jsonl_chunks
+from utils.gamification import calculate_points
+from utils.idempotency import idempotent
+from utils.identity import current_user_id
+from utils.insights import build_payload, scheduler as insights_scheduler
+from utils.jobs import defer_requested, job_queue, submit_response
+from utils.meal_import import (
+    DEFAULT_CHUNK_SIZE,
+    ImportResumeError,
+    ImportRowError,
+    checkpoint_store,
+    new_import_id,
+    run_import,
+    store_sink,
+    supabase_committed,
+    supabase_sink,
 )
+from utils.metrics import stage
+from utils.single_flight import coalesce
 
 meals_bp = Blueprint("meals", __name__, url_prefix="/api/meals")
 
+# Supabase insights are rebuilt in the background; stream each rebuilt snapshot as a delta.
+insights_scheduler().add_listener(
+    lambda user_id, payload: events_broker().publish_insights(user_id, "supabase", payload)
+)
+
+_MAX_SIMILAR = 50
+_DEFAULT_CHANGES = 500
+_MAX_CHANGES = 5000
+
+_EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", csv_chunks),
+    "jsonl": ("application/x-ndjson; charset=utf-8", jsonl_chunks),
+}
+
 
 @meals_bp.route("", methods=["GET"])
+@coalesce
 def list_meals():
-    return jsonify({"meals": meals()})
+    # Read the high-water mark first: a write racing the listing is sent again by /changes, never lost.
+    seq = change_seq()
+    return jsonify({"meals": meals(), "seq": seq})
 
 
-@meals_bp.route("", methods=["POST"])
-def create_meal():
-    payload = request.get_json(force=True, silent=True) or {}
+@meals_bp.route("/changes", methods=["GET"])
+def list_changes():
+    source = (request.args.get("source") or "store").strip().lower()
+    if source not in {"store", "supabase"}:
+        return jsonify({"error": "source must be 'store' or 'supabase'."}), 400
+    try:
+        since = int(request.args.get("since", 0))
+        limit = int(request.args.get("limit", _DEFAULT_CHANGES))
+    except (TypeError, ValueError):
+        return jsonify({"error": "since and limit must be integers."}), 400
+    if since < 0:
+        return jsonify({"error": "since must not be negative."}), 400
+    limit = max(1, min(limit, _MAX_CHANGES))
 
+    if source == "supabase":
+        try:
+            rows, seq = meal_rows_changed_since(since, limit)
+        except Exception as exc:
+            return jsonify({"error": "Failed to query Supabase.", "details": str(exc)}), 500
+        changed = [normalize_meal_row(row) for row in rows]
+        more, reset = len(rows) == limit, False
+    else:
+        latest = change_seq()
+        # A sequence beyond ours comes from before a restart; the client has to reload the list.
+        reset = since > latest
+        changed, seq = changes_since(0 if reset else since, limit)
+        more = seq < latest
+    return jsonify({"source": source, "since": since, "seq": seq, "more": more, "reset": reset, "meals": changed})
+
+
+def _create_meal(payload, user_id):
     foods_payload = payload.get("foods")
     photo_hint = payload.get("photoUrl") or payload.get("photoData") or ""
-    detection = detect_calories(
-        foods=foods_payload,
-        photo_reference=photo_hint,
-        nutrition_hints=payload.get("nutritionHints"),
-    )
+    with stage("detect_calories"):
+        detection = detect_calories(
+            foods=foods_payload,
+            photo_reference=photo_hint,
+            nutrition_hints=payload.get("nutritionHints"),
+        )
 
     if not detection["foods"]:
-        return jsonify({"error": "Provide at least one food item or a photo reference."}), 400
+        return 400, {"error": "Provide at least one food item or a photo reference."}
 
     calories = float(payload.get("calories", detection["calories"]))
-    points = calculate_points(calories, detection["foods"])
-
-    meal = record_meal(
-        foods=detection["foods"],
-        calories=calories,
-        points=points,
-        notes=payload.get("notes"),
-        mood=payload.get("mood"),
-        photo=payload.get("photoUrl") or payload.get("photoData"),
-        calorie_method=detection["method"],
-        calorie_confidence=detection["confidence"],
-    )
-    response = jsonify({**meal, "calorieExplanation": detection["explanation"]})
-    response.status_code = 201
-    return response
+    with stage("calculate_points"):
+        points = calculate_points(calories, detection["foods"])
 
+    with stage("record_meal"):
+        meal = record_meal(
+            foods=detection["foods"],
+            calories=calories,
+            points=points,
+            notes=payload.get("notes"),
+            mood=payload.get("mood"),
+            photo=payload.get("photoUrl") or payload.get("photoData"),
+            calorie_method=detection["method"],
+            calorie_confidence=detection["confidence"],
+            user_id=user_id,
+        )
+    events_broker().publish_meal(user_id, meal, "store", lambda: _store_insights(user_id))
+    return 201, {**meal, "calorieExplanation": detection["explanation"]}
 
-@meals_bp.route("/insights", methods=["GET"])
-def insights():
-    existing_meals = meals()
-    summary = weekly_summary(existing_meals)
-    achievements = summarize_achievements(existing_meals, summary)
-    streaks = streak_report(existing_meals)
-    recommendations = coaching_tips(existing_meals, summary)
+
+@meals_bp.route("", methods=["POST"])
+@idempotent
+def create_meal():
+    payload = request.get_json(force=True, silent=True) or {}
+    user_id = current_user_id(payload.get("user_id"))
+    if defer_requested(payload):
+        return submit_response(user_id, lambda: _create_meal(payload, user_id))
+    status, body = _create_meal(payload, user_id)
+    return jsonify(body), status
+
+
+@meals_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue().get(job_id)
+    if job is None or job.owner != current_user_id(request.args.get("user_id")):
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job.to_dict())
+
+
+@meals_bp.route("/<int:meal_id>/similar", methods=["GET"])
+def get_similar_meals(meal_id):
+    meal = meal_by_id(meal_id)
+    if meal is None or meal.get("user_id") != current_user_id(request.args.get("user_id")):
+        return jsonify({"error": "Meal not found."}), 404
+    try:
+        limit = int(request.args.get("limit", 10))
+        max_calories = request.args.get("max_calories")
+        max_calories = float(max_calories) if max_calories not in (None, "") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit must be an integer and max_calories a number."}), 400
+    limit = max(1, min(limit, _MAX_SIMILAR))
     return jsonify(
         {
-            "weekly": summary,
-            "achievements": achievements,
-            "points": total_points(),
-            "totalMeals": meal_count(),
-            "streaks": streaks,
-            "recommendations": recommendations,
+            "meal": meal,
+            "maxCalories": max_calories,
+            "similar": similar_meals(meal, limit, max_calories),
         }
     )
+
+
+def _store_insights(user_id):
+    return build_payload(user_aggregates(user_id), achievement_report(user_id), leaderboard("all").score(user_id) or 0)
+
+
+@meals_bp.route("/insights", methods=["GET"])
+@coalesce
+def insights():
+    user_id = current_user_id(request.args.get("user_id"))
+    source = (request.args.get("source") or "store").strip().lower()
+    if source not in {"store", "supabase"}:
+        return jsonify({"error": "source must be 'store' or 'supabase'."}), 400
+
+    if source == "supabase":
+        try:
+            snapshot = insights_scheduler().get(user_id)
+        except Exception as exc:
+            return jsonify({"error": "Failed to query Supabase.", "details": str(exc)}), 500
+        response = jsonify(snapshot.payload)
+        response.headers["Age"] = str(int(snapshot.age()))
+        return response
+
+    return jsonify(_store_insights(user_id))
+
+
+@meals_bp.route("/events", methods=["GET"])
+def meal_events():
+    user_id = current_user_id(request.args.get("user_id"))
+    events = events_broker()
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or request.args.get("lastEventId") or "")
+    except ValueError:
+        last_event_id = None
+    # Subscribe before answering, so a stream over the cap gets a 503 instead of a broken 200.
+    try:
+        subscriber = events.subscribe(user_id, last_event_id)
+    except TooManySubscribers as exc:
+        response = jsonify({"error": str(exc)})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+    response = Response(events.stream(subscriber, HEARTBEAT_SECONDS), mimetype="text/event-stream")
+    # The body may never be iterated (client gone before the first byte); release the slot anyway.
+    response.call_on_close(lambda: events.unsubscribe(subscriber))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _supabase_export_meals(rows):
+    for row in rows:
+        meal = normalize_meal_row(row)
+        meal.setdefault("user_id", row.get("user_id"))
+        yield meal
+
+
+def _wants_gzip():
+    flag = request.args.get("gzip")
+    if flag is not None:
+        return flag.strip().lower() in {"1", "true", "yes"}
+    return "gzip" in (request.headers.get("Accept-Encoding") or "").lower()
+
+
+@meals_bp.route("/export", methods=["GET"])
+def export_meals():
+    export_format = (request.args.get("format") or "csv").strip().lower()
+    if export_format not in _EXPORT_FORMATS:
+        return jsonify({"error": "format must be 'csv' or 'jsonl'."}), 400
+    source = (request.args.get("source") or "store").strip().lower()
+    if source not in {"store", "supabase"}:
+        return jsonify({"error": "source must be 'store' or 'supabase'."}), 400
+    # JWT users export their own history; API-key callers may export one user or everyone.
+    user_id = g.get("current_user") or request.args.get("user_id") or None
+
+    if source == "supabase":
+        rows = iter_meal_rows(user_id=user_id)
+        try:
+            first = next(rows, None)
+        except Exception as exc:
+            return jsonify({"error": "Failed to query Supabase.", "details": str(exc)}), 500
+        meal_stream = _supabase_export_meals(chain([first], rows) if first is not None else [])
+    else:
+        meal_stream = iter_meals(user_id=user_id)
+
+    content_type, encoder = _EXPORT_FORMATS[export_format]
+    compress = _wants_gzip()
+    chunks = encoder(meal_stream)
+    body = gzip_chunks(chunks) if compress else encoded_chunks(chunks)
+    response = Response(stream_with_context(body), content_type=content_type)
+    response.headers["Content-Disposition"] = f'attachment; filename="meals-export.{export_format}"'
+    response.headers["X-Accel-Buffering"] = "no"
+    response.headers["Vary"] = "Accept-Encoding"
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+@meals_bp.route("/import", methods=["POST"])
+def import_meals():
+    target = (request.args.get("target") or "store").strip().lower()
+    if target not in {"store", "supabase"}:
+        return jsonify({"error": "target must be 'store' or 'supabase'."}), 400
+    try:
+        chunk_size = max(1, min(int(request.args.get("chunk_size", DEFAULT_CHUNK_SIZE)), 5000))
+    except (TypeError, ValueError):
+        return jsonify({"error": "chunk_size must be an integer."}), 400
+    import_id = request.args.get("import_id") or request.headers.get("Import-Id") or new_import_id()
+    subject = g.get("current_user")
+
+    upload = request.files.get("file") if request.mimetype == "multipart/form-data" else None
+    raw = upload.stream if upload is not None else request.stream
+    lines = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    try:
+        report = run_import(
+            lines,
+            import_id=import_id,
+            target=target,
+            sink=supabase_sink if target == "supabase" else store_sink,
+            checkpoints=checkpoint_store(target),
+            user_id=subject or request.args.get("user_id"),
+            force_user=bool(subject),
+            chunk_size=chunk_size,
+            committed=supabase_committed if target == "supabase" else None,
+        )
+    except ImportRowError as exc:
+        return jsonify({"error": str(exc), "importId": import_id}), 400
+    except ImportResumeError as exc:
+        return jsonify({"error": str(exc), "importId": import_id}), 409
+    except UnicodeDecodeError:
+        return jsonify({"error": "CSV must be UTF-8 encoded.", "importId": import_id}), 400
+    except SupabaseInsertError as exc:
+        return jsonify({"error": exc.error, "details": exc.details, "importId": import_id}), exc.status
+    return jsonify(report)
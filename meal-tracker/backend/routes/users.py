@@ -1,13 +1,20 @@
+from datetime import datetime
+
 from flask import Blueprint, jsonify, request
 
-from data_store import update_profile, user_profile
-from utils.bmi_calc import calc_bmi
+from data_store import profile_history, update_profile, user_profile
+from utils.bmi_calc import calc_bmi, calc_bmi_series
+from utils.identity import current_user_id
+from utils.timeseries import finite, from_epoch, lttb
 
 users_bp = Blueprint("users", __name__, url_prefix="/api/users")
 
+_DEFAULT_POINTS = 200
+_MAX_POINTS = 2000
+
 
-def _profile_payload():
-    profile = user_profile()
+def profile_payload(user_id):
+    profile = user_profile(user_id)
     height = profile.get("height")
     weight = profile.get("weight")
     try:
@@ -19,7 +26,7 @@ def _profile_payload():
 
 @users_bp.route("/profile", methods=["GET"])
 def get_profile():
-    profile, bmi = _profile_payload()
+    profile, bmi = profile_payload(current_user_id(request.args.get("user_id")))
     return jsonify({"profile": profile, "bmi": bmi})
 
 
@@ -33,7 +40,8 @@ def put_profile():
         weight_value = float(weight) if weight is not None else None
     except (TypeError, ValueError):
         return jsonify({"error": "Height and weight must be numbers."}), 400
-    profile = update_profile(height=height_value, weight=weight_value)
+    user_id = current_user_id(payload.get("user_id"))
+    profile = update_profile(height=height_value, weight=weight_value, user_id=user_id)
     try:
         bmi = calc_bmi(profile["weight"], profile["height"]) if profile.get("height") and profile.get("weight") else None
     except ValueError:
@@ -41,6 +49,46 @@ def put_profile():
     return jsonify({"profile": profile, "bmi": bmi})
 
 
+def _parse_moment(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+
+
+@users_bp.route("/weight-history", methods=["GET"])
+def weight_history():
+    try:
+        start = _parse_moment(request.args.get("from"))
+        end = _parse_moment(request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "from and to must be ISO dates or datetimes."}), 400
+    try:
+        points = int(request.args.get("points", _DEFAULT_POINTS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "points must be an integer."}), 400
+    points = max(2, min(points, _MAX_POINTS))
+    user_id = current_user_id(request.args.get("user_id"))
+
+    times, heights, weights = profile_history(user_id).window(start, end)
+    bmis = calc_bmi_series(weights, heights)
+    # Only weigh-ins can be charted; height-only updates have no weight yet.
+    charted = finite(weights)
+    chosen = lttb([times[index] for index in charted], [weights[index] for index in charted], points)
+    series = []
+    for position in chosen:
+        index = charted[position]
+        bmi = bmis[index]
+        series.append(
+            {
+                "recordedAt": from_epoch(times[index]).isoformat(),
+                "weight": weights[index],
+                "height": None if heights[index] != heights[index] else heights[index],
+                "bmi": None if bmi != bmi else bmi,
+            }
+        )
+    return jsonify({"userId": user_id, "total": len(charted), "returned": len(series), "points": series})
+
+
 @users_bp.route("/bmi", methods=["POST"])
 def compute_bmi():
     payload = request.get_json(force=True, silent=True) or {}
@@ -12,11 +12,15 @@ import base64
 import json
 import logging
 import os
-from typing import Final, Optional
+import time
+from typing import Any, Dict, Final, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from supabase import Client, create_client
 
+from utils.access_log import record_supabase_time
+from utils.metrics import PAYLOAD_FALLBACK_RETRIES, SUPABASE_IN_FLIGHT, SUPABASE_LATENCY
+
 # Load environment variables from .env if present (safe for local dev)
 load_dotenv()
 
@@ -24,6 +28,30 @@ _URL_ENV_VAR: Final[str] = "SUPABASE_URL"
 _SERVICE_ROLE_ENV_VAR: Final[str] = "SUPABASE_SERVICE_ROLE_KEY"
 _FALLBACK_KEY_ENV_VAR: Final[str] = "SUPABASE_KEY"
 _logger = logging.getLogger(__name__)
+_supports_payload = True
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+# `seq` is drawn when a row is written, but transactions commit in any order: a row can become
+# visible after rows with higher numbers were already read. The cursor handed to clients trails
+# the newest row by this many values, so each poll re-reads that window and picks up late commits.
+CHANGES_LAG = _env_int("SUPABASE_CHANGES_LAG", 100)
+
+
+class SupabaseInsertError(RuntimeError):
+    """Insert failure carrying the API error body and HTTP status the routes respond with."""
+
+    def __init__(self, error: str, details: str, status: int) -> None:
+        super().__init__(f"{error} {details}")
+        self.error = error
+        self.details = details
+        self.status = status
 
 
 def _decode_jwt_role(token: str) -> Optional[str]:
@@ -70,3 +98,137 @@ def _init_client() -> Client:
 
 # Instantiate a supabase client ready for import elsewhere
 supabase: Client = _init_client()
+
+
+def timed_execute(query: Any, table: str, operation: str) -> Any:
+    """Run `query.execute()` while recording its latency and outcome."""
+    started = time.perf_counter()
+    outcome = "error"
+    SUPABASE_IN_FLIGHT.inc(table=table, operation=operation)
+    try:
+        response = query.execute()
+        outcome = "error" if getattr(response, "error", None) else "ok"
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        SUPABASE_IN_FLIGHT.dec(table=table, operation=operation)
+        SUPABASE_LATENCY.observe(elapsed, table=table, operation=operation, outcome=outcome)
+        record_supabase_time(elapsed)
+
+
+def normalize_meal_row(row: Dict) -> Dict:
+    """Meal dict from a `meals` row: the stored `payload` when present, else rebuilt from flat columns."""
+    payload = row.get("payload")
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except json.JSONDecodeError:
+            payload = None
+    if isinstance(payload, dict):
+        payload.setdefault("id", row.get("id"))
+        # The payload is the in-memory store's meal; its `seq` is the store's, not the table's.
+        payload["seq"] = row.get("seq")
+        return payload
+    meal_name = row.get("meal_name")
+    calories = row.get("calories")
+    created_at = (
+        row.get("created_at") or row.get("createdAt") or row.get("inserted_at")
+    )
+    foods = []
+    if meal_name:
+        foods.append({"name": meal_name, "calories": calories})
+    return {
+        "id": row.get("id"),
+        "foods": foods,
+        "calories": calories,
+        "points": row.get("points") or 0,
+        "mood": row.get("mood"),
+        "notes": row.get("notes"),
+        "photo": row.get("photo_url"),
+        "calorie_method": row.get("calorie_method", "manual"),
+        "calorie_confidence": row.get("calorie_confidence", 0.0),
+        "created_at": created_at,
+        "seq": row.get("seq"),
+    }
+
+
+def iter_meal_rows(user_id: Optional[str] = None, page_size: int = 1000) -> Iterator[Dict]:
+    """Yield `meals` rows in id order, one keyset-paginated page in memory at a time."""
+    last_id = None
+    while True:
+        query = supabase.table("meals").select("*")
+        if user_id is not None:
+            query = query.eq("user_id", user_id)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        response = timed_execute(query.order("id").limit(page_size), "meals", "select_page")
+        if getattr(response, "error", None):
+            raise RuntimeError(getattr(response.error, "message", str(response.error)))
+        rows = response.data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def meal_rows_changed_since(since: int, limit: int) -> Tuple[List[Dict], int]:
+    """
+    `meals` rows inserted or updated after change sequence `since`, oldest change first, plus the
+    cursor to resume from. The cursor trails the newest row by `CHANGES_LAG`, so rows in that
+    window are sent again on the next call; clients upsert by id, which makes the repeats harmless.
+    """
+    query = supabase.table("meals").select("*").gt("seq", since).order("seq").limit(limit)
+    response = timed_execute(query, "meals", "select_changes")
+    if getattr(response, "error", None):
+        raise RuntimeError(getattr(response.error, "message", str(response.error)))
+    rows = response.data or []
+    if not rows:
+        return rows, since
+    cursor = max(since, int(rows[-1]["seq"]) - CHANGES_LAG)
+    if len(rows) == limit:
+        # A full page always moves the cursor forward, even when it spans less than the lag.
+        cursor = max(cursor, int(rows[len(rows) // 2]["seq"]))
+    return rows, cursor
+
+
+def supports_payload() -> bool:
+    return _supports_payload
+
+
+def _maybe_disable_payload(message: str, rows: List[Dict]) -> bool:
+    """Older tables lack the `payload` column; drop it once for the process when Supabase says so."""
+    global _supports_payload
+    if not _supports_payload:
+        return False
+    if not message or "payload" not in message.lower():
+        return False
+    for row in rows:
+        row.pop("payload", None)
+    _supports_payload = False
+    PAYLOAD_FALLBACK_RETRIES.inc()
+    return True
+
+
+def insert_meal_rows(rows: List[Dict]) -> List[Dict]:
+    """
+    Insert one or more `meals` rows in a single request, retrying once without `payload` if the
+    column is missing. Raises SupabaseInsertError with the status the API should answer with.
+    """
+    if not _supports_payload:
+        for row in rows:
+            row.pop("payload", None)
+    while True:
+        body = rows[0] if len(rows) == 1 else rows
+        try:
+            response = timed_execute(supabase.table("meals").insert(body), "meals", "insert")
+        except Exception as exc:
+            if _maybe_disable_payload(str(exc), rows):
+                continue
+            raise SupabaseInsertError("Failed to insert meal into Supabase.", str(exc), 500) from exc
+        error = getattr(response, "error", None)
+        if error:
+            message = getattr(error, "message", str(error))
+            if _maybe_disable_payload(message, rows):
+                continue
+            raise SupabaseInsertError("Supabase returned an error.", message, 502)
+        return response.data or []
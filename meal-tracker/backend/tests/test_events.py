@@ -0,0 +1,41 @@
+import time
+
+from utils.events import Broker
+
+
+def test_reconnect_replays_events_published_while_disconnected():
+    broker = Broker()
+    first = broker.subscribe("u")
+    seen = broker.publish("u", "meal", {"meal": 1})
+    broker.unsubscribe(first)
+    missed = broker.publish("u", "meal", {"meal": 2})
+
+    again = broker.subscribe("u", last_event_id=seen.id)
+
+    assert [event.id for event in again.buffer] == [missed.id]
+    assert not again.lagged
+
+
+def test_expired_history_asks_for_resync():
+    broker = Broker(history_seconds=0.05)
+    first = broker.subscribe("u")
+    seen = broker.publish("u", "meal", {"meal": 1})
+    broker.unsubscribe(first)
+    time.sleep(0.1)
+    assert broker.publish("u", "meal", {"meal": 2}) is None
+
+    again = broker.subscribe("u", last_event_id=seen.id)
+
+    assert again.lagged and again.ready.is_set()
+
+
+def test_id_older_than_history_asks_for_resync():
+    broker = Broker()
+    subscriber = broker.subscribe("u")
+    events = [broker.publish("u", "meal", {"meal": index}) for index in range(100)]
+    broker.unsubscribe(subscriber)
+
+    assert broker.subscribe("u", last_event_id=events[0].id).lagged
+    recent = broker.subscribe("u", last_event_id=events[-3].id)
+    assert not recent.lagged
+    assert [event.id for event in recent.buffer] == [event.id for event in events[-2:]]
@@ -0,0 +1,53 @@
+from utils.calorie_estimator import DEFAULT_MACROS, FOOD_LIBRARY
+from utils.calories_detect import detect_calories
+from utils.food_text import parse_food_text
+
+
+def _items(text):
+    return [(food["name"], food["quantity"]) for food in parse_food_text(text)]
+
+
+def test_request_example():
+    assert _items("2 eggs with spinach and a banana") == [("egg", 2.0), ("spinach", 1.0), ("banana", 1.0)]
+    detected = detect_calories(foods=["2 eggs with spinach and a banana"])
+    expected = 2 * FOOD_LIBRARY["egg"].calories + FOOD_LIBRARY["spinach"].calories + FOOD_LIBRARY["banana"].calories
+    assert detected["calories"] == expected
+
+
+def test_counted_plural_matches_parser():
+    expected = 3 * FOOD_LIBRARY["egg"].calories
+    assert _items("3 eggs") == [("egg", 3.0)]
+    assert detect_calories(foods=["3 eggs"])["calories"] == expected
+    assert detect_calories(foods=["3 eggs and a banana"])["calories"] == expected + FOOD_LIBRARY["banana"].calories
+    assert detect_calories(foods=["eggs"])["calories"] == FOOD_LIBRARY["eggs"].calories
+
+
+def test_quantities():
+    assert _items("half a banana") == [("banana", 0.5)]
+    assert _items("two and a half eggs") == [("egg", 2.5)]
+    assert _items("3 cups of rice, salad x2") == [("rice", 3.0), ("salad", 2.0)]
+    assert _items("greek yogurt with berries") == [("greek yogurt", 1.0), ("berries", 1.0)]
+
+
+def test_unknown_food_becomes_its_own_item():
+    assert _items("pizza and salad") == [("pizza", 1.0), ("salad", 1.0)]
+    assert _items("salmon salad") == [("salmon", 1.0), ("salad", 1.0)]
+    assert _items("2 slices of pizza with a banana") == [("pizza", 2.0), ("banana", 1.0)]
+    assert _items("salad with dressing") == [("salad", 1.0), ("dressing", 1.0)]
+
+
+def test_modifiers_and_connectors_are_not_foods():
+    assert _items("I had fresh spinach and grilled chicken for lunch") == [("spinach", 1.0), ("grilled chicken", 1.0)]
+
+
+def test_text_without_known_foods_is_not_parsed():
+    assert parse_food_text("pizza") == []
+    assert parse_food_text("eggplant pizza") == []
+
+
+def test_detect_calories_keeps_unknown_foods():
+    unknown = DEFAULT_MACROS["calories"]
+    salad = FOOD_LIBRARY["salad"].calories
+    assert detect_calories(foods=["pizza"])["calories"] == unknown
+    assert detect_calories(foods=["pizza and salad"])["calories"] == unknown + salad
+    assert detect_calories(foods=["salmon salad"])["calories"] == unknown + salad
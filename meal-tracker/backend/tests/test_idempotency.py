@@ -0,0 +1,73 @@
+import pytest
+from flask import Flask, jsonify, request
+
+from utils import idempotency
+from utils.idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER, IdempotencyStore, idempotent
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(idempotency, "_store", IdempotencyStore(max_entries=2))
+    app = Flask(__name__)
+    calls = []
+    failures = []
+
+    @app.route("/meals", methods=["POST"])
+    @idempotent
+    def create_meal():
+        calls.append(request.get_json())
+        if failures:
+            failures.pop()
+            return jsonify({"error": "Supabase is down."}), 503
+        return jsonify({"id": len(calls), **request.get_json()}), 201
+
+    client = app.test_client()
+    client.calls = calls
+    client.failures = failures
+    return client
+
+
+def _post(client, key, body):
+    return client.post("/meals", json=body, headers={IDEMPOTENCY_HEADER: key})
+
+
+def test_retry_replays_the_stored_response(client):
+    first = _post(client, "k1", {"name": "egg"})
+    again = _post(client, "k1", {"name": "egg"})
+
+    assert first.status_code == again.status_code == 201
+    assert again.get_json() == first.get_json()
+    assert again.headers[REPLAYED_HEADER] == "true"
+    assert REPLAYED_HEADER not in first.headers
+    assert len(client.calls) == 1
+
+
+def test_reused_key_with_a_different_body_is_rejected(client):
+    _post(client, "k1", {"name": "egg"})
+    mismatch = _post(client, "k1", {"name": "toast"})
+
+    assert mismatch.status_code == 422
+    assert len(client.calls) == 1
+
+
+def test_server_error_is_not_stored_and_a_retry_runs_again(client):
+    client.failures.append(True)
+    failed = _post(client, "k1", {"name": "egg"})
+    retried = _post(client, "k1", {"name": "egg"})
+
+    assert failed.status_code == 503
+    assert retried.status_code == 201
+    assert REPLAYED_HEADER not in retried.headers
+    assert len(client.calls) == 2
+    assert _post(client, "k1", {"name": "egg"}).headers[REPLAYED_HEADER] == "true"
+
+
+def test_least_recently_used_key_is_evicted_beyond_max_entries(client):
+    for key in ("k1", "k2", "k3"):
+        _post(client, key, {"name": key})
+
+    assert len(idempotency.idempotency_store()) == 2
+    assert _post(client, "k3", {"name": "k3"}).headers[REPLAYED_HEADER] == "true"
+    rerun = _post(client, "k1", {"name": "k1"})
+    assert REPLAYED_HEADER not in rerun.headers
+    assert len(client.calls) == 4
@@ -0,0 +1,42 @@
+import random
+
+from utils.leaderboard import Leaderboard
+
+
+def _expected_top(scores, limit):
+    ordered = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [
+        {"userId": user_id, "rank": 1 + sum(1 for other in scores.values() if other > points), "points": points}
+        for user_id, points in ordered[:limit]
+    ]
+
+
+def test_top_and_rank_match_sorting_the_scores():
+    rng = random.Random(30)
+    board = Leaderboard()
+    users = [f"user-{index:02d}" for index in range(40)]
+    for step in range(1500):
+        user_id = rng.choice(users)
+        # Small deltas keep ties frequent; the occasional jump crosses 1024, 2048 and 4096.
+        points = rng.choice((rng.randint(-5, 10), rng.randint(-5, 10), rng.randint(300, 1500)))
+        expected = max(0, board._scores.get(user_id, 0) + points)
+        assert board.add(user_id, points) == expected
+
+        if step % 25 == 0:
+            scores = dict(board._scores)
+            for limit in (0, 1, 3, 10, len(scores), len(scores) + 5):
+                assert board.top(limit) == _expected_top(scores, limit)
+            for entry in _expected_top(scores, len(scores)):
+                assert board.rank(entry["userId"]) == entry
+
+    assert max(board._scores.values()) > 1024
+    assert board.rank("nobody") is None
+
+
+def test_tied_users_share_a_competition_rank():
+    board = Leaderboard()
+    for user_id, points in (("a", 50), ("b", 50), ("c", 40), ("d", 2000)):
+        board.add(user_id, points)
+
+    assert [(entry["userId"], entry["rank"]) for entry in board.top(4)] == [("d", 1), ("a", 2), ("b", 2), ("c", 4)]
+    assert board.rank("c")["rank"] == 4
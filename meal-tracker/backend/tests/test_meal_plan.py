@@ -0,0 +1,45 @@
+import bisect
+import itertools
+
+import pytest
+
+from utils.calorie_estimator import FOOD_LIBRARY
+from utils.gamification import calculate_points
+from utils.meal_plan import MAX_FOODS, TOLERANCE, _meal_options, plan_meals
+
+
+@pytest.fixture(scope="module")
+def every_meal():
+    """(calories, points) of every set of up to MAX_FOODS distinct library foods, by calories."""
+    meals = []
+    for count in range(1, MAX_FOODS + 1):
+        for names in itertools.combinations(sorted(FOOD_LIBRARY), count):
+            calories = sum(FOOD_LIBRARY[name].calories for name in names)
+            meals.append((calories, calculate_points(calories, [{"name": name} for name in names])))
+    meals.sort()
+    return meals
+
+
+@pytest.mark.parametrize("target", range(300, 1401, 25))
+def test_meal_options_match_brute_force(every_meal, target):
+    low, high = target * (1 - TOLERANCE), target * (1 + TOLERANCE)
+    calories = [meal[0] for meal in every_meal]
+    window = every_meal[bisect.bisect_left(calories, low) : bisect.bisect_right(calories, high)]
+
+    options = _meal_options(FOOD_LIBRARY, low, high, 0, 3)
+
+    assert all(low <= meal.calories <= high for meal in options)
+    if not window:
+        assert options == []
+    else:
+        assert options and options[0].points == max(points for _calories, points in window)
+
+
+@pytest.mark.parametrize("calories", [1875, 2100, 2250])
+def test_plan_meals_reaches_common_targets(calories):
+    plan = plan_meals(calories)
+    day = plan["days"][0]
+    assert len(day["meals"]) == 3
+    assert all(
+        calories / 3 * (1 - TOLERANCE) <= meal["calories"] <= calories / 3 * (1 + TOLERANCE) for meal in day["meals"]
+    )
@@ -0,0 +1,50 @@
+import random
+
+from utils.similarity import CALORIE_SCALE, DIMENSIONS, KDTree
+
+
+def _linear_scan(points, query, k, exclude=None, max_calories=None):
+    found = []
+    for key, point in points:
+        if key == exclude or (max_calories is not None and point[3] > max_calories / CALORIE_SCALE):
+            continue
+        distance = 0.0
+        for offset in range(DIMENSIONS):
+            delta = query[offset] - point[offset]
+            distance += delta * delta
+        found.append((distance, key))
+    # Equal distances prefer the newest (highest) key, like the tree.
+    found.sort(key=lambda item: (item[0], -item[1]))
+    return found[:k]
+
+
+def _random_point(rng):
+    # A coarse grid so that duplicate points and distance ties are common.
+    return tuple(rng.randrange(5) / 4 for _ in range(3)) + (rng.randrange(12) / 10,)
+
+
+def test_nearest_matches_a_linear_scan():
+    rng = random.Random(44)
+    for size in (1, 7, 60, 400):
+        tree = KDTree()
+        points = []
+        for key in range(size):
+            point = points[rng.randrange(len(points))][1] if points and rng.random() < 0.2 else _random_point(rng)
+            tree.insert(key, point)
+            points.append((key, point))
+        assert len(tree) == size
+
+        for _ in range(40):
+            query = _random_point(rng)
+            k = rng.choice((1, 2, 5, 10, size, size + 3))
+            cap = rng.choice((None, 0.0, 250.0, 600.0, 1100.0))
+            exclude = rng.choice((None, rng.randrange(size)))
+            expected = _linear_scan(points, query, k, exclude, cap)
+            assert tree.nearest(query, k, exclude=exclude, max_calories=cap) == expected
+
+
+def test_empty_tree_and_non_positive_k():
+    tree = KDTree()
+    assert tree.nearest((0.0, 0.0, 0.0, 0.0), 3) == []
+    tree.insert(1, (0.5, 0.25, 0.25, 0.4))
+    assert tree.nearest((0.0, 0.0, 0.0, 0.0), 0) == []
@@ -0,0 +1,140 @@
+"""
+Structured JSON access log written off the request path.
+
+Request hooks build one dict per request and hand it to a `QueueHandler`; a `QueueListener` thread
+formats and writes the lines to `ACCESS_LOG_PATH` (stdout when unset). The queue is bounded, so
+when the writer falls behind, records are dropped and counted instead of slowing requests down.
+Successful requests and CORS preflights are sampled (`ACCESS_LOG_SAMPLE_RATE`,
+`ACCESS_LOG_PREFLIGHT_SAMPLE_RATE`); responses with status >= 400 are always logged.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import g, has_request_context
+
+from utils.metrics import REGISTRY
+
+ACCESS_LOG_DROPPED = REGISTRY.counter(
+    "meal_tracker_access_log_dropped_total",
+    "Access log records dropped because the writer queue was full.",
+)
+
+_logger = logging.getLogger("meal_tracker.access")
+_logger.propagate = False
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _env_rate(name: str, default: float) -> float:
+    try:
+        return min(1.0, max(0.0, float(os.getenv(name, default))))
+    except ValueError:
+        return default
+
+
+ENABLED = os.getenv("ACCESS_LOG_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+SAMPLE_RATE = _env_rate("ACCESS_LOG_SAMPLE_RATE", 1.0)
+PREFLIGHT_SAMPLE_RATE = _env_rate("ACCESS_LOG_PREFLIGHT_SAMPLE_RATE", 0.0)
+_QUEUE_SIZE = 10_000
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            ACCESS_LOG_DROPPED.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The JSON payload is built by the writer thread; skip QueueHandler's eager formatting.
+        return record
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, separators=(",", ":"), default=str)
+
+
+class _HideWerkzeugRequests(logging.Filter):
+    """Drop Werkzeug's own per-request lines; the JSON access log replaces them."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not (record.levelno == logging.INFO and "HTTP/" in record.getMessage())
+
+
+def start() -> None:
+    """Attach the queue handler and start the writer thread (idempotent)."""
+    global _listener
+    if not ENABLED or _listener is not None:
+        return
+    path = os.getenv("ACCESS_LOG_PATH")
+    writer: logging.Handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(sys.stdout)
+    writer.setFormatter(_JsonFormatter())
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=_QUEUE_SIZE)
+    _logger.addHandler(_DroppingQueueHandler(records))
+    _logger.setLevel(logging.INFO)
+    _listener = logging.handlers.QueueListener(records, writer, respect_handler_level=False)
+    _listener.start()
+    atexit.register(stop)
+    logging.getLogger("werkzeug").addFilter(_HideWerkzeugRequests())
+
+
+def stop() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def record_supabase_time(seconds: float) -> None:
+    """Called by `supabase_client.timed_execute`; accumulates per-request Supabase time."""
+    if has_request_context():
+        g.access_supabase_seconds = g.get("access_supabase_seconds", 0.0) + seconds
+        g.access_supabase_calls = g.get("access_supabase_calls", 0) + 1
+
+
+def begin() -> None:
+    g.access_started = time.perf_counter()
+
+
+def _sample_rate(method: str, status: int) -> float:
+    if status >= 400:
+        return 1.0
+    if method == "OPTIONS":
+        return PREFLIGHT_SAMPLE_RATE
+    return SAMPLE_RATE
+
+
+def finish(method: str, route: str, status: int, user: Optional[str], size: Optional[int]) -> None:
+    """Enqueue the access record for the current request if it is sampled in."""
+    if _listener is None:
+        return
+    started = g.pop("access_started", None)
+    rate = _sample_rate(method, status)
+    if started is None or rate <= 0.0 or (rate < 1.0 and random.random() >= rate):
+        return
+    entry: Dict[str, object] = {
+        "ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+        "method": method,
+        "route": route,
+        "status": status,
+        "user": user,
+        "latencyMs": round((time.perf_counter() - started) * 1000, 2),
+        "supabaseMs": round(g.get("access_supabase_seconds", 0.0) * 1000, 2),
+        "supabaseCalls": g.get("access_supabase_calls", 0),
+        "bytes": size,
+        "sampleRate": rate,
+    }
+    _logger.info(entry)
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from bisect import insort
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+WEEK = timedelta(days=7)
+
+# Aggregate names rules can depend on.
+MEAL_COUNT = "meal_count"
+LONGEST_STREAK = "longest_streak"
+WEEKLY_COUNT = "weekly_count"
+WEEKLY_AVERAGE = "weekly_average"
+WEEKLY_VARIETY = "weekly_variety"
+ALL_AGGREGATES: FrozenSet[str] = frozenset({MEAL_COUNT, LONGEST_STREAK, WEEKLY_COUNT, WEEKLY_AVERAGE, WEEKLY_VARIETY})
+
+
+def _parse_date(date_str: str) -> datetime:
+    try:
+        return datetime.fromisoformat(date_str)
+    except (TypeError, ValueError):
+        return datetime.utcnow()
+
+
+def _food_names(meal: Dict) -> List[str]:
+    return [food["name"].lower() for food in meal.get("foods") or [] if food.get("name")]
+
+
+@dataclass
+class Aggregates:
+    """
+    Per-user running aggregates. Meals are folded in one at a time; the 7-day window keeps only
+    the meals it needs and is pruned lazily as time passes.
+    """
+
+    meal_count: int = 0
+    longest_streak: int = 0
+    days: Set[date] = field(default_factory=set)
+    _run_start: Dict[date, date] = field(default_factory=dict)
+    _run_end: Dict[date, date] = field(default_factory=dict)
+    window: List[Tuple[datetime, int, Dict]] = field(default_factory=list)
+    weekly_calories: float = 0.0
+    weekly_foods: Counter = field(default_factory=Counter)
+    _sequence: int = 0
+
+    @property
+    def weekly_count(self) -> int:
+        return len(self.window)
+
+    @property
+    def weekly_average(self) -> float:
+        return round(self.weekly_calories / len(self.window), 1) if self.window else 0
+
+    @property
+    def weekly_variety(self) -> int:
+        return len(self.weekly_foods)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            MEAL_COUNT: self.meal_count,
+            LONGEST_STREAK: self.longest_streak,
+            WEEKLY_COUNT: self.weekly_count,
+            WEEKLY_AVERAGE: self.weekly_average,
+            WEEKLY_VARIETY: self.weekly_variety,
+        }
+
+    def _add_day(self, day: date) -> None:
+        if day in self.days:
+            return
+        self.days.add(day)
+        previous, following = day - timedelta(days=1), day + timedelta(days=1)
+        start = self._run_start.pop(previous, day) if previous in self.days else day
+        end = self._run_end.pop(following, day) if following in self.days else day
+        self._run_end[start] = end
+        self._run_start[end] = start
+        self.longest_streak = max(self.longest_streak, (end - start).days + 1)
+
+    def _add_to_window(self, logged_at: datetime, meal: Dict) -> None:
+        self._sequence += 1
+        entry = {"created_at": logged_at.isoformat(), "calories": float(meal.get("calories") or 0), "foods": meal.get("foods") or []}
+        insort(self.window, (logged_at, self._sequence, entry))
+        self.weekly_calories += entry["calories"]
+        self.weekly_foods.update(_food_names(entry))
+
+    def add(self, meal: Dict, now: Optional[datetime] = None) -> Set[str]:
+        """Fold one meal in; returns the names of aggregates whose value changed."""
+        before = self.snapshot()
+        logged_at = _parse_date(meal.get("created_at"))
+        self.meal_count += 1
+        self._add_day(logged_at.date())
+        if logged_at >= (now or datetime.utcnow()) - WEEK:
+            self._add_to_window(logged_at, meal)
+        self.expire(now)
+        after = self.snapshot()
+        return {name for name in after if after[name] != before[name]}
+
+    def expire(self, now: Optional[datetime] = None) -> Set[str]:
+        """Drop window entries older than seven days; returns the aggregates that changed."""
+        cutoff = (now or datetime.utcnow()) - WEEK
+        if not self.window or self.window[0][0] >= cutoff:
+            return set()
+        before = self.snapshot()
+        expired = 0
+        for logged_at, _seq, entry in self.window:
+            if logged_at >= cutoff:
+                break
+            expired += 1
+            self.weekly_calories -= entry["calories"]
+            self.weekly_foods.subtract(_food_names(entry))
+        del self.window[:expired]
+        self.weekly_foods = +self.weekly_foods
+        if not self.window:
+            self.weekly_calories = 0.0
+        after = self.snapshot()
+        return {name for name in after if after[name] != before[name]}
+
+    def current_streak(self, today: Optional[date] = None) -> int:
+        day = today or datetime.utcnow().date()
+        if day not in self.days and (day - timedelta(days=1)) in self.days:
+            day -= timedelta(days=1)
+        start = self._run_start.get(day)
+        return (day - start).days + 1 if start is not None else 0
+
+    def window_meals(self) -> List[Dict]:
+        return [entry for _logged_at, _seq, entry in self.window]
+
+
+@dataclass(frozen=True)
+class AchievementRule:
+    id: str
+    label: str
+    details: str
+    depends_on: FrozenSet[str]
+    evaluate: Callable[[Aggregates], Tuple[bool, str]]
+
+
+RULES: Dict[str, AchievementRule] = {}
+_RULES_BY_AGGREGATE: Dict[str, List[AchievementRule]] = {name: [] for name in ALL_AGGREGATES}
+
+
+def achievement(id: str, label: str, details: str, depends_on: Iterable[str]):
+    """Register an achievement; `depends_on` names the aggregates whose changes trigger re-evaluation."""
+    dependencies = frozenset(depends_on)
+    unknown = dependencies - ALL_AGGREGATES
+    if unknown:
+        raise ValueError(f"Achievement {id} depends on unknown aggregates: {sorted(unknown)}")
+
+    def register(evaluate: Callable[[Aggregates], Tuple[bool, str]]):
+        if id in RULES:
+            raise ValueError(f"Achievement {id} is already registered")
+        rule = AchievementRule(id, label, details, dependencies, evaluate)
+        RULES[id] = rule
+        for name in dependencies:
+            _RULES_BY_AGGREGATE[name].append(rule)
+        return evaluate
+
+    return register
+
+
+def rules_for(changed: Iterable[str]) -> List[AchievementRule]:
+    affected = {rule.id for name in changed for rule in _RULES_BY_AGGREGATE.get(name, ())}
+    return [rule for rule_id, rule in RULES.items() if rule_id in affected]
+
+
+@achievement("first-log", "First Meal Logged", "Unlocked as soon as you record your first meal.", [MEAL_COUNT])
+def _first_log(agg: Aggregates) -> Tuple[bool, str]:
+    return agg.meal_count > 0, f"{1 if agg.meal_count else 0}/1"
+
+
+@achievement("weekly-habit", "3-Day Streak", "Log meals three days in a row to prove your consistency.", [LONGEST_STREAK])
+def _weekly_habit(agg: Aggregates) -> Tuple[bool, str]:
+    return agg.longest_streak >= 3, f"{min(agg.longest_streak, 3)}/3"
+
+
+@achievement("weekly-hero", "Weekly Hero", "Capture five meals this week to stay mindful.", [WEEKLY_COUNT])
+def _weekly_hero(agg: Aggregates) -> Tuple[bool, str]:
+    return agg.weekly_count >= 5, f"{min(agg.weekly_count, 5)}/5"
+
+
+@achievement(
+    "balanced-week",
+    "Balanced Week",
+    "Keep your weekly average calories in the healthy sweet spot.",
+    [WEEKLY_AVERAGE, WEEKLY_COUNT],
+)
+def _balanced_week(agg: Aggregates) -> Tuple[bool, str]:
+    average = agg.weekly_average
+    return 350 <= average <= 700 and agg.weekly_count >= 3, f"{int(average)} avg kcal"
+
+
+@achievement(
+    "colorful-plate",
+    "Colorful Plate",
+    "Try at least five unique foods in the last week for balanced nutrition.",
+    [WEEKLY_VARIETY],
+)
+def _colorful_plate(agg: Aggregates) -> Tuple[bool, str]:
+    return agg.weekly_variety >= 5, f"{min(agg.weekly_variety, 5)}/5 foods"
+
+
+@achievement("streak-sprinter", "7-Day Sprinter", "Maintain a week-long streak of mindful eating logs.", [LONGEST_STREAK])
+def _streak_sprinter(agg: Aggregates) -> Tuple[bool, str]:
+    return agg.longest_streak >= 7, f"{min(agg.longest_streak, 7)}/7 days"
+
+
+def _result(rule: AchievementRule, agg: Aggregates) -> Dict:
+    achieved, progress = rule.evaluate(agg)
+    return {"id": rule.id, "label": rule.label, "achieved": achieved, "details": rule.details, "progress": progress}
+
+
+def aggregate_meals(meals: Iterable[Dict], now: Optional[datetime] = None) -> Aggregates:
+    aggregates = Aggregates()
+    moment = now or datetime.utcnow()
+    for meal in meals:
+        aggregates.add(meal, moment)
+    return aggregates
+
+
+def evaluate_all(aggregates: Aggregates) -> List[Dict]:
+    """Stateless evaluation of every registered rule, in registration order."""
+    return [_result(rule, aggregates) for rule in RULES.values()]
+
+
+class UnlockStore:
+    """Unlock events per user, optionally mirrored to an append-only JSON-lines file."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._path = path
+        self._unlocks: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._unlocks.setdefault(event["user_id"], {}).setdefault(event["achievement"], event["unlocked_at"])
+
+    def unlocked(self, user_id: str) -> Dict[str, str]:
+        return self._unlocks.get(user_id, {})
+
+    def unlock(self, user_id: str, achievement_id: str, unlocked_at: str) -> bool:
+        with self._lock:
+            user_unlocks = self._unlocks.setdefault(user_id, {})
+            if achievement_id in user_unlocks:
+                return False
+            user_unlocks[achievement_id] = unlocked_at
+            if self._path:
+                directory = os.path.dirname(self._path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self._path, "a", encoding="utf-8") as handle:
+                    handle.write(
+                        json.dumps({"user_id": user_id, "achievement": achievement_id, "unlocked_at": unlocked_at}) + "\n"
+                    )
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._unlocks.clear()
+
+
+@dataclass
+class _UserState:
+    aggregates: Aggregates = field(default_factory=Aggregates)
+    results: Dict[str, Dict] = field(default_factory=dict)
+
+
+class AchievementEngine:
+    """
+    Keeps aggregates and the last evaluated result of every rule per user. After a meal is
+    recorded (or the weekly window slides) only rules depending on a changed aggregate run.
+    """
+
+    def __init__(self, unlocks: Optional[UnlockStore] = None) -> None:
+        self.unlocks = unlocks or UnlockStore()
+        self._users: Dict[str, _UserState] = {}
+        self._lock = threading.RLock()
+
+    def _state(self, user_id: str) -> _UserState:
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState()
+            self._evaluate(user_id, state, ALL_AGGREGATES)
+        return state
+
+    def _evaluate(self, user_id: str, state: _UserState, changed: Iterable[str]) -> None:
+        for rule in rules_for(changed):
+            result = _result(rule, state.aggregates)
+            state.results[rule.id] = result
+            if result["achieved"]:
+                self.unlocks.unlock(user_id, rule.id, datetime.utcnow().isoformat())
+
+    def record(self, user_id: str, meal: Dict) -> None:
+        with self._lock:
+            state = self._state(user_id)
+            changed = state.aggregates.add(meal)
+            if changed:
+                self._evaluate(user_id, state, changed)
+
+    def _refreshed(self, user_id: str) -> _UserState:
+        state = self._state(user_id)
+        changed = state.aggregates.expire()
+        if changed:
+            self._evaluate(user_id, state, changed)
+        return state
+
+    def report(self, user_id: str) -> List[Dict]:
+        """Every rule's latest result; anything ever unlocked stays achieved, with its unlock time."""
+        with self._lock:
+            state = self._refreshed(user_id)
+            unlocked = self.unlocks.unlocked(user_id)
+            report = []
+            for rule_id in RULES:
+                result = dict(state.results[rule_id])
+                unlocked_at = unlocked.get(rule_id)
+                result["achieved"] = result["achieved"] or unlocked_at is not None
+                result["unlockedAt"] = unlocked_at
+                report.append(result)
+            return report
+
+    def aggregates(self, user_id: str) -> Aggregates:
+        with self._lock:
+            return self._refreshed(user_id).aggregates
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self.unlocks.clear()
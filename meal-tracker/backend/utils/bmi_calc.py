@@ -1,3 +1,6 @@
+from array import array
+
+
 def calc_bmi(weight, height):
     if height is None or weight is None:
         raise ValueError("Height and weight are required")
@@ -5,3 +8,18 @@ def calc_bmi(weight, height):
     if height_m <= 0:
         raise ValueError("Height must be greater than zero")
     return round(weight / (height_m ** 2), 2)
+
+
+def calc_bmi_series(weights, heights):
+    """
+    `calc_bmi` over parallel sequences of weights (kg) and heights (cm) in one pass; entries with a
+    missing (NaN) or non-positive height give NaN instead of raising.
+    """
+    nan = float("nan")
+    return array(
+        "d",
+        (
+            calc_bmi(weight, height) if height > 0 and weight == weight else nan
+            for weight, height in zip(weights, heights)
+        ),
+    )
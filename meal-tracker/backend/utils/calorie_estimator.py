@@ -51,6 +51,25 @@ FOOD_LIBRARY: Dict[str, MacroProfile] = {
     "spinach": MacroProfile(40, 5, 4, 0),
 }
 
+# Other ways people write library foods, for free-text parsing (`utils.food_text`). Plurals ending
+# in "s"/"es" are matched without an alias.
+FOOD_ALIASES: Dict[str, str] = {
+    "veggie": "veggies",
+    "vegetable": "veggies",
+    "vegetables": "veggies",
+    "yoghurt": "yogurt",
+    "greek yoghurt": "greek yogurt",
+    "oats": "oatmeal",
+    "porridge": "oatmeal",
+    "berry": "berries",
+    "blueberries": "berries",
+    "strawberries": "berries",
+    "raspberries": "berries",
+    "chicken breast": "grilled chicken",
+    "bean": "beans",
+    "lentil": "lentils",
+}
+
 
 def _normalized_name(value: str) -> str:
     return value.strip().lower()
@@ -75,6 +94,14 @@ def _quantity_from_string(label: str) -> Tuple[str, float]:
     return cleaned, 1.0
 
 
+def is_library_food(label: str) -> bool:
+    """
+    Whether `label` is exactly a `FOOD_LIBRARY` name. Labels with a quantity don't count: the text
+    parser singularizes them ("3 eggs" is three of "egg", not three portions of "eggs").
+    """
+    return _normalized_name(label) in FOOD_LIBRARY
+
+
 def _lookup_profile(name: str) -> MacroProfile:
     return FOOD_LIBRARY.get(_normalized_name(name), MacroProfile(**DEFAULT_MACROS))
 
@@ -2,7 +2,8 @@ from __future__ import annotations
 
 from typing import Dict, Iterable, List, Optional, Union
 
-from utils.calorie_estimator import estimate_calories
+from utils.calorie_estimator import estimate_calories, is_library_food
+from utils.food_text import parse_food_text
 from utils.image_recognition import detect_foods
 
 FoodInput = Union[str, Dict[str, Union[str, float]]]
@@ -16,13 +17,14 @@ def detect_calories(
     """
     Provides a unified way to derive a calorie estimate either from explicit foods,
     inferred foods (photo), or extra hints. Returns metadata that callers can surface.
+    Typed entries that are not a library food are read as free text ("2 eggs with spinach").
     """
     method = "manual"
-    food_source: List[FoodInput] = _materialize(foods)
+    food_source: List[FoodInput] = _expand_free_text(_materialize(foods))
 
     if not food_source and nutrition_hints:
         method = "hint"
-        food_source = _materialize(nutrition_hints)
+        food_source = _expand_free_text(_materialize(nutrition_hints))
 
     if not food_source and photo_reference:
         method = "photo"
@@ -74,3 +76,16 @@ def _materialize(values: Optional[Iterable[FoodInput]]) -> List[FoodInput]:
     if not values:
         return []
     return list(values)
+
+
+def _expand_free_text(values: List[FoodInput]) -> List[FoodInput]:
+    """Replace free-text strings with the foods they mention; unknown text is kept as one item."""
+    expanded: List[FoodInput] = []
+    for value in values:
+        if isinstance(value, str) and not is_library_food(value):
+            parsed = parse_food_text(value)
+            if parsed:
+                expanded.extend(parsed)
+                continue
+        expanded.append(value)
+    return expanded
@@ -0,0 +1,222 @@
+"""
+Per-user fan-out of meal events for `GET /api/meals/events` (server-sent events).
+
+Publishers call `publish_meal` / `publish_insights` after a write completes; the broker appends
+the event to a short per-user history (for `Last-Event-ID` resumption) and to the bounded buffer
+of each of that user's subscribers. The history outlives the user's last stream by a grace period,
+so a dropped connection can reconnect and replay what it missed; a `Last-Event-ID` older than the
+history gets a `resync` instead. Nothing is computed for users with no open or recent streams, and
+an idle stream is just a thread parked on an Event until the next message or heartbeat.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from utils.metrics import REGISTRY
+
+SSE_SUBSCRIBERS = REGISTRY.gauge("meal_tracker_sse_subscribers", "Open /api/meals/events streams.")
+SSE_EVENTS = REGISTRY.counter(
+    "meal_tracker_sse_events_total",
+    "Events delivered to /api/meals/events subscribers, by type.",
+    ("event",),
+)
+SSE_DROPPED = REGISTRY.counter(
+    "meal_tracker_sse_dropped_total",
+    "Subscribers that fell too far behind and were asked to resync.",
+)
+
+_HISTORY = 64
+_BUFFER = 256
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    type: str
+    data: Dict
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+
+@dataclass(eq=False)
+class Subscriber:
+    user_id: str
+    buffer: Deque[Event] = field(default_factory=lambda: deque(maxlen=_BUFFER))
+    ready: threading.Event = field(default_factory=threading.Event)
+    lagged: bool = False
+
+
+class Broker:
+    def __init__(self, max_subscribers: int = 1000, history_seconds: float = 300.0) -> None:
+        self.max_subscribers = max_subscribers
+        self.history_seconds = history_seconds
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._history: Dict[str, Deque[Event]] = {}
+        # Newest event id that fell out of each user's history; older Last-Event-IDs need a resync.
+        self._evicted: Dict[str, int] = {}
+        # Users whose last stream closed, oldest first, with the monotonic time it closed.
+        self._idle: "OrderedDict[str, float]" = OrderedDict()
+        self._last_insights: Dict[Tuple[str, str], Dict] = {}
+        self._next_id = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def is_tracked(self, user_id: str) -> bool:
+        """Whether events for `user_id` are kept: it has an open stream or closed one recently."""
+        return user_id in self._subscribers or user_id in self._idle
+
+    def _expire(self) -> None:
+        # Callers hold the lock. `_idle` is in closing order, so expired users are at the front.
+        horizon = time.monotonic() - self.history_seconds
+        while self._idle:
+            user_id, closed_at = next(iter(self._idle.items()))
+            if closed_at > horizon:
+                return
+            del self._idle[user_id]
+            self._history.pop(user_id, None)
+            self._evicted.pop(user_id, None)
+            for key in [key for key in self._last_insights if key[0] == user_id]:
+                del self._last_insights[key]
+
+    def subscribe(self, user_id: str, last_event_id: Optional[int] = None) -> Subscriber:
+        subscriber = Subscriber(user_id)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers("Too many open event streams.")
+            self._expire()
+            tracked = self.is_tracked(user_id)
+            self._idle.pop(user_id, None)
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+            self._count += 1
+            SSE_SUBSCRIBERS.set(self._count)
+            if last_event_id is not None:
+                if not tracked or last_event_id < self._evicted.get(user_id, 0) or last_event_id > self._next_id:
+                    # Events may have been missed that the history no longer holds (or the id is from
+                    # before a restart); the client has to reload instead of replaying.
+                    subscriber.lagged = True
+                    SSE_DROPPED.inc()
+                else:
+                    missed = [event for event in self._history.get(user_id, ()) if event.id > last_event_id]
+                    subscriber.buffer.extend(missed)
+            # Insights events carry deltas against what this user's streams last received; start a
+            # new stream from that full state so later deltas apply to something it has seen.
+            for (owner, source), insights in self._last_insights.items():
+                if owner == user_id:
+                    subscriber.buffer.append(Event(self._next_id, "insights", {"source": source, "insights": insights}))
+            if subscriber.buffer or subscriber.lagged:
+                subscriber.ready.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            members = self._subscribers.get(subscriber.user_id)
+            if members is None or subscriber not in members:
+                return
+            members.discard(subscriber)
+            self._count -= 1
+            if not members:
+                # Keep the history for a reconnect; `_expire` drops it after `history_seconds`.
+                del self._subscribers[subscriber.user_id]
+                self._idle[subscriber.user_id] = time.monotonic()
+                self._expire()
+            SSE_SUBSCRIBERS.set(self._count)
+
+    def publish(self, user_id: str, event_type: str, data: Dict) -> Optional[Event]:
+        with self._lock:
+            self._expire()
+            if not self.is_tracked(user_id):
+                return None
+            self._next_id += 1
+            event = Event(self._next_id, event_type, data)
+            history = self._history.setdefault(user_id, deque(maxlen=_HISTORY))
+            if len(history) == history.maxlen:
+                self._evicted[user_id] = history[0].id
+            history.append(event)
+            members = self._subscribers.get(user_id, ())
+            for subscriber in members:
+                if len(subscriber.buffer) == subscriber.buffer.maxlen and not subscriber.lagged:
+                    subscriber.lagged = True
+                    SSE_DROPPED.inc()
+                subscriber.buffer.append(event)
+                subscriber.ready.set()
+        SSE_EVENTS.inc(len(members), event=event_type)
+        return event
+
+    def insights_delta(self, user_id: str, source: str, insights: Dict) -> Dict:
+        """The sections of `insights` that differ from what this user's streams last received."""
+        key = (user_id, source)
+        with self._lock:
+            previous = self._last_insights.get(key) or {}
+            self._last_insights[key] = insights
+        return {name: value for name, value in insights.items() if previous.get(name) != value}
+
+    def publish_meal(
+        self, user_id: str, meal: Dict, source: str, insights: Optional[Callable[[], Dict]] = None
+    ) -> None:
+        if not self.is_tracked(user_id):
+            return
+        data = {"source": source, "meal": meal}
+        if insights is not None:
+            data["insights"] = self.insights_delta(user_id, source, insights())
+        self.publish(user_id, "meal", data)
+
+    def publish_insights(self, user_id: str, source: str, insights: Dict) -> None:
+        if not self.is_tracked(user_id):
+            return
+        delta = self.insights_delta(user_id, source, insights)
+        if delta:
+            self.publish(user_id, "insights", {"source": source, "insights": delta})
+
+    def stream(self, subscriber: Subscriber, heartbeat_seconds: float) -> Iterator[str]:
+        """
+        SSE text for one subscribed connection: buffered events as they arrive, a comment line when
+        idle. Unsubscribes when the stream ends; callers that may never start it must also
+        `unsubscribe` when the response closes.
+        """
+        try:
+            yield "retry: 3000\n: connected\n\n"
+            while True:
+                if not subscriber.ready.wait(heartbeat_seconds):
+                    yield ": heartbeat\n\n"
+                    continue
+                with self._lock:
+                    subscriber.ready.clear()
+                    events: List[Event] = list(subscriber.buffer)
+                    subscriber.buffer.clear()
+                    lagged, subscriber.lagged = subscriber.lagged, False
+                if lagged:
+                    # Some events were overwritten or expired; tell the client to reload instead of guessing.
+                    yield "event: resync\ndata: {}\n\n"
+                yield "".join(event.encode() for event in events)
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+HEARTBEAT_SECONDS = _env_number("SSE_HEARTBEAT_SECONDS", 15.0)
+_broker = Broker(
+    max_subscribers=int(_env_number("SSE_MAX_SUBSCRIBERS", 1000)),
+    history_seconds=_env_number("SSE_HISTORY_SECONDS", 300.0),
+)
+
+
+def broker() -> Broker:
+    return _broker
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List
+
+EXPORT_COLUMNS: List[str] = [
+    "meal_id",
+    "user_id",
+    "created_at",
+    "meal_calories",
+    "points",
+    "mood",
+    "notes",
+    "calorie_method",
+    "calorie_confidence",
+    "food_index",
+    "food_name",
+    "food_quantity",
+    "food_calories",
+    "protein",
+    "carbs",
+    "fat",
+    "food_source",
+]
+CHUNK_SIZE = 64 * 1024
+
+
+def flatten_meal(meal: Dict) -> Iterator[Dict]:
+    """One row per food, repeating the meal columns; meals without foods still yield one row."""
+    base = {
+        "meal_id": meal.get("id"),
+        "user_id": meal.get("user_id"),
+        "created_at": meal.get("created_at"),
+        "meal_calories": meal.get("calories"),
+        "points": meal.get("points"),
+        "mood": meal.get("mood"),
+        "notes": meal.get("notes"),
+        "calorie_method": meal.get("calorie_method"),
+        "calorie_confidence": meal.get("calorie_confidence"),
+    }
+    foods = meal.get("foods") or []
+    if not foods:
+        yield {**base, "food_index": None, "food_name": None, "food_quantity": None, "food_calories": None,
+               "protein": None, "carbs": None, "fat": None, "food_source": None}
+        return
+    for index, food in enumerate(foods):
+        macros = food.get("macros") or {}
+        yield {
+            **base,
+            "food_index": index,
+            "food_name": food.get("name"),
+            "food_quantity": food.get("quantity"),
+            "food_calories": food.get("calories"),
+            "protein": macros.get("protein"),
+            "carbs": macros.get("carbs"),
+            "fat": macros.get("fat"),
+            "food_source": food.get("source"),
+        }
+
+
+def csv_chunks(meals: Iterable[Dict], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for meal in meals:
+        for row in flatten_meal(meal):
+            writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def jsonl_chunks(meals: Iterable[Dict], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    parts: List[str] = []
+    size = 0
+    for meal in meals:
+        for row in flatten_meal(meal):
+            line = json.dumps(row, default=str) + "\n"
+            parts.append(line)
+            size += len(line)
+        if size >= chunk_size:
+            yield "".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts)
+
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encoded_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield chunk.encode("utf-8")
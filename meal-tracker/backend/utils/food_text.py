@@ -0,0 +1,252 @@
+"""
+Free-text food parsing: "2 eggs with spinach and half a banana" -> egg x2, spinach, banana x0.5.
+
+`FoodMatcher` is an Aho-Corasick automaton over every food name and alias, built once. One pass
+over the text reports every whole-word mention (plurals in "s"/"es" included), so parsing is
+linear in the text length no matter how many foods the library holds. Overlapping mentions are
+resolved leftmost-longest ("greek yogurt" beats "yogurt"), and each food takes its quantity from
+the words right before it ("2", "half a", "a couple of", "3 cups of") or a trailing "x2". Other
+words that name something ("pizza" in "pizza and salad") become items of their own, so unknown
+foods still count at the default macros.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from utils.calorie_estimator import FOOD_ALIASES, FOOD_LIBRARY, QUANTITY_HINTS
+
+_COUNT_WORDS = {
+    "a": 1.0,
+    "an": 1.0,
+    "one": 1.0,
+    "two": 2.0,
+    "three": 3.0,
+    "four": 4.0,
+    "five": 5.0,
+    "six": 6.0,
+    "seven": 7.0,
+    "eight": 8.0,
+    "nine": 9.0,
+    "ten": 10.0,
+    "couple": 2.0,
+    "dozen": 12.0,
+}
+# Words allowed between a quantity and its food: "2 cups of rice", "a bowl of oatmeal".
+_FILLER = {
+    "x", "×", "of", "cup", "cups", "bowl", "bowls", "plate", "plates", "serving", "servings", "portion",
+    "portions", "piece", "pieces", "slice", "slices", "handful", "handfuls", "scoop", "scoops", "glass",
+    "glasses", "small", "large", "big", "medium",
+}
+# Words that do not name a food on their own: "i had some fresh spinach", "grilled salmon for lunch".
+_IGNORED = {
+    "i", "had", "have", "ate", "eat", "some", "the", "my", "for", "at", "on", "in", "to", "just", "also", "side",
+    "breakfast", "lunch", "dinner", "snack", "fresh", "grilled", "steamed", "boiled", "roasted", "fried", "baked",
+    "raw", "plain", "cooked", "scrambled", "poached", "mixed", "sliced", "chopped", "homemade",
+}
+_CONNECTORS = {"and", "with", "plus", "then", "or"}
+_SEPARATOR = re.compile(r"[,;/&+]|\b(?:" + "|".join(sorted(_CONNECTORS)) + r")\b")
+_WORD = re.compile(r"[a-z][a-z0-9.×]*")
+_NOT_FOOD = frozenset(_FILLER | _IGNORED | _CONNECTORS | set(_COUNT_WORDS) | set(QUANTITY_HINTS))
+_TOKEN = re.compile(r"[a-z0-9.×]+|[^\sa-z0-9.×]")
+_NUMBER = re.compile(r"^(?:x|×)?(\d+(?:\.\d+)?)(?:x|×)?$")
+_TRAILING_COUNT = re.compile(r"\s*[x×]\s*(\d+(?:\.\d+)?)\b")
+_WHITESPACE = re.compile(r"\s+")
+
+# (start, end, canonical name, singular name when the mention is also a plural of another food)
+Mention = Tuple[int, int, str, Optional[str]]
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+class FoodMatcher:
+    """Aho-Corasick automaton mapping each pattern (name or alias) to its canonical food name."""
+
+    def __init__(self, patterns: Mapping[str, str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (pattern length, canonical name) for nodes that end a pattern.
+        self._output: List[Optional[Tuple[int, str]]] = [None]
+        # Nearest node on the fail chain that ends a pattern (0 when there is none).
+        self._link: List[int] = [0]
+        for pattern, canonical in patterns.items():
+            self._add(_normalize(pattern), canonical)
+        self._build_links()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def _add(self, pattern: str, canonical: str) -> None:
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._link.append(0)
+            node = child
+        self._output[node] = (len(pattern), canonical)
+
+    def _build_links(self) -> None:
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self._goto[node].items():
+                pending.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target
+                self._link[child] = target if self._output[target] else self._link[target]
+
+    def mentions(self, text: str) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        `(start, end, canonical, exact)` for every whole-word occurrence in normalized `text`;
+        `exact` is False when the end was stretched over a plural "s"/"es".
+        """
+        goto, fail, output, link = self._goto, self._fail, self._output, self._link
+        size = len(text)
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            hit = node if output[node] else link[node]
+            while hit:
+                length, canonical = output[hit]
+                start, end = index + 1 - length, index + 1
+                hit = link[hit]
+                if start and text[start - 1].isalnum():
+                    continue
+                if end < size and text[end].isalnum():
+                    suffix = 2 if text.startswith("es", end) else 1 if text[end] == "s" else 0
+                    if not suffix or (end + suffix < size and text[end + suffix].isalnum()):
+                        continue
+                    yield start, end + suffix, canonical, False
+                    continue
+                yield start, end, canonical, True
+
+    def find(self, text: str) -> List[Mention]:
+        """
+        Non-overlapping mentions in `text` (already normalized), leftmost-longest, exact over plural.
+        Each carries the singular food when the same span also reads as a plural ("eggs" -> "egg").
+        """
+        best: List[Optional[List]] = [None] * len(text)
+        for start, end, canonical, exact in self.mentions(text):
+            current = best[start]
+            if current is None or end > current[0]:
+                best[start] = [end, exact, canonical, None if exact else canonical]
+            elif end == current[0]:
+                if exact and not current[1]:
+                    current[1], current[2] = True, canonical
+                elif not exact:
+                    current[3] = canonical
+        chosen: List[Mention] = []
+        position = 0
+        for start, candidate in enumerate(best):
+            if candidate is not None and start >= position:
+                end, _exact, canonical, singular = candidate
+                chosen.append((start, end, canonical, singular))
+                position = end
+        return chosen
+
+
+def _leading_quantity(gap: str) -> Tuple[float, bool]:
+    """
+    Quantity written right before a food, read backwards through `gap` until a word that is not
+    part of it, and whether it included a count ("2", "a couple") rather than only "half".
+    """
+    count: Optional[float] = None
+    factor = 1.0
+    extra = 0.0
+    for token in reversed(_TOKEN.findall(gap)):
+        if token in _FILLER:
+            continue
+        if token in QUANTITY_HINTS:
+            factor *= QUANTITY_HINTS[token]
+            continue
+        if token == "and" and count == 1.0 and factor == 0.5 and not extra:
+            # "two and a half": the half is added to the count before it.
+            count, factor, extra = None, 1.0, 0.5
+            continue
+        number = _NUMBER.match(token)
+        value = float(number.group(1)) if number else _COUNT_WORDS.get(token)
+        if value is None or count is not None:
+            break
+        count = value
+    if count is None:
+        return (extra or 1.0) * factor, False
+    return (count + extra) * factor, True
+
+
+def _names_food(token: str) -> bool:
+    return token[0].isalpha() and token not in _NOT_FOOD and not _NUMBER.match(token)
+
+
+def _unmatched_foods(gap: str) -> List[Dict]:
+    """
+    Items for the words between two mentions that name no known food ("pizza" in "pizza and
+    salad"), so they still count at the default macros instead of silently disappearing.
+    """
+    foods: List[Dict] = []
+    if _NOT_FOOD.issuperset(_WORD.findall(gap)):
+        return foods  # the usual case: only connectors and quantities
+    for segment in _SEPARATOR.split(gap):
+        tokens = _TOKEN.findall(segment)
+        named = [index for index, token in enumerate(tokens) if _names_food(token)]
+        if not named:
+            continue
+        first, last = named[0], named[-1]
+        quantity, _counted = _leading_quantity(" ".join(tokens[:first]))
+        name = " ".join(token for token in tokens[first : last + 1] if token not in _IGNORED)
+        foods.append({"name": name, "quantity": round(max(quantity, 0.1), 2), "source": "text"})
+    return foods
+
+
+@lru_cache(maxsize=1)
+def default_matcher() -> FoodMatcher:
+    """Matcher over `FOOD_LIBRARY` names and `FOOD_ALIASES`, built on first use."""
+    patterns = {name: name for name in FOOD_LIBRARY}
+    patterns.update(FOOD_ALIASES)
+    return FoodMatcher(patterns)
+
+
+def parse_food_text(text: str, matcher: Optional[FoodMatcher] = None) -> List[Dict]:
+    """
+    Food items mentioned in `text`, as `{"name", "quantity", "source": "text"}` dicts ready for
+    `normalize_foods`, in the order written. Words around the known foods that name something else
+    become items of their own. Returns an empty list when no known food is mentioned.
+    """
+    normalized = _normalize(text)
+    foods: List[Dict] = []
+    previous_end = 0
+    for start, end, name, singular in (matcher or default_matcher()).find(normalized):
+        if start < previous_end:
+            continue  # swallowed by the previous food's trailing "x2"
+        gap = normalized[previous_end:start]
+        foods.extend(_unmatched_foods(gap))
+        quantity, counted = _leading_quantity(gap)
+        trailing = _TRAILING_COUNT.match(normalized, end)
+        if trailing:
+            quantity *= float(trailing.group(1))
+            counted = True
+            end = trailing.end()
+        if counted and singular:
+            # "2 eggs" is two servings of "egg", not of the "eggs" portion.
+            name = singular
+        foods.append({"name": name, "quantity": round(max(quantity, 0.1), 2), "source": "text"})
+        previous_end = end
+    if foods:
+        foods.extend(_unmatched_foods(normalized[previous_end:]))
+    return foods
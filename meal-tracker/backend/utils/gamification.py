@@ -4,12 +4,17 @@ from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from typing import Dict, Iterable, List, Optional
 
+from utils.achievements import aggregate_meals, evaluate_all
+
+PLANT_TOKENS = ("salad", "vegg")
+PROTEIN_TOKENS = ("chicken", "tofu", "egg", "yogurt")
+
 
 def calculate_points(calories: float, foods: Iterable[Dict[str, float]]) -> int:
     base = max(5, 60 - int(calories // 12))
     labels = [item.get("name", "").lower() for item in foods]
-    plant_bonus = 5 if any("salad" in label or "vegg" in label for label in labels) else 0
-    protein_bonus = 5 if any(token in label for label in labels for token in ["chicken", "tofu", "egg", "yogurt"]) else 0
+    plant_bonus = 5 if any(token in label for label in labels for token in PLANT_TOKENS) else 0
+    protein_bonus = 5 if any(token in label for label in labels for token in PROTEIN_TOKENS) else 0
     variety_bonus = min(10, max(0, len({label for label in labels if label}) - 1) * 2)
     balance_bonus = 8 if 350 <= calories <= 650 else 0
     indulge_penalty = -5 if calories > 900 else 0
@@ -25,54 +30,11 @@ def _parse_date(date_str: str) -> datetime:
 
 
 def summarize_achievements(meals: List[Dict], weekly: Optional[Dict] = None) -> List[Dict]:
-    weekly = weekly or weekly_summary(meals)
-    streaks = streak_report(meals)
-    variety = _weekly_variety(meals)
-    achievements = [
-        {
-            "id": "first-log",
-            "label": "First Meal Logged",
-            "achieved": len(meals) > 0,
-            "details": "Unlocked as soon as you record your first meal.",
-            "progress": f"{1 if len(meals) else 0}/1",
-        },
-        {
-            "id": "weekly-habit",
-            "label": "3-Day Streak",
-            "achieved": _longest_streak(meals) >= 3,
-            "details": "Log meals three days in a row to prove your consistency.",
-            "progress": f"{min(streaks['longest'], 3)}/3",
-        },
-        {
-            "id": "weekly-hero",
-            "label": "Weekly Hero",
-            "achieved": weekly["count"] >= 5,
-            "details": "Capture five meals this week to stay mindful.",
-            "progress": f"{min(weekly['count'], 5)}/5",
-        },
-        {
-            "id": "balanced-week",
-            "label": "Balanced Week",
-            "achieved": 350 <= weekly["averageCalories"] <= 700 and weekly["count"] >= 3,
-            "details": "Keep your weekly average calories in the healthy sweet spot.",
-            "progress": f"{int(weekly['averageCalories'])} avg kcal",
-        },
-        {
-            "id": "colorful-plate",
-            "label": "Colorful Plate",
-            "achieved": variety >= 5,
-            "details": "Try at least five unique foods in the last week for balanced nutrition.",
-            "progress": f"{min(variety, 5)}/5 foods",
-        },
-        {
-            "id": "streak-sprinter",
-            "label": "7-Day Sprinter",
-            "achieved": streaks["longest"] >= 7,
-            "details": "Maintain a week-long streak of mindful eating logs.",
-            "progress": f"{min(streaks['longest'], 7)}/7 days",
-        },
-    ]
-    return achievements
+    """
+    Stateless evaluation of every rule in `utils.achievements.RULES` over a full meal list.
+    `weekly` is accepted for older callers; the rules read their own aggregates.
+    """
+    return evaluate_all(aggregate_meals(meals))
 
 
 def weekly_summary(meals: List[Dict]) -> Dict:
@@ -102,10 +64,15 @@ def streak_report(meals: List[Dict]) -> Dict[str, int]:
     return {"current": _current_streak(meals), "longest": _longest_streak(meals)}
 
 
-def coaching_tips(meals: List[Dict], weekly: Optional[Dict] = None) -> List[str]:
+def coaching_tips(
+    meals: List[Dict],
+    weekly: Optional[Dict] = None,
+    streaks: Optional[Dict[str, int]] = None,
+    variety: Optional[int] = None,
+) -> List[str]:
     weekly = weekly or weekly_summary(meals)
     tips: List[str] = []
-    streaks = streak_report(meals)
+    streaks = streaks or streak_report(meals)
     if streaks["current"] < 3:
         tips.append("Log meals three days in a row to unlock the Weekly Habit badge.")
     if weekly["count"] < 5:
@@ -114,7 +81,7 @@ def coaching_tips(meals: List[Dict], weekly: Optional[Dict] = None) -> List[str]
         tips.append("Your averages are trending high—try swapping in a lighter lunch or scaling back portions.")
     if weekly["averageCalories"] and weekly["averageCalories"] < 350:
         tips.append("Average calories look low. Make sure you are fueling enough for your activity.")
-    if _weekly_variety(meals) < 5:
+    if (variety if variety is not None else _weekly_variety(meals)) < 5:
         tips.append("Add more variety—colorful fruits and veggies can boost micronutrients.")
     if not tips:
         tips.append("Great balance! Keep up the streak and consider setting a macro goal next.")
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import Response, jsonify, make_response, request
+
+from utils.identity import current_user_id
+from utils.metrics import REGISTRY
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+_MAX_KEY_LENGTH = 255
+
+IDEMPOTENCY_REQUESTS = REGISTRY.counter(
+    "meal_tracker_idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by outcome.",
+    ("outcome",),
+)
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    expires_at: float
+    done: threading.Event = field(default_factory=threading.Event)
+    status: Optional[int] = None
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class IdempotencyStore:
+    """
+    Bounded LRU of idempotency keys -> request fingerprint and stored response. Entries expire
+    after `ttl_seconds`; the least recently used completed entry is evicted beyond `max_entries`.
+    """
+
+    def __init__(self, ttl_seconds: float = 24 * 3600, max_entries: int = 10_000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_entries:
+                return
+            if not entry.done.is_set() and entry.expires_at > now:
+                # Never drop an in-flight request; move it to the back and stop.
+                self._entries.move_to_end(key)
+                return
+            del self._entries[key]
+
+    def reserve(self, scope: Tuple[str, str], fingerprint: str) -> Tuple[str, _Entry]:
+        """Returns ("new", entry) for the caller that must run the request, else ("existing", entry)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[scope]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(scope)
+                return "existing", entry
+            entry = _Entry(fingerprint=fingerprint, expires_at=now + self.ttl_seconds)
+            self._entries[scope] = entry
+            self._evict(now)
+            return "new", entry
+
+    def complete(self, entry: _Entry, response: Response) -> None:
+        entry.status = response.status_code
+        entry.body = response.get_data()
+        entry.headers = {
+            name: value for name, value in response.headers.items() if name.lower() in {"content-type", "location"}
+        }
+        entry.done.set()
+
+    def release(self, scope: Tuple[str, str], entry: _Entry) -> None:
+        """Forget a key whose request failed server-side so a retry can run it again."""
+        with self._lock:
+            if self._entries.get(scope) is entry:
+                del self._entries[scope]
+        entry.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_store = IdempotencyStore(
+    ttl_seconds=_env_number("IDEMPOTENCY_TTL_SECONDS", 24 * 3600),
+    max_entries=int(_env_number("IDEMPOTENCY_MAX_KEYS", 10_000)),
+)
+_WAIT_SECONDS = _env_number("IDEMPOTENCY_WAIT_SECONDS", 10)
+
+
+def idempotency_store() -> IdempotencyStore:
+    return _store
+
+
+def _fingerprint() -> str:
+    digest = hashlib.sha256()
+    digest.update(request.method.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(request.path.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(entry: _Entry) -> Response:
+    response = make_response(entry.body, entry.status)
+    for name, value in entry.headers.items():
+        response.headers[name] = value
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    Honour an `Idempotency-Key` header on create endpoints: the first request with a key runs and
+    its response (anything below 500) is stored; retries with the same key and body get the stored
+    response back without re-running the view. Reusing a key with a different body is a 422.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > _MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most {_MAX_KEY_LENGTH} characters."}), 400
+
+        scope = (current_user_id(), key)
+        fingerprint = _fingerprint()
+        state, entry = _store.reserve(scope, fingerprint)
+        if state == "existing":
+            if entry.fingerprint != fingerprint:
+                IDEMPOTENCY_REQUESTS.inc(outcome="mismatch")
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used with a different request."}), 422
+            if not entry.done.wait(_WAIT_SECONDS) or entry.status is None:
+                IDEMPOTENCY_REQUESTS.inc(outcome="conflict")
+                response = jsonify({"error": "A request with this Idempotency-Key is still in progress."})
+                response.status_code = 409
+                response.headers["Retry-After"] = "1"
+                return response
+            IDEMPOTENCY_REQUESTS.inc(outcome="replayed")
+            return _replay(entry)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _store.release(scope, entry)
+            raise
+        if response.status_code >= 500:
+            _store.release(scope, entry)
+            IDEMPOTENCY_REQUESTS.inc(outcome="not_stored")
+        else:
+            _store.complete(entry, response)
+            IDEMPOTENCY_REQUESTS.inc(outcome="stored")
+        return response
+
+    return wrapper
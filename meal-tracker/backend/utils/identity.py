@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from flask import g, has_request_context
+
+DEFAULT_USER_ID = "demo"
+
+
+def resolve_user_id(value) -> str:
+    if value is None:
+        return DEFAULT_USER_ID
+    candidate = str(value).strip()
+    return candidate or DEFAULT_USER_ID
+
+
+def current_user_id(explicit: Optional[object] = None) -> str:
+    """JWT subject when the caller has one, else the explicit user id (API-key callers), else the demo user."""
+    if has_request_context():
+        subject = g.get("current_user")
+        if subject:
+            return str(subject)
+    return resolve_user_id(explicit)
@@ -0,0 +1,273 @@
+"""
+Insights payloads and the snapshot scheduler for meals persisted in Supabase.
+
+The in-memory store keeps its aggregates up to date on every `record_meal`, so `/api/meals/insights`
+can build the payload directly. Supabase data has no such hook, so `InsightsScheduler` rebuilds
+per-user snapshots in a background thread — all users in one streaming pass every
+`INSIGHTS_REFRESH_SECONDS`, and individual users shortly after they log a meal — and the request
+path only reads the latest snapshot. Snapshots older than `INSIGHTS_FRESH_SECONDS` are still served
+but queue a refresh (stale-while-revalidate).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.achievements import Aggregates, evaluate_all
+from utils.gamification import coaching_tips, weekly_summary
+from utils.metrics import REGISTRY
+
+_logger = logging.getLogger(__name__)
+
+SNAPSHOT_READS = REGISTRY.counter(
+    "meal_tracker_insights_snapshot_reads_total",
+    "Insights snapshot lookups on the request path, by result (fresh, stale, miss).",
+    ("result",),
+)
+SNAPSHOT_REFRESH_LATENCY = REGISTRY.histogram(
+    "meal_tracker_insights_snapshot_refresh_seconds",
+    "Time to rebuild insights snapshots from Supabase, by scope (user, all) and outcome.",
+    ("scope", "outcome"),
+)
+SNAPSHOT_USERS = REGISTRY.gauge(
+    "meal_tracker_insights_snapshot_users",
+    "Users with a cached insights snapshot.",
+)
+
+
+def build_payload(aggregates: Aggregates, achievements: List[Dict], points: int) -> Dict:
+    """The `/api/meals/insights` body for one user's aggregates."""
+    recent_meals = aggregates.window_meals()
+    summary = weekly_summary(recent_meals)
+    streaks = {"current": aggregates.current_streak(), "longest": aggregates.longest_streak}
+    return {
+        "weekly": summary,
+        "achievements": achievements,
+        "points": points,
+        "totalMeals": aggregates.meal_count,
+        "streaks": streaks,
+        "recommendations": coaching_tips(recent_meals, summary, streaks=streaks, variety=aggregates.weekly_variety),
+    }
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    payload: Dict
+    computed_at: float
+
+    def age(self) -> float:
+        return time.time() - self.computed_at
+
+
+def _supabase_meals(user_id: Optional[str]) -> Iterable[Tuple[str, Dict]]:
+    from supabase_client import iter_meal_rows, normalize_meal_row
+
+    for row in iter_meal_rows(user_id=user_id):
+        yield row.get("user_id") or "", normalize_meal_row(row)
+
+
+MealLoader = Callable[[Optional[str]], Iterable[Tuple[str, Dict]]]
+
+
+def _env_seconds(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class InsightsScheduler:
+    """
+    Keeps one insights snapshot per user, rebuilt off the request path. `loader(user_id)` yields
+    `(user_id, meal)` pairs for that user, or for every user when given None.
+    """
+
+    def __init__(
+        self,
+        loader: MealLoader = _supabase_meals,
+        refresh_seconds: float = 300.0,
+        fresh_seconds: float = 60.0,
+    ) -> None:
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self.fresh_seconds = fresh_seconds
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._dirty: Set[str] = set()
+        # Users whose snapshot was read since the last sweep.
+        self._read: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[str, Dict], None]] = []
+
+    def add_listener(self, listener: Callable[[str, Dict], None]) -> None:
+        """Call `listener(user_id, payload)` whenever a user's snapshot is rebuilt."""
+        self._listeners.append(listener)
+
+    def _notify(self, snapshots: Dict[str, Snapshot]) -> None:
+        for listener in self._listeners:
+            for user_id, snapshot in snapshots.items():
+                try:
+                    listener(user_id, snapshot.payload)
+                except Exception:
+                    _logger.exception("Insights listener failed for %s", user_id)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="insights-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        next_sweep = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() >= next_sweep:
+                self.refresh_all()
+                next_sweep = time.monotonic() + self.refresh_seconds
+            self._wake.wait(max(0.0, next_sweep - time.monotonic()))
+            self._wake.clear()
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            for user_id in dirty:
+                if self._stop.is_set():
+                    return
+                self.refresh_user(user_id)
+
+    def mark_dirty(self, user_id: str) -> None:
+        """Queue a rebuild for `user_id`; bursts of inserts collapse into one refresh."""
+        with self._lock:
+            self._dirty.add(user_id)
+        self._wake.set()
+        self.start()
+
+    def get(self, user_id: str) -> Snapshot:
+        """
+        The user's latest snapshot. Stale snapshots are returned as-is with a refresh queued; only a
+        user with no snapshot yet is computed inline.
+        """
+        self._read.add(user_id)
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is None:
+            SNAPSHOT_READS.inc(result="miss")
+            self.start()
+            return self.refresh_user(user_id, raise_errors=True)
+        if snapshot.age() > self.fresh_seconds:
+            SNAPSHOT_READS.inc(result="stale")
+            self.mark_dirty(user_id)
+        else:
+            SNAPSHOT_READS.inc(result="fresh")
+        return snapshot
+
+    @staticmethod
+    def _build(
+        groups: Dict[str, Aggregates], points: Dict[str, int], now: datetime, computed_at: float
+    ) -> Dict[str, Snapshot]:
+        snapshots: Dict[str, Snapshot] = {}
+        for user_id, aggregates in groups.items():
+            aggregates.expire(now)
+            payload = build_payload(aggregates, evaluate_all(aggregates), points[user_id])
+            snapshots[user_id] = Snapshot(payload, computed_at)
+        return snapshots
+
+    def _aggregate(self, user_id: Optional[str]) -> Tuple[Dict[str, Aggregates], Dict[str, int], datetime]:
+        # Aggregates only retain the 7-day window and the set of logged days, so a full sweep holds
+        # one small state per user rather than every row.
+        now = datetime.utcnow()
+        groups: Dict[str, Aggregates] = defaultdict(Aggregates)
+        points: Dict[str, int] = defaultdict(int)
+        for owner, meal in self.loader(user_id):
+            groups[owner].add(meal, now)
+            points[owner] += int(meal.get("points") or 0)
+        if user_id is not None:
+            groups.setdefault(user_id, Aggregates())
+        return groups, points, now
+
+    def refresh_user(self, user_id: str, raise_errors: bool = False) -> Optional[Snapshot]:
+        started = time.perf_counter()
+        try:
+            computed_at = time.time()
+            groups, points, now = self._aggregate(user_id)
+            snapshot = self._build({user_id: groups[user_id]}, points, now, computed_at)[user_id]
+        except Exception:
+            SNAPSHOT_REFRESH_LATENCY.observe(time.perf_counter() - started, scope="user", outcome="error")
+            if raise_errors:
+                raise
+            _logger.exception("Refreshing insights for %s failed; keeping the previous snapshot.", user_id)
+            return self._snapshots.get(user_id)
+        SNAPSHOT_REFRESH_LATENCY.observe(time.perf_counter() - started, scope="user", outcome="ok")
+        with self._lock:
+            current = self._snapshots.get(user_id)
+            if current is None or current.computed_at <= snapshot.computed_at:
+                self._snapshots[user_id] = snapshot
+            SNAPSHOT_USERS.set(len(self._snapshots))
+            latest = self._snapshots[user_id]
+        self._notify({user_id: latest})
+        return latest
+
+    def refresh_all(self) -> int:
+        """
+        Rebuild every user's snapshot from one pass over the table and merge them in; returns the
+        number of snapshots held. Users without rows keep an empty snapshot while they are being
+        read, and are dropped once a whole sweep period passes without a read.
+        """
+        started = time.perf_counter()
+        try:
+            computed_at = time.time()
+            groups, points, now = self._aggregate(None)
+            with_rows = set(groups)
+            for user_id in list(self._snapshots):
+                groups.setdefault(user_id, Aggregates())
+            snapshots = self._build(groups, points, now, computed_at)
+        except Exception:
+            SNAPSHOT_REFRESH_LATENCY.observe(time.perf_counter() - started, scope="all", outcome="error")
+            _logger.exception("Refreshing insights snapshots failed; keeping the previous snapshots.")
+            return 0
+        SNAPSHOT_REFRESH_LATENCY.observe(time.perf_counter() - started, scope="all", outcome="ok")
+        with self._lock:
+            read, self._read = self._read, set()
+            updated: Dict[str, Snapshot] = {}
+            for user_id, snapshot in snapshots.items():
+                current = self._snapshots.get(user_id)
+                if current is not None and current.computed_at > computed_at:
+                    continue  # a per-user refresh finished while the sweep was running
+                if user_id not in with_rows and user_id not in read:
+                    self._snapshots.pop(user_id, None)
+                    continue
+                self._snapshots[user_id] = updated[user_id] = snapshot
+            SNAPSHOT_USERS.set(len(self._snapshots))
+            held = len(self._snapshots)
+        self._notify(updated)
+        return held
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+            self._dirty.clear()
+            self._read.clear()
+            SNAPSHOT_USERS.set(0)
+
+
+_scheduler = InsightsScheduler(
+    refresh_seconds=_env_seconds("INSIGHTS_REFRESH_SECONDS", 300.0),
+    fresh_seconds=_env_seconds("INSIGHTS_FRESH_SECONDS", 60.0),
+)
+
+
+def scheduler() -> InsightsScheduler:
+    return _scheduler
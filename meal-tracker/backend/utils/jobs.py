@@ -0,0 +1,193 @@
+"""
+Bounded background job queue for slow meal creation (photo recognition + calorie estimation).
+
+Jobs are accepted only while the queue has room; `submit` raises `QueueFull` otherwise so the
+caller can answer 503 instead of piling work up. A fixed pool of daemon threads drains the queue,
+and finished jobs are kept for `MEAL_JOB_TTL_SECONDS` so clients can poll for the result.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import jsonify, request, url_for
+
+from utils.metrics import REGISTRY
+
+_logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JOB_QUEUE_DEPTH = REGISTRY.gauge("meal_tracker_job_queue_depth", "Meal jobs waiting for a worker.")
+JOBS_RUNNING = REGISTRY.gauge("meal_tracker_jobs_running", "Meal jobs currently being processed.")
+JOB_LATENCY = REGISTRY.histogram(
+    "meal_tracker_job_latency_seconds",
+    "Time from submission to completion of a meal job, by outcome.",
+    ("outcome",),
+)
+JOB_WAIT = REGISTRY.histogram("meal_tracker_job_wait_seconds", "Time meal jobs spend queued before a worker picks them up.")
+JOBS_REJECTED = REGISTRY.counter("meal_tracker_jobs_rejected_total", "Meal jobs refused because the queue was full.")
+
+# A job returns (HTTP status, response body) — the same answer the synchronous endpoint would give.
+JobResult = Tuple[int, Dict]
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    owner: str
+    work: Callable[[], JobResult] = field(repr=False)
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result_status: Optional[int] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        def stamp(value: Optional[float]) -> Optional[str]:
+            return datetime.utcfromtimestamp(value).isoformat() if value is not None else None
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "submittedAt": stamp(self.submitted_at),
+            "startedAt": stamp(self.started_at),
+            "finishedAt": stamp(self.finished_at),
+            "resultStatus": self.result_status,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    def __init__(self, workers: int = 4, max_queue: int = 100, ttl_seconds: float = 3600.0, max_jobs: int = 10_000) -> None:
+        self.workers = max(1, workers)
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._queue: "queue.Queue[Job]" = queue.Queue(maxsize=max(1, max_queue))
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"meal-jobs-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _prune(self, now: float) -> None:
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            finished = job.finished_at is not None
+            if finished and (now - job.finished_at > self.ttl_seconds or len(self._jobs) > self.max_jobs):
+                self._jobs.popitem(last=False)
+                continue
+            return
+
+    def submit(self, owner: str, work: Callable[[], JobResult]) -> Job:
+        self._start()
+        job = Job(id=uuid.uuid4().hex, owner=owner, work=work)
+        with self._lock:
+            self._prune(time.time())
+            self._jobs[job.id] = job
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                del self._jobs[job.id]
+                JOBS_REJECTED.inc()
+                raise QueueFull("Too many meals are being processed; retry shortly.") from None
+            JOB_QUEUE_DEPTH.set(self._queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            JOB_QUEUE_DEPTH.set(self._queue.qsize())
+            job.started_at = time.time()
+            job.status = RUNNING
+            JOB_WAIT.observe(job.started_at - job.submitted_at)
+            try:
+                with JOBS_RUNNING.track_inprogress():
+                    job.result_status, job.result = job.work()
+                job.status = SUCCEEDED if job.result_status < 400 else FAILED
+            except Exception as exc:
+                _logger.exception("Meal job %s failed", job.id)
+                job.status = FAILED
+                job.result_status = 500
+                job.error = str(exc)
+            finally:
+                job.work = None
+                job.finished_at = time.time()
+                JOB_LATENCY.observe(job.finished_at - job.submitted_at, outcome=job.status)
+                self._queue.task_done()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+_job_queue = JobQueue(
+    workers=_env_int("MEAL_JOB_WORKERS", 4),
+    max_queue=_env_int("MEAL_JOB_QUEUE_SIZE", 100),
+    ttl_seconds=_env_int("MEAL_JOB_TTL_SECONDS", 3600),
+)
+
+
+def job_queue() -> JobQueue:
+    return _job_queue
+
+
+def defer_requested(payload: Dict) -> bool:
+    """
+    Whether a create request should become a job: the client asked for it (`Prefer: respond-async`
+    or `?async=1`) and the foods have to come from photo recognition.
+    """
+    asked = "respond-async" in (request.headers.get("Prefer") or "").lower() or request.args.get("async") in {"1", "true"}
+    photo_only = not payload.get("foods") and not payload.get("nutritionHints")
+    return asked and photo_only and bool(payload.get("photoUrl") or payload.get("photoData"))
+
+
+def submit_response(owner: str, work: Callable[[], JobResult]):
+    """Queue `work` and answer 202 with the job, or 503 when the queue is full."""
+    try:
+        job = _job_queue.submit(owner, work)
+    except QueueFull as exc:
+        response = jsonify({"error": str(exc)})
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+        return response
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers["Location"] = url_for("meals.get_job", job_id=job.id)
+    response.headers["Retry-After"] = "1"
+    return response
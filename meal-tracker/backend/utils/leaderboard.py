@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class _Fenwick:
+    """Binary indexed tree of user counts per score bucket; grows by doubling."""
+
+    def __init__(self, size: int = 1024) -> None:
+        self.size = size
+        self._tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int) -> None:
+        position = index + 1
+        while position <= self.size:
+            self._tree[position] += delta
+            position += position & -position
+
+    def prefix(self, index: int) -> int:
+        """Number of users whose score bucket is <= index."""
+        position = min(index + 1, self.size)
+        total = 0
+        while position > 0:
+            total += self._tree[position]
+            position -= position & -position
+        return total
+
+    def find(self, k: int) -> int:
+        """Smallest bucket whose prefix count reaches k (1-based)."""
+        position = 0
+        remaining = k
+        step = 1 << (self.size.bit_length() - 1)
+        while step:
+            candidate = position + step
+            if candidate <= self.size and self._tree[candidate] < remaining:
+                position = candidate
+                remaining -= self._tree[candidate]
+            step >>= 1
+        return position
+
+    def rebuild(self, size: int, counts: Dict[int, int]) -> None:
+        self.size = size
+        self._tree = [0] * (size + 1)
+        for index, count in counts.items():
+            self.add(index, count)
+
+
+class Leaderboard:
+    """
+    Users ranked by points. Each update moves one user between score buckets, so `add`, `rank`
+    and each distinct score visited by `top` cost O(log max_score) regardless of user count.
+    """
+
+    def __init__(self) -> None:
+        self._scores: Dict[str, int] = {}
+        self._members: Dict[int, Set[str]] = defaultdict(set)
+        self._counts = _Fenwick()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _ensure_capacity(self, score: int) -> None:
+        if score < self._counts.size:
+            return
+        size = self._counts.size
+        while size <= score:
+            size *= 2
+        self._counts.rebuild(size, {bucket: len(users) for bucket, users in self._members.items() if users})
+
+    def add(self, user_id: str, points: int) -> int:
+        with self._lock:
+            previous = self._scores.get(user_id)
+            score = max(0, (previous or 0) + int(points))
+            if previous is not None:
+                self._members[previous].discard(user_id)
+                if not self._members[previous]:
+                    del self._members[previous]
+                self._counts.add(previous, -1)
+            self._ensure_capacity(score)
+            self._scores[user_id] = score
+            self._members[score].add(user_id)
+            self._counts.add(score, 1)
+            return score
+
+    def score(self, user_id: str) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def rank(self, user_id: str) -> Optional[Dict]:
+        """Competition ranking: users with equal points share a rank."""
+        with self._lock:
+            score = self._scores.get(user_id)
+            if score is None:
+                return None
+            ahead = len(self._scores) - self._counts.prefix(score)
+            return {"userId": user_id, "rank": ahead + 1, "points": score}
+
+    def top(self, limit: int) -> List[Dict]:
+        entries: List[Dict] = []
+        with self._lock:
+            total = len(self._scores)
+            seen = 0
+            while seen < min(limit, total):
+                # The (seen+1)-th best user sits at ascending position total - seen.
+                bucket = self._counts.find(total - seen)
+                users = sorted(self._members.get(bucket, ()))
+                rank = seen + 1
+                for user_id in users[: limit - len(entries)]:
+                    entries.append({"userId": user_id, "rank": rank, "points": bucket})
+                seen += len(users)
+        return entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+            self._members.clear()
+            self._counts = _Fenwick()
+
+
+def week_key(moment: datetime) -> Tuple[int, int]:
+    iso = moment.isocalendar()
+    return iso[0], iso[1]
+
+
+class WeeklyLeaderboard:
+    """Points earned in the current ISO week (UTC). Rolling over swaps in an empty board in O(1)."""
+
+    def __init__(self) -> None:
+        self._week = week_key(datetime.utcnow())
+        self._board = Leaderboard()
+        self._lock = threading.Lock()
+
+    @property
+    def week(self) -> Tuple[int, int]:
+        return self._week
+
+    def current(self) -> Leaderboard:
+        now = week_key(datetime.utcnow())
+        if now != self._week:
+            with self._lock:
+                if now != self._week:
+                    self._week = now
+                    self._board = Leaderboard()
+        return self._board
+
+    def add(self, user_id: str, points: int, logged_at: datetime) -> None:
+        board = self.current()
+        if week_key(logged_at) == self._week:
+            board.add(user_id, points)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._week = week_key(datetime.utcnow())
+            self._board = Leaderboard()
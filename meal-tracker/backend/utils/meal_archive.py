@@ -0,0 +1,169 @@
+"""
+Append-only, memory-mapped segment files for meals that aged out of the in-memory hot window.
+
+Each compaction writes one immutable segment (JSON lines, newest first) and keeps its count,
+points and oldest/newest timestamp in memory. Segments are mapped read-only, so reading history
+pages the file in through the OS cache instead of keeping every meal resident as Python objects,
+and `iter_since` skips whole segments by their time range.
+
+The archive belongs to one process, like the in-memory store it extends: it lives in a fresh
+directory under `MEAL_SEGMENT_DIR` (default: the system temp dir) and is removed at exit.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class Segment:
+    path: str
+    count: int
+    points: int
+    oldest: datetime
+    newest: datetime
+    _map: Optional[mmap.mmap] = field(default=None, repr=False)
+    # Meal ids in ascending order and the byte offset of each one's line, for point lookups.
+    ids: array = field(default_factory=lambda: array("q"), repr=False)
+    offsets: array = field(default_factory=lambda: array("q"), repr=False)
+
+    def get(self, meal_id: int) -> Optional[Dict]:
+        view = self._map
+        position = bisect_left(self.ids, meal_id)
+        if view is None or position == len(self.ids) or self.ids[position] != meal_id:
+            return None
+        start = self.offsets[position]
+        end = view.find(b"\n", start)
+        return json.loads(view[start : end if end != -1 else len(view)])
+
+    def records(self) -> Iterator[Dict]:
+        view = self._map
+        if view is None:
+            return
+        size = len(view)
+        position = 0
+        while position < size:
+            end = view.find(b"\n", position)
+            if end == -1:
+                end = size
+            yield json.loads(view[position:end])
+            position = end + 1
+
+
+class SegmentArchive:
+    """Ordered list of sealed segments, newest first."""
+
+    def __init__(self, parent: Optional[str] = None) -> None:
+        self.parent = parent
+        self.directory: Optional[str] = None
+        self._segments: List[Segment] = []
+        self._count = 0
+        self._points = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def points(self) -> int:
+        return self._points
+
+    def segments(self) -> List[Segment]:
+        return list(self._segments)
+
+    def _ensure_directory(self) -> str:
+        if self.directory is None:
+            if self.parent:
+                os.makedirs(self.parent, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix="meal-segments-", dir=self.parent or None)
+            atexit.register(self.close)
+        return self.directory
+
+    def write(self, meals: List[Dict], logged_at: Callable[[Dict], datetime]) -> Optional[Segment]:
+        """Seal `meals` (newest first) into a new segment. Not visible to readers until `publish`."""
+        if not meals:
+            return None
+        directory = self._ensure_directory()
+        with self._lock:
+            sequence = len(self._segments) + 1
+        path = os.path.join(directory, f"segment-{sequence:06d}-{os.urandom(3).hex()}.jsonl")
+        times = [logged_at(meal) for meal in meals]
+        lines: List[Tuple[int, int]] = []
+        with open(path, "wb") as handle:
+            for meal in meals:
+                lines.append((int(meal.get("id") or 0), handle.tell()))
+                handle.write(json.dumps(meal, separators=(",", ":")).encode("utf-8"))
+                handle.write(b"\n")
+        lines.sort()
+        with open(path, "rb") as handle:
+            view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return Segment(
+            path=path,
+            count=len(meals),
+            points=sum(int(meal.get("points") or 0) for meal in meals),
+            oldest=min(times),
+            newest=max(times),
+            _map=view,
+            ids=array("q", (meal_id for meal_id, _offset in lines)),
+            offsets=array("q", (offset for _meal_id, offset in lines)),
+        )
+
+    def publish(self, segment: Segment) -> None:
+        with self._lock:
+            self._segments.insert(0, segment)
+            self._count += segment.count
+            self._points += segment.points
+
+    def iter_meals(self, segments: Optional[List[Segment]] = None, user_id: Optional[str] = None) -> Iterator[Dict]:
+        for segment in self._segments if segments is None else segments:
+            for meal in segment.records():
+                if user_id is None or meal.get("user_id") == user_id:
+                    yield meal
+
+    def get(self, meal_id: int, segments: Optional[List[Segment]] = None) -> Optional[Dict]:
+        for segment in self._segments if segments is None else segments:
+            if segment.ids and segment.ids[0] <= meal_id <= segment.ids[-1]:
+                meal = segment.get(meal_id)
+                if meal is not None:
+                    return meal
+        return None
+
+    def iter_since(
+        self, cutoff: datetime, logged_at: Callable[[Dict], datetime], segments: Optional[List[Segment]] = None
+    ) -> Iterator[Dict]:
+        for segment in self._segments if segments is None else segments:
+            if segment.newest < cutoff:
+                continue
+            for meal in segment.records():
+                if logged_at(meal) >= cutoff:
+                    yield meal
+
+    def clear(self) -> None:
+        with self._lock:
+            segments, self._segments = self._segments, []
+            self._count = 0
+            self._points = 0
+        for segment in segments:
+            # Readers may still be iterating a `segments()` snapshot, so the map is not closed here;
+            # it is unmapped when the last reference goes. The open map keeps the unlinked file readable.
+            try:
+                os.remove(segment.path)
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        self.clear()
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
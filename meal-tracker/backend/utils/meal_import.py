@@ -0,0 +1,489 @@
+"""
+Streaming, resumable CSV import of meal logs.
+
+Two layouts are accepted:
+
+* simple — one row per meal: `created_at, foods, calories?, mood?, notes?, user_id?` where `foods`
+  holds items separated by `;` (`"2 eggs; spinach; banana"`);
+* flattened — the `/api/meals/export?format=csv` layout, one row per food grouped by `meal_id`.
+
+Meals are processed in chunks: each chunk is normalized, scored and written with one insert, then
+the checkpoint advances. Re-running with the same import id skips what was already committed.
+
+    python -m utils.meal_import history.csv --import-id my-import                   # straight to Supabase
+    python -m utils.meal_import history.csv --url http://127.0.0.1:5000 --api-key ...  # via the API
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from utils.calorie_estimator import normalize_foods
+from utils.gamification import calculate_points
+from utils.identity import DEFAULT_USER_ID
+from utils.metrics import REGISTRY
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+_CHECKPOINT_DIR = os.getenv(
+    "IMPORT_CHECKPOINT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".imports")
+)
+
+IMPORT_RECORDS = REGISTRY.counter(
+    "meal_tracker_import_records_total",
+    "Meals read by the CSV importer, by outcome.",
+    ("outcome",),
+)
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+class ImportResumeError(RuntimeError):
+    """The chunk in flight when an import died can't be confirmed either way, so resuming could duplicate it."""
+
+
+@dataclass
+class ParsedMeal:
+    index: int
+    line: int
+    foods: List[Union[str, Dict]]
+    created_at: str
+    user_id: Optional[str]
+    calories: Optional[float] = None
+    mood: Optional[str] = None
+    notes: Optional[str] = None
+
+
+@dataclass
+class Checkpoint:
+    import_id: str
+    target: str
+    records_done: int = 0
+    imported: int = 0
+    errors: int = 0
+    status: str = "running"
+    pending: Optional[Dict] = None
+    elapsed_seconds: float = 0.0
+    updated_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+
+class CheckpointStore:
+    """Checkpoints on disk when `directory` is set, otherwise in memory (matching the in-memory store's lifetime)."""
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self._directory = directory
+        self._memory: Dict[str, Checkpoint] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, import_id: str) -> str:
+        safe = "".join(char for char in import_id if char.isalnum() or char in "-_.")
+        return os.path.join(self._directory or "", f"{safe}.json")
+
+    def load(self, import_id: str) -> Optional[Checkpoint]:
+        if not self._directory:
+            stored = self._memory.get(import_id)
+            return Checkpoint(**asdict(stored)) if stored else None
+        try:
+            with open(self._path(import_id), encoding="utf-8") as handle:
+                return Checkpoint(**json.load(handle))
+        except FileNotFoundError:
+            return None
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        checkpoint.updated_at = datetime.utcnow().isoformat()
+        if not self._directory:
+            with self._lock:
+                self._memory[checkpoint.import_id] = Checkpoint(**asdict(checkpoint))
+            return
+        os.makedirs(self._directory, exist_ok=True)
+        path = self._path(checkpoint.import_id)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(asdict(checkpoint), handle)
+        os.replace(temporary, path)
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+def _float(value: Optional[str], label: str) -> Optional[float]:
+    value = _clean(value)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ImportRowError(f"{label} must be a number, got {value!r}") from None
+
+
+def _timestamp(value: Optional[str]) -> str:
+    value = _clean(value)
+    if value is None:
+        raise ImportRowError("created_at is required")
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ImportRowError(f"created_at is not an ISO timestamp: {value!r}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def _simple_meal(index: int, line: int, row: Dict[str, str]) -> ParsedMeal:
+    foods = [item.strip() for item in (row.get("foods") or "").split(";") if item.strip()]
+    if not foods:
+        raise ImportRowError("foods is empty")
+    return ParsedMeal(
+        index=index,
+        line=line,
+        foods=foods,
+        created_at=_timestamp(row.get("created_at")),
+        user_id=_clean(row.get("user_id")),
+        calories=_float(row.get("calories"), "calories"),
+        mood=_clean(row.get("mood")),
+        notes=_clean(row.get("notes")),
+    )
+
+
+def _flattened_meal(index: int, line: int, rows: List[Dict[str, str]]) -> ParsedMeal:
+    first = rows[0]
+    foods: List[Union[str, Dict]] = []
+    for row in rows:
+        name = _clean(row.get("food_name"))
+        if not name:
+            continue
+        macros = {macro: _float(row.get(macro), macro) for macro in ("protein", "carbs", "fat")}
+        foods.append(
+            {
+                "name": name,
+                "quantity": _float(row.get("food_quantity"), "food_quantity") or 1,
+                "calories": _float(row.get("food_calories"), "food_calories"),
+                "macros": macros if any(value is not None for value in macros.values()) else None,
+                "source": _clean(row.get("food_source")) or "import",
+            }
+        )
+    if not foods:
+        raise ImportRowError("meal has no food rows")
+    return ParsedMeal(
+        index=index,
+        line=line,
+        foods=foods,
+        created_at=_timestamp(first.get("created_at")),
+        user_id=_clean(first.get("user_id")),
+        calories=_float(first.get("meal_calories"), "meal_calories"),
+        mood=_clean(first.get("mood")),
+        notes=_clean(first.get("notes")),
+    )
+
+
+def iter_csv_meals(lines: Iterable[str]) -> Iterator[Tuple[int, int, Union[ParsedMeal, ImportRowError]]]:
+    """Yields (meal index, CSV line, meal or error) without reading more than one meal ahead."""
+    reader = csv.DictReader(lines)
+    fields = set(reader.fieldnames or [])
+    if "food_name" in fields:
+        group: List[Dict[str, str]] = []
+        group_key = None
+        group_line = 0
+        index = 0
+        for row in reader:
+            key = row.get("meal_id") or (row.get("created_at"), row.get("user_id"))
+            if group and key != group_key:
+                yield index, group_line, _safe(_flattened_meal, index, group_line, group)
+                index += 1
+                group = []
+            if not group:
+                group_key, group_line = key, reader.line_num
+            group.append(row)
+        if group:
+            yield index, group_line, _safe(_flattened_meal, index, group_line, group)
+        return
+    if "foods" not in fields:
+        raise ImportRowError("CSV must have a 'foods' column (or the export layout with 'food_name').")
+    for index, row in enumerate(reader):
+        yield index, reader.line_num, _safe(_simple_meal, index, reader.line_num, row)
+
+
+def _safe(parse: Callable, index: int, line: int, payload) -> Union[ParsedMeal, ImportRowError]:
+    try:
+        return parse(index, line, payload)
+    except ImportRowError as exc:
+        return exc
+
+
+def build_meal(parsed: ParsedMeal) -> Dict:
+    foods = normalize_foods(parsed.foods)
+    if not foods:
+        raise ImportRowError("no recognizable foods")
+    calories = parsed.calories if parsed.calories is not None else sum(float(food["calories"]) for food in foods)
+    return {
+        "foods": foods,
+        "calories": round(calories, 1),
+        "points": calculate_points(calories, foods),
+        "mood": parsed.mood,
+        "notes": parsed.notes,
+        "created_at": parsed.created_at,
+        "calorie_method": "import",
+        "calorie_confidence": 0.9,
+    }
+
+
+Sink = Callable[[List[Dict]], None]
+
+
+def store_sink(meals: List[Dict]) -> None:
+    from data_store import record_meal
+
+    for meal in meals:
+        record_meal(
+            foods=meal["foods"],
+            calories=meal["calories"],
+            points=meal["points"],
+            mood=meal["mood"],
+            notes=meal["notes"],
+            calorie_method=meal["calorie_method"],
+            calorie_confidence=meal["calorie_confidence"],
+            created_at=meal["created_at"],
+            user_id=meal["user_id"],
+        )
+
+
+def _supabase_row(meal: Dict) -> Dict:
+    return {
+        "user_id": meal["user_id"],
+        "meal_name": meal["foods"][0]["name"] if meal["foods"] else "Meal",
+        "calories": int(round(meal["calories"])),
+        "created_at": meal["created_at"],
+    }
+
+
+def supabase_sink(meals: List[Dict]) -> None:
+    from supabase_client import insert_meal_rows
+
+    insert_meal_rows([{**_supabase_row(meal), "payload": meal} for meal in meals])
+
+
+def supabase_committed(pending: Dict) -> bool:
+    """
+    Whether the chunk in `pending` landed before a crash. Rows carry their `import_ref` in `payload`;
+    tables without that column are checked for the chunk's last row by its plain columns instead.
+    """
+    from supabase_client import supabase, supports_payload, timed_execute
+
+    if supports_payload():
+        query = supabase.table("meals").select("id").eq("payload->>import_ref", pending["ref"]).limit(1)
+        try:
+            return bool(timed_execute(query, "meals", "select_import_ref").data)
+        except Exception as exc:
+            if "payload" not in str(exc).lower():
+                raise
+    last = pending.get("last")
+    if not last:
+        raise ImportResumeError(
+            f"Can't tell whether records {pending['from']}-{pending['to']} were written: the meals table has no "
+            "payload column and the checkpoint predates row matching. Check those rows and start a new import."
+        )
+    query = supabase.table("meals").select("id")
+    for column, value in last.items():
+        query = query.eq(column, value)
+    return bool(timed_execute(query.limit(1), "meals", "select_import_row").data)
+
+
+def run_import(
+    lines: Iterable[str],
+    import_id: str,
+    target: str,
+    sink: Sink,
+    checkpoints: CheckpointStore,
+    user_id: Optional[str] = None,
+    force_user: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    committed: Optional[Callable[[Dict], bool]] = None,
+) -> Dict:
+    """
+    Import meals from CSV `lines`, resuming from `import_id`'s checkpoint. Rows that fail to parse
+    or score are reported and skipped; they count as done so a resume never retries them.
+    """
+    checkpoint = checkpoints.load(import_id) or Checkpoint(import_id=import_id, target=target)
+    if checkpoint.pending:
+        # A chunk was in flight when the previous run died: keep it only if it provably landed.
+        if committed is not None and committed(checkpoint.pending):
+            checkpoint.records_done = checkpoint.pending["to"]
+            checkpoint.imported += checkpoint.pending["meals"]
+        checkpoint.pending = None
+    resume_from = checkpoint.records_done
+    checkpoint.status = "running"
+    checkpoint.target = target
+    errors: List[Dict] = []
+    previous_elapsed = checkpoint.elapsed_seconds
+    started = time.perf_counter()
+    chunk: List[Dict] = []
+    chunk_end = resume_from
+    processed = 0
+
+    def record_error(index: int, line: int, message: str) -> None:
+        checkpoint.errors += 1
+        IMPORT_RECORDS.inc(outcome="error")
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"record": index, "line": line, "error": message})
+
+    def flush() -> None:
+        nonlocal chunk
+        if chunk:
+            checkpoint.pending = {
+                "from": checkpoint.records_done,
+                "to": chunk_end,
+                "ref": chunk[-1]["import_ref"],
+                "last": _supabase_row(chunk[-1]),
+                "meals": len(chunk),
+            }
+            checkpoints.save(checkpoint)
+            sink(chunk)
+            checkpoint.imported += len(chunk)
+            IMPORT_RECORDS.inc(len(chunk), outcome="imported")
+        checkpoint.records_done = chunk_end
+        checkpoint.pending = None
+        checkpoint.elapsed_seconds = previous_elapsed + time.perf_counter() - started
+        checkpoints.save(checkpoint)
+        chunk = []
+
+    try:
+        for index, line, parsed in iter_csv_meals(lines):
+            if index < resume_from:
+                continue
+            processed += 1
+            chunk_end = index + 1
+            if isinstance(parsed, ImportRowError):
+                record_error(index, line, str(parsed))
+            else:
+                try:
+                    meal = build_meal(parsed)
+                except (ImportRowError, TypeError, ValueError) as exc:
+                    record_error(index, line, str(exc))
+                else:
+                    meal["user_id"] = user_id if force_user or not parsed.user_id else parsed.user_id
+                    meal["user_id"] = meal["user_id"] or DEFAULT_USER_ID
+                    meal["import_ref"] = f"{import_id}:{index}"
+                    chunk.append(meal)
+            if processed % chunk_size == 0:
+                flush()
+        flush()
+        checkpoint.status = "completed"
+    except Exception:
+        checkpoint.status = "interrupted"
+        raise
+    finally:
+        checkpoint.elapsed_seconds = previous_elapsed + time.perf_counter() - started
+        checkpoints.save(checkpoint)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "importId": import_id,
+        "status": checkpoint.status,
+        "target": target,
+        "resumedFrom": resume_from,
+        "recordsProcessed": processed,
+        "recordsDone": checkpoint.records_done,
+        "imported": checkpoint.imported,
+        "errorCount": checkpoint.errors,
+        "errors": errors,
+        "elapsedSeconds": round(elapsed, 3),
+        "rowsPerSecond": round(processed / elapsed, 1) if elapsed > 0 else float(processed),
+    }
+
+
+def new_import_id() -> str:
+    return uuid.uuid4().hex
+
+
+_checkpoint_stores: Dict[str, CheckpointStore] = {}
+
+
+def checkpoint_store(target: str) -> CheckpointStore:
+    """In-memory checkpoints for the in-memory store (both vanish on restart); on disk for Supabase."""
+    if target not in _checkpoint_stores:
+        _checkpoint_stores[target] = CheckpointStore(_CHECKPOINT_DIR if target == "supabase" else None)
+    return _checkpoint_stores[target]
+
+
+def _upload(path: str, url: str, api_key: str, import_id: str, chunk_size: int) -> Dict:
+    import http.client
+    from urllib.parse import urlencode, urlsplit
+
+    parts = urlsplit(url)
+    connection_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_cls(parts.hostname, parts.port, timeout=600)
+    query = urlencode({"import_id": import_id, "chunk_size": chunk_size})
+
+    def body() -> Iterator[bytes]:
+        with open(path, "rb") as handle:
+            while True:
+                block = handle.read(64 * 1024)
+                if not block:
+                    return
+                yield block
+
+    connection.request(
+        "POST",
+        f"{parts.path.rstrip('/')}/api/meals/import?{query}",
+        body=body(),
+        headers={"Content-Type": "text/csv", "X-API-Key": api_key, "Transfer-Encoding": "chunked"},
+        encode_chunked=True,
+    )
+    response = connection.getresponse()
+    return json.loads(response.read().decode("utf-8") or "{}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV file to import")
+    parser.add_argument("--import-id", help="reuse to resume an interrupted import (printed on start)")
+    parser.add_argument("--user-id", help="user for rows without a user_id column")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--url", help="upload to a running backend instead of writing to Supabase directly")
+    parser.add_argument("--api-key", default=os.getenv("API_SECRET"))
+    args = parser.parse_args(argv)
+
+    import_id = args.import_id or new_import_id()
+    print(f"import id: {import_id}", file=sys.stderr)
+    if args.url:
+        if not args.api_key:
+            parser.error("--api-key (or API_SECRET) is required with --url")
+        report = _upload(args.path, args.url, args.api_key, import_id, args.chunk_size)
+    else:
+        with open(args.path, newline="", encoding="utf-8") as handle:
+            try:
+                report = run_import(
+                    handle,
+                    import_id=import_id,
+                    target="supabase",
+                    sink=supabase_sink,
+                    checkpoints=checkpoint_store("supabase"),
+                    user_id=args.user_id,
+                    chunk_size=args.chunk_size,
+                    committed=supabase_committed,
+                )
+            except ImportResumeError as exc:
+                print(f"error: {exc}", file=sys.stderr)
+                return 1
+    print(json.dumps(report, indent=2))
+    return 0 if report.get("status") == "completed" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
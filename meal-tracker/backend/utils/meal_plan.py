@@ -0,0 +1,291 @@
+"""
+Daily meal plans built from `calorie_estimator.FOOD_LIBRARY` for `GET /api/meal-plan`.
+
+Each meal is a 0/1 knapsack over the library with calories discretized into at most `_MAX_BUCKETS`
+buckets: the DP state is (foods picked, plant/protein flags, calorie bucket) and the value is the
+best protein reachable, so the final states cover every combination of the `calculate_points`
+bonuses (plant, protein, variety, balance). States are visited in order of the most points their
+bucketed calories allow and backtracked into real meals until none left can do better. The library is
+pruned per bucket first — a meal never holds more than `MAX_FOODS` foods, or more foods of a
+bucket than fit in the meal — so the DP stays a few hundred items wide however large the library
+grows. Plans for the default library are cached per target.
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from utils.calorie_estimator import FOOD_LIBRARY, MacroProfile
+from utils.gamification import PLANT_TOKENS, PROTEIN_TOKENS, calculate_points
+
+# The variety bonus stops growing at six distinct foods.
+MAX_FOODS = 6
+# Meals may land this far either side of their share of the daily target.
+TOLERANCE = 0.05
+# Meals within this many points of the best one are rotated through the plan for variety.
+VARIETY_SLACK = 3
+
+_MAX_BUCKETS = 64
+# Food sets backtracked per DP state; states keep only their best protein, so the optimum can land
+# just outside the calorie window while another set with the same bucketed calories fits.
+_PATHS_PER_STATE = 8
+_PLANT = 1
+_PROTEIN = 2
+_NEG = float("-inf")
+
+
+class NoPlan(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class _Food:
+    name: str
+    profile: MacroProfile
+    flags: int
+
+
+@dataclass(frozen=True)
+class _Meal:
+    foods: Tuple[_Food, ...]
+    calories: float
+    protein: float
+    points: int
+
+    def to_dict(self) -> Dict:
+        totals = {
+            macro: round(sum(getattr(food.profile, macro) for food in self.foods), 1)
+            for macro in ("protein", "carbs", "fat")
+        }
+        return {
+            "foods": [_food_entry(food) for food in self.foods],
+            "calories": round(self.calories, 1),
+            "macros": totals,
+            "points": self.points,
+        }
+
+
+def _food_entry(food: _Food) -> Dict:
+    # Same shape as `normalize_foods`, so a planned meal can be posted to /api/meals as-is.
+    profile = food.profile
+    return {
+        "name": food.name,
+        "calories": round(float(profile.calories), 1),
+        "quantity": 1.0,
+        "macros": {"protein": profile.protein, "carbs": profile.carbs, "fat": profile.fat},
+        "source": "plan",
+    }
+
+
+@lru_cache(maxsize=65536)
+def _flags(name: str) -> int:
+    label = name.lower()
+    flags = _PLANT if any(token in label for token in PLANT_TOKENS) else 0
+    if any(token in label for token in PROTEIN_TOKENS):
+        flags |= _PROTEIN
+    return flags
+
+
+def _candidates(library: Mapping[str, MacroProfile], step: float, top: int) -> List[Tuple[int, float, int, _Food]]:
+    """
+    `(bucket, protein, flags, food)` for the foods worth considering. Within a calorie bucket only
+    the highest-protein foods can be in an optimal meal — as many as fit (at most `MAX_FOODS`) —
+    plus the best plant and best protein-bonus food so every flag combination stays reachable.
+    """
+    by_bucket: Dict[int, List[Tuple[float, str, MacroProfile, int]]] = defaultdict(list)
+    for name, profile in library.items():
+        bucket = int(round(profile.calories / step))
+        if bucket <= top:
+            by_bucket[bucket].append((float(profile.protein), name, profile, _flags(name)))
+
+    items: List[Tuple[int, float, int, _Food]] = []
+    for bucket, foods in by_bucket.items():
+        foods.sort(key=lambda entry: (-entry[0], entry[1]))
+        keep = min(MAX_FOODS, top // bucket if bucket else MAX_FOODS)
+        chosen = foods[:keep]
+        for flag in (_PLANT, _PROTEIN):
+            best = next((entry for entry in foods if entry[3] & flag), None)
+            if best is not None and best not in chosen:
+                chosen.append(best)
+        items.extend((bucket, protein, flags, _Food(name, profile, flags)) for protein, name, profile, flags in chosen)
+    return items
+
+
+def _solve(items: Sequence[Tuple[int, float, int, _Food]], top: int) -> List[List[List[List[float]]]]:
+    """
+    Knapsack layers: `layers[i][count][flags][bucket]` is the most protein reachable with `count`
+    of the first `i` items. Unchanged rows are shared between layers, which keeps backtracking cheap.
+    """
+    width = top + 1
+    empty = [_NEG] * width
+    start = list(empty)
+    start[0] = 0.0
+    layer = [[empty] * 4 for _ in range(MAX_FOODS + 1)]
+    layer[0][0] = start
+    layers = [layer]
+    for cost, protein, item_flags, _food in items:
+        following = [list(rows) for rows in layer]
+        for count in range(MAX_FOODS):
+            for flags in range(4):
+                source = layer[count][flags]
+                if source is empty:
+                    continue
+                target = following[count + 1][flags | item_flags]
+                gained = [value + protein for value in source[: width - cost]]
+                following[count + 1][flags | item_flags] = target[:cost] + [
+                    old if old >= new else new for old, new in zip(target[cost:], gained)
+                ]
+        layer = following
+        layers.append(layer)
+    return layers
+
+
+def _paths(
+    layers: List[List[List[List[float]]]], items: Sequence[Tuple[int, float, int, _Food]], count: int, flags: int, bucket: int
+) -> Iterator[List[_Food]]:
+    """
+    Food sets that reach a final state, highest-protein branch first, so the first one is the state's
+    optimum. Every branch taken is reachable, so each set costs one walk down the layers.
+    """
+    stack = [(len(items), count, flags, bucket, ())]
+    while stack:
+        index, count, flags, bucket, chosen = stack.pop()
+        if count == 0:
+            yield list(reversed(chosen))
+            continue
+        previous = layers[index - 1]
+        cost, protein, item_flags, food = items[index - 1]
+        branches = []
+        skipped = previous[count][flags][bucket]
+        if skipped != _NEG:
+            branches.append((skipped, (index - 1, count, flags, bucket, chosen)))
+        if cost <= bucket:
+            for prior in range(4):
+                before = previous[count - 1][prior][bucket - cost] if prior | item_flags == flags else _NEG
+                if before != _NEG:
+                    branches.append((before + protein, (index - 1, count - 1, prior, bucket - cost, chosen + (food,))))
+        branches.sort(key=lambda branch: branch[0])
+        stack.extend(state for _value, state in branches)
+
+
+@lru_cache(maxsize=None)
+def _probe(count: int, flags: int) -> Tuple[Dict[str, str], ...]:
+    """Stand-in food labels with the given bonus flags, for scoring a DP state before backtracking."""
+    labels = [PLANT_TOKENS[0]] if flags & _PLANT else []
+    if flags & _PROTEIN:
+        labels.append(PROTEIN_TOKENS[0])
+    labels.extend(f"food {index}" for index in range(count - len(labels)))
+    return tuple({"name": label} for label in labels)
+
+
+def _points_bound(low: float, high: float, count: int, flags: int) -> int:
+    """Most points any meal of `count` foods with `flags` can score between `low` and `high` kcal."""
+    # Points only fall as calories grow, apart from the balance bonus that starts at 350 kcal.
+    points = calculate_points(low, _probe(count, flags))
+    if low < 350 <= high:
+        points = max(points, calculate_points(350, _probe(count, flags)))
+    return points
+
+
+def _meal_options(
+    library: Mapping[str, MacroProfile], low: float, high: float, protein_floor: float, wanted: int
+) -> List[_Meal]:
+    """
+    Up to about `wanted` distinct meals in `[low, high]` kcal, best first by (protein floor met,
+    points, protein). Each food's calories are rounded by at most half a bucket, so a final state
+    covers meals within `count / 2` buckets of its own; states are visited best bound first and
+    their food sets backtracked until no remaining state can beat the `wanted`-th meal found.
+    """
+    step = max(1.0, high / _MAX_BUCKETS)
+    top = int(high / step) + MAX_FOODS  # leave room for rounding; the real window is checked below
+    items = _candidates(library, step, top)
+    layers = _solve(items, top)
+    final = layers[-1]
+
+    states = []
+    for count in range(1, MAX_FOODS + 1):
+        slack = count / 2
+        first = max(0, math.ceil(low / step - slack))
+        last = min(top, math.floor(high / step + slack))
+        for flags in range(4):
+            row = final[count][flags]
+            for bucket in range(first, last + 1):
+                protein = row[bucket]
+                if protein != _NEG:
+                    bound = _points_bound(max(low, (bucket - slack) * step), min(high, (bucket + slack) * step), count, flags)
+                    states.append(((protein >= protein_floor, bound, protein), count, flags, bucket))
+    states.sort(key=lambda state: state[0], reverse=True)
+
+    meals: Dict[Tuple[str, ...], _Meal] = {}
+    ranks: List[Tuple[bool, int, float]] = []
+    for rank, count, flags, bucket in states:
+        if len(ranks) >= wanted and rank <= ranks[wanted - 1]:
+            break
+        for foods in itertools.islice(_paths(layers, items, count, flags, bucket), _PATHS_PER_STATE):
+            calories = sum(float(food.profile.calories) for food in foods)
+            key = tuple(sorted(food.name for food in foods))
+            if not low <= calories <= high or key in meals:
+                continue
+            protein = sum(float(food.profile.protein) for food in foods)
+            labels = [{"name": food.name} for food in foods]
+            meal = meals[key] = _Meal(tuple(foods), calories, protein, calculate_points(calories, labels))
+            ranks.append((meal.protein >= protein_floor, meal.points, meal.protein))
+            ranks.sort(reverse=True)
+    return sorted(meals.values(), key=lambda meal: (meal.protein >= protein_floor, meal.points, meal.protein), reverse=True)
+
+
+def plan_meals(
+    calories: int,
+    protein_min: float = 0,
+    days: int = 1,
+    meals: int = 3,
+    library: Optional[Mapping[str, MacroProfile]] = None,
+) -> Dict:
+    """
+    `days` daily plans of `meals` meals, each within `TOLERANCE` of `calories / meals` kcal, that
+    maximise `calculate_points` while keeping at least `protein_min / meals` g of protein per meal
+    where the library allows it. Raises `NoPlan` if no combination of foods fits the target.
+    """
+    library = FOOD_LIBRARY if library is None else library
+    share = calories / meals
+    protein_floor = protein_min / meals
+    options = _meal_options(library, share * (1 - TOLERANCE), share * (1 + TOLERANCE), protein_floor, meals * days)
+    if not options:
+        raise NoPlan(f"No combination of foods reaches {calories} kcal in {meals} meals.")
+
+    best = options[0]
+    rotation = [
+        meal
+        for meal in options[: meals * days]
+        if meal.points >= best.points - VARIETY_SLACK and (meal.protein >= protein_floor) == (best.protein >= protein_floor)
+    ]
+    plan_days = []
+    for day in range(days):
+        picked = [rotation[(day * meals + slot) % len(rotation)] for slot in range(meals)]
+        protein = sum(meal.protein for meal in picked)
+        plan_days.append(
+            {
+                "day": day + 1,
+                "meals": [meal.to_dict() for meal in picked],
+                "calories": round(sum(meal.calories for meal in picked), 1),
+                "protein": round(protein, 1),
+                "points": sum(meal.points for meal in picked),
+                "proteinMet": protein >= protein_min,
+            }
+        )
+    return {
+        "target": {"calories": calories, "proteinMin": protein_min, "days": days, "meals": meals},
+        "days": plan_days,
+        "totalPoints": sum(day["points"] for day in plan_days),
+    }
+
+
+@lru_cache(maxsize=256)
+def cached_plan(calories: int, protein_min: int, days: int, meals: int) -> Dict:
+    """`plan_meals` over the default library, memoised per target. Callers must not mutate the result."""
+    return plan_meals(calories, protein_min, days, meals)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import random
+import threading
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+_ENABLED = os.getenv("PROFILING_ENABLED", "").strip().lower() in {"1", "true", "yes", "on"}
+_PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles"))
+_TOP_ALLOCATIONS = 25
+_MAX_STACK_DEPTH = 64
+
+try:
+    _SAMPLE_RATE = max(0.0, min(1.0, float(os.getenv("PROFILE_SAMPLE_RATE", "0"))))
+except ValueError:
+    _SAMPLE_RATE = 0.0
+
+# cProfile and tracemalloc are process-wide, so overlapping sessions would record each other's work.
+_active = threading.Lock()
+_started_tracemalloc = False
+
+FunctionKey = Tuple[str, int, str]
+
+
+@dataclass
+class ProfileSession:
+    id: str
+    label: str
+    profiler: cProfile.Profile
+    baseline: tracemalloc.Snapshot
+
+
+def should_profile(headers: Mapping[str, str]) -> bool:
+    """Profiling is opt-in: the env switch must be on, then either the header or the sampler selects a request."""
+    if not _ENABLED:
+        return False
+    if (headers.get(PROFILE_HEADER) or "").strip().lower() in {"1", "true", "yes"}:
+        return True
+    return _SAMPLE_RATE > 0 and random.random() < _SAMPLE_RATE
+
+
+def _release() -> None:
+    global _started_tracemalloc
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    _active.release()
+
+
+def start(label: str) -> Optional[ProfileSession]:
+    """Begin profiling, or return None when another request is already being profiled."""
+    global _started_tracemalloc
+    if not _active.acquire(blocking=False):
+        return None
+    try:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracemalloc = True
+        session = ProfileSession(
+            id=uuid.uuid4().hex,
+            label=label,
+            profiler=cProfile.Profile(),
+            baseline=tracemalloc.take_snapshot(),
+        )
+        session.profiler.enable()
+    except ValueError:
+        # Python 3.12+ refuses to enable a second profiler (e.g. a debugger holds the hook).
+        _release()
+        return None
+    except BaseException:
+        _release()
+        raise
+    return session
+
+
+def finish(session: ProfileSession) -> Dict[str, str]:
+    """Stop profiling and write pstats, speedscope and allocation reports; returns the written paths."""
+    session.profiler.disable()
+    try:
+        snapshot = tracemalloc.take_snapshot()
+        traced = tracemalloc.get_traced_memory()
+    finally:
+        _release()
+
+    os.makedirs(_PROFILE_DIR, exist_ok=True)
+    base = os.path.join(_PROFILE_DIR, session.id)
+    paths = {
+        "pstats": f"{base}.pstats",
+        "speedscope": f"{base}.speedscope.json",
+        "allocations": f"{base}.alloc.txt",
+    }
+    session.profiler.dump_stats(paths["pstats"])
+    stats = pstats.Stats(session.profiler)
+    with open(paths["speedscope"], "w", encoding="utf-8") as handle:
+        json.dump(_speedscope_document(stats, session), handle)
+    with open(paths["allocations"], "w", encoding="utf-8") as handle:
+        handle.write(_allocation_report(session, snapshot, traced))
+    return paths
+
+
+def _frame_name(key: FunctionKey) -> str:
+    filename, line, name = key
+    return name if filename == "~" else f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _primary_caller(stats: pstats.Stats, key: FunctionKey) -> Optional[FunctionKey]:
+    callers = stats.stats[key][4]  # type: ignore[attr-defined]
+    if not callers:
+        return None
+    return max(callers.items(), key=lambda item: item[1][3])[0]
+
+
+def _speedscope_document(stats: pstats.Stats, session: ProfileSession) -> Dict:
+    """
+    cProfile only records caller/callee edges, so each function's self time is attributed to the
+    stack reached by following its most expensive caller; good enough for a left-heavy view.
+    """
+    frame_index: Dict[FunctionKey, int] = {}
+    frames: List[Dict] = []
+    samples: List[List[int]] = []
+    weights: List[float] = []
+
+    def index_of(key: FunctionKey) -> int:
+        if key not in frame_index:
+            frame_index[key] = len(frames)
+            filename, line, name = key
+            frames.append({"name": _frame_name(key), "file": filename, "line": line})
+        return frame_index[key]
+
+    for key, (_cc, _nc, tottime, _ct, _callers) in stats.stats.items():  # type: ignore[attr-defined]
+        if tottime <= 0:
+            continue
+        stack = [key]
+        seen = {key}
+        caller = _primary_caller(stats, key)
+        while caller is not None and caller not in seen and len(stack) < _MAX_STACK_DEPTH:
+            stack.append(caller)
+            seen.add(caller)
+            caller = _primary_caller(stats, caller)
+        samples.append([index_of(frame) for frame in reversed(stack)])
+        weights.append(tottime)
+
+    total = sum(weights)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": session.label,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+        "name": session.label,
+        "exporter": "meal-tracker",
+    }
+
+
+def _allocation_report(session: ProfileSession, snapshot: tracemalloc.Snapshot, traced: Tuple[int, int]) -> str:
+    ignored = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    )
+    diff = snapshot.filter_traces(ignored).compare_to(session.baseline.filter_traces(ignored), "lineno")
+    current, peak = traced
+    lines = [
+        f"profile {session.id} — {session.label}",
+        f"traced memory at finish: {current} B current, {peak} B peak",
+        f"top {_TOP_ALLOCATIONS} allocation sites by growth during the request:",
+    ]
+    for stat in diff[:_TOP_ALLOCATIONS]:
+        lines.append(f"  {stat}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,150 @@
+"""
+Nearest-neighbour search over meals by macro composition, for `GET /api/meals/<id>/similar`.
+
+Every meal maps to a point: the share of its energy from protein, carbs and fat, plus its calories
+over `CALORIE_SCALE` (so 100 kcal weighs like a 10% shift in one macro). Each user has a k-d tree
+stored in flat `array` columns (about 56 bytes a point) that grows with every `record_meal`;
+meals logged with exactly the same point share one node, so a breakfast eaten every day does not
+turn the tree into a list. A query visits O(log n) nodes on typical histories, and a calorie cap
+prunes whole subtrees split on the calorie axis.
+"""
+
+from __future__ import annotations
+
+import heapq
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CALORIE_SCALE = 1000.0
+DIMENSIONS = 4
+_CALORIE_AXIS = 3
+
+Point = Tuple[float, float, float, float]
+
+
+def meal_vector(meal: Dict) -> Point:
+    """The meal's point; meals without macros only differ on the calorie axis."""
+    protein = carbs = fat = 0.0
+    for food in meal.get("foods") or ():
+        macros = food.get("macros") if isinstance(food, dict) else None
+        if macros:
+            protein += float(macros.get("protein") or 0)
+            carbs += float(macros.get("carbs") or 0)
+            fat += float(macros.get("fat") or 0)
+    energy = protein * 4 + carbs * 4 + fat * 9
+    shares = (protein * 4 / energy, carbs * 4 / energy, fat * 9 / energy) if energy else (0.0, 0.0, 0.0)
+    calories = float(meal.get("calories") or 0) / CALORIE_SCALE
+    # Rounded so that repeats of the same meal land on exactly the same point.
+    return tuple(round(value, 4) for value in (*shares, calories))  # type: ignore[return-value]
+
+
+class KDTree:
+    """Insert-only k-d tree; node `i` splits on axis `depth % DIMENSIONS` (ties go right)."""
+
+    def __init__(self) -> None:
+        self.coords = array("d")
+        self.keys = array("q")
+        self.left = array("l")
+        self.right = array("l")
+        self._shared: Dict[int, List[int]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, key: int, point: Point) -> None:
+        self._size += 1
+        node = len(self.keys)
+        current, axis = 0, 0
+        while node:
+            base = current * DIMENSIONS
+            if tuple(self.coords[base : base + DIMENSIONS]) == point:
+                self._shared.setdefault(current, []).append(key)
+                return
+            branch = self.left if point[axis] < self.coords[base + axis] else self.right
+            child = branch[current]
+            if child < 0:
+                branch[current] = node
+                break
+            current, axis = child, (axis + 1) % DIMENSIONS
+        self.coords.extend(point)
+        self.keys.append(key)
+        self.left.append(-1)
+        self.right.append(-1)
+
+    def _node_keys(self, node: int) -> Iterable[int]:
+        yield self.keys[node]
+        yield from self._shared.get(node, ())
+
+    def nearest(
+        self, point: Point, k: int, exclude: Optional[int] = None, max_calories: Optional[float] = None
+    ) -> List[Tuple[float, int]]:
+        """`(squared distance, key)` of the `k` closest points, nearest first."""
+        if k <= 0 or not self.keys:
+            return []
+        cap = None if max_calories is None else max_calories / CALORIE_SCALE
+        coords, left, right = self.coords, self.left, self.right
+        best: List[Tuple[float, int]] = []  # heap of (-distance, key): farthest, then oldest, on top
+        stack = [(0, 0, 0.0)]  # (node, axis, lower bound on the squared distance to its subtree)
+        while stack:
+            node, axis, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            base = node * DIMENSIONS
+            if cap is None or coords[base + _CALORIE_AXIS] <= cap:
+                distance = 0.0
+                for offset in range(DIMENSIONS):
+                    delta = point[offset] - coords[base + offset]
+                    distance += delta * delta
+                for key in self._node_keys(node):
+                    if key == exclude:
+                        continue
+                    entry = (-distance, key)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+
+            split = coords[base + axis]
+            delta = point[axis] - split
+            # Everything right of a calorie split has at least `split` calories.
+            right_child = right[node] if cap is None or axis != _CALORIE_AXIS or split <= cap else -1
+            near, far = (left[node], right_child) if delta < 0 else (right_child, left[node])
+            following = (axis + 1) % DIMENSIONS
+            if far >= 0:
+                stack.append((far, following, max(bound, delta * delta)))
+            if near >= 0:
+                stack.append((near, following, bound))
+        return sorted(((-distance, key) for distance, key in best), key=lambda item: (item[0], -item[1]))
+
+
+class SimilarityIndex:
+    """One `KDTree` per user, keyed by meal id."""
+
+    def __init__(self) -> None:
+        self._trees: Dict[str, KDTree] = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id: str, meal_id: int, meal: Dict) -> None:
+        point = meal_vector(meal)
+        with self._lock:
+            tree = self._trees.get(user_id)
+            if tree is None:
+                tree = self._trees[user_id] = KDTree()
+            tree.insert(meal_id, point)
+
+    def nearest(
+        self, user_id: str, meal: Dict, k: int, max_calories: Optional[float] = None
+    ) -> List[Tuple[float, int]]:
+        """`(distance, meal id)` of the user's meals closest to `meal`, excluding `meal` itself."""
+        with self._lock:
+            tree = self._trees.get(user_id)
+            if tree is None:
+                return []
+            found = tree.nearest(meal_vector(meal), k, exclude=meal.get("id"), max_calories=max_calories)
+        return [(round(squared ** 0.5, 4), key) for squared, key in found]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._trees.clear()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from flask import Response, make_response, request
+
+from utils.identity import current_user_id
+from utils.metrics import REGISTRY
+
+COALESCED_REQUESTS = REGISTRY.counter(
+    "meal_tracker_coalesced_requests_total",
+    "Read requests by endpoint and role: 'leader' ran the handler, 'follower' shared its result.",
+    ("endpoint", "role"),
+)
+
+
+@dataclass
+class _Call:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: object = None
+    error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Concurrent `do` calls with the same key share one execution of `fn` and its result."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """Returns `(result, shared)`; `shared` is True when another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+_group = SingleFlight()
+
+
+@dataclass(frozen=True)
+class _Captured:
+    body: bytes
+    status: int
+    headers: List[Tuple[str, str]]
+
+    def response(self) -> Response:
+        return Response(self.body, status=self.status, headers=self.headers)
+
+
+def coalesce(view):
+    """
+    Share one run of a read-only view between concurrent identical requests (same endpoint, caller
+    and query string). The view's response is buffered, so don't use this on streaming endpoints.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (
+            request.endpoint,
+            current_user_id(),
+            tuple(sorted(request.args.items(multi=True))),
+            tuple(sorted(kwargs.items())),
+        )
+
+        def run() -> _Captured:
+            response = make_response(view(*args, **kwargs))
+            return _Captured(response.get_data(), response.status_code, list(response.headers.items()))
+
+        captured, shared = _group.do(key, run)
+        COALESCED_REQUESTS.inc(endpoint=request.endpoint, role="follower" if shared else "leader")
+        return captured.response()
+
+    return wrapper
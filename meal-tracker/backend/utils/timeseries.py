@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import math
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+NAN = float("nan")
+
+
+def to_epoch(moment: datetime) -> float:
+    """Seconds since the epoch; naive datetimes are taken as UTC, like the rest of the store."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+class ProfileSeries:
+    """
+    One user's height/weight over time as parallel `array('d')` columns sorted by time (24 bytes a
+    point). Unknown values are stored as NaN.
+    """
+
+    def __init__(self) -> None:
+        self.times = array("d")
+        self.heights = array("d")
+        self.weights = array("d")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def latest(self) -> Tuple[Optional[float], Optional[float]]:
+        """`(height, weight)` of the most recent point, None where unknown."""
+        with self._lock:
+            return self._latest()
+
+    def _latest(self) -> Tuple[Optional[float], Optional[float]]:
+        if not self.times:
+            return None, None
+        height, weight = self.heights[-1], self.weights[-1]
+        return (None if math.isnan(height) else height), (None if math.isnan(weight) else weight)
+
+    def record(
+        self, recorded_at: datetime, height: Optional[float], weight: Optional[float]
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Apply a partial update on top of the latest point and return the resulting `(height, weight)`.
+        A point is only added when the profile actually changes.
+        """
+        with self._lock:
+            current = self._latest()
+            updated = (
+                current[0] if height is None else float(height),
+                current[1] if weight is None else float(weight),
+            )
+            if updated != current:
+                self._insert(to_epoch(recorded_at), *updated)
+            return updated
+
+    def _insert(self, stamp: float, height: Optional[float], weight: Optional[float]) -> None:
+        height_value = NAN if height is None else float(height)
+        weight_value = NAN if weight is None else float(weight)
+        if not self.times or stamp >= self.times[-1]:
+            self.times.append(stamp)
+            self.heights.append(height_value)
+            self.weights.append(weight_value)
+            return
+        # Backfilled points are rare; keep the columns sorted.
+        position = bisect_right(self.times, stamp)
+        self.times.insert(position, stamp)
+        self.heights.insert(position, height_value)
+        self.weights.insert(position, weight_value)
+
+    def window(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[array, array, array]:
+        """Copies of the columns for `start <= t <= end`, found by binary search."""
+        with self._lock:
+            low = bisect_left(self.times, to_epoch(start)) if start else 0
+            high = bisect_right(self.times, to_epoch(end)) if end else len(self.times)
+            return self.times[low:high], self.heights[low:high], self.weights[low:high]
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of at most `threshold` points that keep
+    the visual shape of the series (first and last points always included). O(len(xs)).
+    """
+    length = len(xs)
+    if threshold >= length or threshold <= 0:
+        return list(range(length))
+    if threshold < 3:
+        return [0, length - 1][:threshold]
+
+    selected = [0]
+    bucket_size = (length - 2) / (threshold - 2)
+    anchor = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, length)
+        # Average of the next bucket (the last real point for the final bucket).
+        if next_start >= length - 1:
+            avg_x, avg_y = xs[length - 1], ys[length - 1]
+        else:
+            count = next_end - next_start
+            avg_x = sum(xs[next_start:next_end]) / count
+            avg_y = sum(ys[next_start:next_end]) / count
+
+        ax, ay = xs[anchor], ys[anchor]
+        best_area = -1.0
+        best = start
+        for index in range(start, end):
+            area = abs((ax - avg_x) * (ys[index] - ay) - (ax - xs[index]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = index
+        selected.append(best)
+        anchor = best
+    selected.append(length - 1)
+    return selected
+
+
+def finite(values: Sequence[float]) -> List[int]:
+    return [index for index, value in enumerate(values) if not math.isnan(value)]
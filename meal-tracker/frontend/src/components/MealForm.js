@@ -1,4 +1,5 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
+import { newIdempotencyKey } from '../services/api';
 import CameraButton from './CameraButton';
 
 const moods = ['Energized', 'Balanced', 'Hungry', 'Sleepy'];
@@ -13,6 +14,8 @@ export default function MealForm({ onSubmit }) {
   const [submitting, setSubmitting] = useState(false);
   const [cameraVersion, setCameraVersion] = useState(0);
   const [error, setError] = useState('');
+  // Key of the submission that has not succeeded yet, reused while the payload stays the same.
+  const pendingSubmission = useRef(null);
 
   const handleSubmit = async (event) => {
     event.preventDefault();
@@ -41,8 +44,13 @@ export default function MealForm({ onSubmit }) {
       setSubmitting(false);
       return;
     }
+    const body = JSON.stringify(payload);
+    if (!pendingSubmission.current || pendingSubmission.current.body !== body) {
+      pendingSubmission.current = { body, key: newIdempotencyKey() };
+    }
     try {
-      await onSubmit(payload);
+      await onSubmit(payload, pendingSubmission.current.key);
+      pendingSubmission.current = null;
       setFoods('');
       setNotes('');
       setCalories('');
@@ -3,7 +3,7 @@ import AchievementsPanel from '../components/AchievementsPanel';
 import BMIForm from '../components/BMIForm';
 import MealForm from '../components/MealForm';
 import MealHistory from '../components/MealHistory';
-import { createMeal, fetchInsights, fetchMeals, fetchProfile, updateProfile } from '../services/api';
+import { createMeal, fetchDashboard, updateProfile } from '../services/api';
 
 export default function Dashboard() {
   const [meals, setMeals] = useState([]);
@@ -12,38 +12,36 @@ export default function Dashboard() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
+  const applyDashboard = useCallback((dashboard) => {
+    setMeals(dashboard.meals ?? []);
+    setInsights(dashboard.insights);
+    setProfile({
+      height: dashboard.profile?.height ?? null,
+      weight: dashboard.profile?.weight ?? null,
+      bmi: dashboard.bmi ?? null,
+    });
+  }, []);
+
   const hydrate = useCallback(async () => {
     setLoading(true);
     setError('');
     try {
-      const [mealResponse, insightResponse, profileResponse] = await Promise.all([
-        fetchMeals(),
-        fetchInsights(),
-        fetchProfile(),
-      ]);
-      setMeals(mealResponse.meals ?? []);
-      setInsights(insightResponse);
-      setProfile({
-        height: profileResponse.profile?.height ?? null,
-        weight: profileResponse.profile?.weight ?? null,
-        bmi: profileResponse.bmi ?? null,
-      });
+      applyDashboard(await fetchDashboard());
     } catch (err) {
       setError(err.message || 'Unable to load data');
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [applyDashboard]);
 
   useEffect(() => {
     hydrate();
   }, [hydrate]);
 
-  const handleMealSubmit = async (payload) => {
-    const meal = await createMeal(payload);
+  const handleMealSubmit = async (payload, idempotencyKey) => {
+    const meal = await createMeal(payload, idempotencyKey);
     setMeals((previous) => [meal, ...previous]);
-    const refreshedInsights = await fetchInsights();
-    setInsights(refreshedInsights);
+    applyDashboard(await fetchDashboard());
   };
 
   const handleProfileSave = async (values) => {
@@ -11,12 +11,12 @@ if (!API_KEY) {
 
 export async function fetchWithAuth(path, options = {}) {
   const response = await fetch(`${API_BASE_URL}${path}`, {
+    ...options,
     headers: {
       'Content-Type': 'application/json',
       'X-API-Key': API_KEY,
       ...(options.headers || {}),
     },
-    ...options,
   });
   if (!response.ok) {
     let message = 'Request failed';
@@ -35,13 +35,38 @@ export function fetchMeals() {
   return fetchWithAuth('/meals');
 }
 
-export function createMeal(payload) {
+export function newIdempotencyKey() {
+  // crypto.randomUUID only exists in secure contexts (HTTPS or localhost).
+  if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID();
+  }
+  const bytes = new Uint8Array(16);
+  if (typeof crypto !== 'undefined' && typeof crypto.getRandomValues === 'function') {
+    crypto.getRandomValues(bytes);
+  } else {
+    for (let index = 0; index < bytes.length; index += 1) {
+      bytes[index] = Math.floor(Math.random() * 256);
+    }
+  }
+  bytes[6] = (bytes[6] & 0x0f) | 0x40;
+  bytes[8] = (bytes[8] & 0x3f) | 0x80;
+  const hex = Array.from(bytes, (byte) => byte.toString(16).padStart(2, '0')).join('');
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+export function createMeal(payload, idempotencyKey) {
+  // Callers keep one key per submission and send it again on retry, so the meal is stored once.
   return fetchWithAuth('/meals', {
     method: 'POST',
+    headers: { 'Idempotency-Key': idempotencyKey },
     body: JSON.stringify(payload),
   });
 }
 
+export function fetchDashboard(source = 'supabase') {
+  return fetchWithAuth(`/api/dashboard?source=${source}`);
+}
+
 export function fetchInsights() {
   return fetchWithAuth('/api/meals/insights');
 }